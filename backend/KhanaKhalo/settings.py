@@ -2,16 +2,31 @@
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
-# Quick-start development settings - unsuitable for production
+# Settings profile, picked with KHANAKHALO_PROFILE. "development" (the
+# default) is the quick-start setup below; "production" turns off DEBUG,
+# caches compiled templates and serves fingerprinted, precompressed static
+# files collected into STATIC_ROOT. It needs KHANAKHALO_SECRET_KEY,
+# KHANAKHALO_ALLOWED_HOSTS (comma-separated) and KHANAKHALO_CACHE_DIR to be set.
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+PROFILE = os.environ.get('KHANAKHALO_PROFILE', 'development')
+if PROFILE not in ('development', 'production'):
+    raise ImproperlyConfigured(f'Unknown KHANAKHALO_PROFILE "{PROFILE}".')
+PRODUCTION = PROFILE == 'production'
 
-SECRET_KEY = 'django-insecure-c=$#u03dqs*jm9(i&3^tuwdf_fd4)oa&%6di3er&fg%x*$7$d2'
+if PRODUCTION:
+    if not os.environ.get('KHANAKHALO_SECRET_KEY'):
+        raise ImproperlyConfigured('The production profile needs KHANAKHALO_SECRET_KEY.')
+    SECRET_KEY = os.environ['KHANAKHALO_SECRET_KEY']
+else:
+    SECRET_KEY = 'django-insecure-c=$#u03dqs*jm9(i&3^tuwdf_fd4)oa&%6di3er&fg%x*$7$d2'
 
-DEBUG = True
+DEBUG = not PRODUCTION
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('KHANAKHALO_ALLOWED_HOSTS', '').split(',') if host.strip()]
 
 
 # Application definition
@@ -27,15 +42,24 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.KhanaContextMiddleware',
+    'api.middleware.ShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Answer static file requests before anything else runs. Turn off with
+# KHANAKHALO_SERVE_STATIC=0 when the web server serves STATIC_ROOT itself.
+if PRODUCTION and os.environ.get('KHANAKHALO_SERVE_STATIC', '1') != '0':
+    MIDDLEWARE.insert(0, 'api.middleware.StaticAssetsMiddleware')
+
 ROOT_URLCONF = 'KhanaKhalo.urls' 
 
 TEMPLATES = [
@@ -54,8 +78,43 @@ TEMPLATES = [
     },
 ]
 
+# Compile each template once per process. Django already does this whenever
+# the loaders are left unset; production spells it out so it cannot change
+# with DEBUG or a Django upgrade.
+if PRODUCTION:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'KhanaKhalo.wsgi.application'
 
+# Local memory by default. Set KHANAKHALO_CACHE_DIR to use a file cache
+# instead, which every worker process on the host shares, so invalidating a
+# menu or directory entry reaches all of them. Production requires it: menu
+# versions and the search index generation only work in a shared cache,
+# otherwise each worker keeps serving its own stale copy.
+if PRODUCTION and not os.environ.get('KHANAKHALO_CACHE_DIR'):
+    raise ImproperlyConfigured('The production profile needs KHANAKHALO_CACHE_DIR, a cache shared by every worker.')
+if os.environ.get('KHANAKHALO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['KHANAKHALO_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -68,9 +127,44 @@ DATABASES = {
         'PASSWORD': 'password',
         'HOST': '127.0.0.1',
         'PORT': '3306',
+        # Keep connections open between requests instead of reconnecting every
+        # time, and ping a reused connection before handing it to a request.
+        'CONN_MAX_AGE': int(os.environ.get('KHANAKHALO_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas, as comma-separated host[:port] in KHANAKHALO_DB_REPLICAS.
+# Each gets a "replicaN" alias with the primary's other settings; reads are
+# spread over them by api.routers.ReplicaRouter.
+for number, address in enumerate(filter(None, os.environ.get('KHANAKHALO_DB_REPLICAS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Extra shards for university data, as comma-separated alias=host[:port] in
+# KHANAKHALO_DB_SHARDS. A university's vendors and orders live on the shard
+# named in University.shard; move them with the move_university command.
+# Every node must hand out distinct ids (auto_increment_offset), since ids
+# are kept when a university moves.
+DATABASE_SHARDS = ['default']
+for entry in filter(None, os.environ.get('KHANAKHALO_DB_SHARDS', '').split(',')):
+    alias, _, address = entry.strip().partition('=')
+    host, _, port = address.partition(':')
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASE_SHARDS.append(alias)
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias not in DATABASE_SHARDS]
+
+DATABASE_ROUTERS = ['api.routers.ShardRouter', 'api.routers.ReplicaRouter']
+
+# Seconds a browser keeps reading from the primary after it wrote something.
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -79,6 +173,33 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# Password hashing work factor. Pick a profile with KHANAKHALO_HASHER_PROFILE:
+# "default" keeps Django's PBKDF2 iteration count, "balanced" trades some of it
+# for login throughput at meal-time peaks, and "fast" is only for tests and
+# local development.
+PASSWORD_HASHER_PROFILES = {
+    'default': None,
+    'balanced': 600_000,
+    'fast': 1_000,
+}
+
+HASHER_PROFILE = os.environ.get('KHANAKHALO_HASHER_PROFILE', 'default')
+if HASHER_PROFILE not in PASSWORD_HASHER_PROFILES:
+    raise ImproperlyConfigured(
+        f'Unknown KHANAKHALO_HASHER_PROFILE "{HASHER_PROFILE}"; choose one of {", ".join(PASSWORD_HASHER_PROFILES)}.'
+    )
+if PRODUCTION and HASHER_PROFILE == 'fast':
+    raise ImproperlyConfigured('The "fast" KHANAKHALO_HASHER_PROFILE is for tests and development, not production.')
+PASSWORD_PBKDF2_ITERATIONS = PASSWORD_HASHER_PROFILES[HASHER_PROFILE]
+
+PASSWORD_HASHERS = [
+    'api.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     # {
     #     'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -115,6 +236,28 @@ STATIC_URL = 'static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+STATIC_ROOT = os.environ.get('KHANAKHALO_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# In production collectstatic fingerprints every file name with its content
+# hash and writes .gz (and .br, with brotli installed) copies next to them;
+# templates link to the fingerprinted names through {% static %}.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'api.assets.CompressedManifestStaticFilesStorage' if PRODUCTION
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Seconds browsers keep a fingerprinted static file (see api.assets).
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+# Publish every vendor's menu as precompressed JSON under STATIC_ROOT/menus
+# whenever it changes (see api.snapshots), for the service worker to browse
+# menus from. On in production; KHANAKHALO_MENU_SNAPSHOTS=1 turns it on
+# elsewhere. Run publish_menus after collectstatic --clear or bulk imports.
+MENU_SNAPSHOTS = PRODUCTION or os.environ.get('KHANAKHALO_MENU_SNAPSHOTS') == '1'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -122,4 +265,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login'
 
-LOGOUT_REDIRECT_URL = 'login'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'login'
+
+# Requests slower than this are logged with their slowest queries.
+SLOW_REQUEST_MS = 500
+
+# Finished orders are moved to the archive tables after this many days
+# (see the archive_orders management command).
+ORDER_ARCHIVE_AFTER_DAYS = 90
+
+# Besides staff, /metrics answers scrapers from these addresses (comma-separated;
+# none by default, since behind a proxy every request seems to come from it)
+# and those sending "Authorization: Bearer <KHANAKHALO_METRICS_TOKEN>".
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('KHANAKHALO_METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+METRICS_TOKEN = os.environ.get('KHANAKHALO_METRICS_TOKEN', '')
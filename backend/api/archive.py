@@ -0,0 +1,79 @@
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from . import shards
+from .models import ArchivedOrder, Order, OrderItem
+
+
+# Finished orders untouched for this long are moved to the archive.
+ARCHIVE_AFTER = timedelta(days=getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 90))
+
+
+def _archived(order):
+    return ArchivedOrder(
+        id=order.id,
+        user_id=order.user_id,
+        vendor_id=order.vendor_id,
+        total_amount=order.total_amount,
+        status=order.status,
+        order_method=order.order_method,
+        created_at=order.created_at,
+        updated_at=order.updated_at,
+        lines=[
+            {
+                'menu_item_id': item.menu_item_id,
+                'name': item.menu_item.name,
+                'quantity': item.quantity,
+                'price': str(item.price),
+                'customization': item.customization,
+            }
+            for item in order.items.all()
+        ],
+    )
+
+
+def archive_batch(cutoff, batch_size=500):
+    """
+    Move up to batch_size finished orders last changed before cutoff.
+
+    The candidates are picked without locks; only the chosen rows are locked,
+    copied and deleted in one short transaction, so the hot tables are never
+    held for longer than one batch. Returns the number of orders moved.
+    """
+    finished = Q(status__in=Order.FINISHED_STATUSES, updated_at__lt=cutoff)
+    ids = list(Order.objects.filter(finished).order_by('id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0
+
+    with shards.atomic():
+        # Re-check under the lock in case an order changed since it was picked.
+        orders = list(
+            Order.objects.select_for_update().filter(finished, pk__in=ids)
+            .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('menu_item')))
+        )
+        ArchivedOrder.objects.bulk_create([_archived(order) for order in orders], ignore_conflicts=True)
+        Order.objects.filter(pk__in=[order.id for order in orders]).delete()
+    return len(orders)
+
+
+def archive(older_than=None, batch_size=500, max_batches=None, pause=0):
+    """
+    Archive in batches until nothing old enough is left, sleeping pause
+    seconds between batches to leave room for live traffic. Returns the
+    number of orders moved.
+    """
+    cutoff = timezone.now() - (older_than if older_than is not None else ARCHIVE_AFTER)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return moved
@@ -0,0 +1,145 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip copies are written and served.
+    brotli = None
+
+
+# How long browsers may keep a fingerprinted file without asking again.
+STATIC_MAX_AGE = getattr(settings, 'STATIC_MAX_AGE', 365 * 24 * 60 * 60)
+
+# Files whose names do not change with their content, such as admin images
+# referenced by name, are only cached this long.
+STATIC_PLAIN_MAX_AGE = getattr(settings, 'STATIC_PLAIN_MAX_AGE', 60 * 60)
+
+# Names like menu.1a2b3c4d5e6f.json: collectstatic's fingerprinted copies
+# and the menu snapshots of api.snapshots.
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+# Pointers to the current fingerprinted file, such as menus/<id>/latest.json;
+# browsers must check these with us before every use.
+POINTERS = re.compile(r'(^|/)latest\.json$')
+
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg', '.txt', '.html', '.map', '.xml')
+
+# File suffix of each precompressed copy by Content-Encoding, best first.
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+def compress(content):
+    """The gzip and (if available) brotli copies of content, keyed by Content-Encoding."""
+    copies = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies['br'] = brotli.compress(content)
+    return copies
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes a .gz (and with brotli
+    installed, a .br) copy next to every text file collectstatic produces,
+    so they are compressed once at deploy time rather than per request.
+    Copies that would not be smaller are skipped.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in {*paths, *self.hashed_files.values()}:
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self.write_compressed(name)
+
+    def write_compressed(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        for encoding, copy in compress(content).items():
+            if len(copy) < len(content):
+                with open(path + ENCODINGS[encoding], 'wb') as target:
+                    target.write(copy)
+
+
+def accepted_encodings(header):
+    """
+    The content codings an Accept-Encoding header allows, by q-value.
+
+    Codings listed with q=0 are refused; "*" stands for every coding not
+    listed. Malformed q-values count as refusals.
+    """
+    weights = {}
+    for part in header.split(','):
+        coding, *params = (piece.strip() for piece in part.split(';'))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    wildcard = weights.pop('*', 0.0)
+    return {coding for coding in ENCODINGS if weights.get(coding, wildcard) > 0}
+
+
+def serve(request):
+    """
+    Answer a GET or HEAD for a file under STATIC_URL from STATIC_ROOT, or
+    return None if the request is for something else.
+
+    The precompressed copy the browser accepts is sent when there is one.
+    Fingerprinted names are cached for STATIC_MAX_AGE and marked
+    immutable, since a changed file gets a new name.
+    """
+    prefix = '/' + settings.STATIC_URL.lstrip('/')
+    if request.method not in ('GET', 'HEAD') or not request.path.startswith(prefix) or not settings.STATIC_ROOT:
+        return None
+    name = request.path[len(prefix):]
+    try:
+        path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+
+    modified = os.stat(path).st_mtime
+    if not was_modified_since(request.headers.get('If-Modified-Since'), modified):
+        return HttpResponseNotModified()
+
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding = None
+    for token, suffix in ENCODINGS.items():
+        if token in accepted and os.path.isfile(path + suffix):
+            encoding, path = token, path + suffix
+            break
+
+    content_type, _ = mimetypes.guess_type(name)
+    response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Last-Modified'] = http_date(modified)
+    if FINGERPRINTED.search(name):
+        response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    elif POINTERS.search(name):
+        response.headers['Cache-Control'] = 'no-cache'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={STATIC_PLAIN_MAX_AGE}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from . import shards
+from .models import Profile, Vendor
+
+
+# Snapshots are dropped by signals when the profile or vendor changes; the
+# timeout only bounds how long a missed invalidation can linger.
+TIMEOUT = 60 * 60
+
+
+@dataclass(frozen=True)
+class KhanaContext:
+    """What the views need to know about the logged-in user, without joins."""
+
+    user_id: int = None
+    university_id: int = None
+    roll_no: str = ''
+    vendor_id: int = None
+    vendor_university_id: int = None
+
+    @property
+    def has_profile(self):
+        return self.university_id is not None
+
+    @property
+    def is_vendor(self):
+        return self.vendor_id is not None
+
+    @property
+    def home_university_id(self):
+        """The university whose shard holds this user's orders or vendor."""
+        return self.university_id if self.university_id is not None else self.vendor_university_id
+
+
+ANONYMOUS = KhanaContext()
+
+
+def _key(user_id):
+    return f'khana-ctx:{user_id}'
+
+
+def build(user):
+    profile = Profile.objects.filter(user=user).values('university_id', 'roll_no').first() or {}
+    # Which shard holds the user's vendor is not known up front, so each is asked.
+    vendor = None
+    for alias in shards.aliases():
+        vendor = Vendor.objects.using(alias).filter(vendor_owner=user).values_list('id', 'university_id').first()
+        if vendor:
+            break
+    vendor_id, vendor_university_id = vendor or (None, None)
+    return KhanaContext(
+        user_id=user.id,
+        university_id=profile.get('university_id'),
+        roll_no=profile.get('roll_no', ''),
+        vendor_id=vendor_id,
+        vendor_university_id=vendor_university_id,
+    )
+
+
+def get(user, refresh=False):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    key = _key(user.id)
+    ctx = None if refresh else cache.get(key)
+    if ctx is None:
+        ctx = build(user)
+        cache.set(key, ctx, TIMEOUT)
+    return ctx
+
+
+async def aget(user, refresh=False):
+    """get() for async views: a cached snapshot costs no thread hop."""
+    if not user.is_authenticated:
+        return ANONYMOUS
+    key = _key(user.id)
+    ctx = None if refresh else await cache.aget(key)
+    if ctx is None:
+        ctx = await sync_to_async(build)(user)
+        await cache.aset(key, ctx, TIMEOUT)
+    return ctx
+
+
+def invalidate(user_id):
+    if user_id is not None:
+        cache.delete(_key(user_id))
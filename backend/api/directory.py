@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import University, Vendor
+
+
+# Upper bound on how long a directory is trusted, in case a vendor is changed
+# without a signal firing (e.g. through QuerySet.update()).
+MAX_AGE = 60 * 60
+
+HITS_KEY = 'vendor-directory:hits'
+MISSES_KEY = 'vendor-directory:misses'
+
+
+def _key(university_id):
+    return f'vendor-directory:{university_id}'
+
+
+def _seconds_until_next_boundary(now, times):
+    """Seconds from now until the next of the given times of day."""
+    upcoming = []
+    for t in times:
+        boundary = datetime.combine(now.date(), t, tzinfo=now.tzinfo)
+        if boundary <= now:
+            boundary += timedelta(days=1)
+        upcoming.append((boundary - now).total_seconds())
+    return min(upcoming, default=MAX_AGE)
+
+
+def _build(university_id):
+    now = timezone.localtime(timezone.now())
+    university = University.objects.only('name').get(pk=university_id)
+    vendors = list(Vendor.objects.filter(university_id=university_id))
+
+    cards = [
+        {
+            'id': vendor.id,
+            'name': vendor.name,
+            'description': vendor.description,
+            'dietary_focus_display': vendor.get_dietary_focus_display(),
+            'avg_rating': vendor.avg_rating,
+            'is_open': vendor.opening_time <= now.time() <= vendor.closing_time,
+        }
+        for vendor in vendors
+    ]
+    times = [t for vendor in vendors for t in (vendor.opening_time, vendor.closing_time)]
+    timeout = min(MAX_AGE, math.ceil(_seconds_until_next_boundary(now, times)))
+    return {'university': {'id': university.id, 'name': university.name}, 'vendors': cards}, max(1, timeout)
+
+
+def get_directory(university_id):
+    """
+    The vendor cards shown on the home page for one university.
+
+    Every student at a university sees the same list, so it is built once and
+    kept in the cache until a vendor changes or the next vendor opens or
+    closes, whichever comes first.
+    """
+    key = _key(university_id)
+    directory = cache.get(key)
+    if directory is not None:
+        _count(HITS_KEY)
+        return directory
+
+    _count(MISSES_KEY)
+    directory, timeout = _build(university_id)
+    cache.set(key, directory, timeout)
+    return directory
+
+
+async def aget_directory(university_id):
+    """get_directory() for async views; only a cache miss leaves the event loop."""
+    directory = await cache.aget(_key(university_id))
+    if directory is not None:
+        _count(HITS_KEY)
+        return directory
+    return await sync_to_async(get_directory)(university_id)
+
+
+def invalidate(university_id):
+    cache.delete(_key(university_id))
+
+
+def _count(key):
+    # add() is a no-op when the counter exists, so incr() never hits a missing key.
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def stats():
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': counts.get(HITS_KEY, 0), 'misses': counts.get(MISSES_KEY, 0)}
@@ -0,0 +1,174 @@
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .load import PREP_MINUTES
+from .models import Order, OrderStatusEvent, Vendor
+
+
+# Orders that became ready within this window feed the estimate.
+WINDOW = timedelta(minutes=getattr(settings, 'ORDER_ESTIMATE_WINDOW_MINUTES', 60))
+
+# How often a process reloads a vendor's window and queue from the database,
+# to pick up orders that other processes moved.
+REFRESH_SECONDS = getattr(settings, 'ORDER_ESTIMATE_REFRESH_SECONDS', 60)
+
+
+@dataclass(frozen=True)
+class Estimate:
+    prep_minutes: int
+    per_hour: float
+    queue: int
+    wait_minutes: int = None
+    measured: bool = False
+
+    @property
+    def label(self):
+        if self.wait_minutes is None:
+            return 'Not taking orders'
+        return f'~{self.wait_minutes} min wait'
+
+    def as_json(self):
+        return {
+            'wait_minutes': self.wait_minutes,
+            'prep_minutes': self.prep_minutes,
+            'per_hour': round(self.per_hour, 1),
+            'queue': self.queue,
+            'label': self.label,
+        }
+
+
+class _Window:
+    """Prep times of the orders a vendor finished recently, with a running total."""
+
+    __slots__ = ('samples', 'total', 'queue', 'max_orders', 'loaded_at')
+
+    def __init__(self):
+        self.samples = deque()
+        self.total = 0
+        self.queue = 0
+        self.max_orders = 0
+        self.loaded_at = None
+
+    def add(self, at, seconds):
+        self.samples.append((at, seconds))
+        self.total += seconds
+
+    def trim(self, now):
+        cutoff = now - WINDOW
+        while self.samples and self.samples[0][0] < cutoff:
+            self.total -= self.samples.popleft()[1]
+
+    def estimate(self, now):
+        self.trim(now)
+        count = len(self.samples)
+        # Nothing measured yet means the nominal prep time; never less than a minute.
+        prep = max(1, self.total / count / 60) if count else PREP_MINUTES
+        per_minute = count / (WINDOW.total_seconds() / 60)
+        if not self.max_orders:
+            return Estimate(math.ceil(prep), per_minute * 60, self.queue)
+        # As in load.estimated_wait, the kitchen is taken to cook max_orders
+        # orders side by side; a quiet hour says little about its capacity.
+        capacity = max(per_minute, self.max_orders / prep)
+        # A new order is ready once it has been cooked and everything ahead
+        # of it has gone through the kitchen, whichever takes longer.
+        wait = max(prep, (self.queue + 1) / capacity)
+        return Estimate(math.ceil(prep), per_minute * 60, self.queue, math.ceil(wait), bool(count))
+
+
+_windows = {}
+_lock = threading.Lock()
+
+
+def _refresh(vendor_ids, now):
+    vendors = Vendor.objects.filter(pk__in=vendor_ids).values_list('id', 'current_orders', 'max_orders')
+    ready = (
+        OrderStatusEvent.objects.filter(
+            vendor_id__in=vendor_ids, to_status=Order.OrderStatus.READY, created_at__gte=now - WINDOW
+        )
+        .order_by('created_at').values_list('vendor_id', 'created_at', 'seconds_in_previous')
+    )
+    fresh = {}
+    for vendor_id, current, limit in vendors:
+        fresh[vendor_id] = window = _Window()
+        window.queue, window.max_orders = current, limit
+    for vendor_id, at, seconds in ready:
+        fresh[vendor_id].add(at, seconds)
+    loaded_at = time.monotonic()
+    with _lock:
+        for window in fresh.values():
+            window.loaded_at = loaded_at
+        _windows.update(fresh)
+
+
+def _stale(vendor_ids):
+    horizon = time.monotonic() - REFRESH_SECONDS
+    return [
+        vendor_id for vendor_id in vendor_ids
+        if vendor_id not in _windows or _windows[vendor_id].loaded_at < horizon
+    ]
+
+
+def _read(vendor_ids, now):
+    with _lock:
+        return {vendor_id: _windows[vendor_id].estimate(now) for vendor_id in vendor_ids if vendor_id in _windows}
+
+
+def get_many(vendor_ids):
+    """
+    Wait estimates for several vendors, keyed by vendor id; vendors that do
+    not exist are left out.
+
+    Estimates come from memory; vendors not seen for REFRESH_SECONDS are
+    reloaded together with one query for their queues and one for their
+    recent prep times.
+    """
+    now = timezone.now()
+    stale = _stale(vendor_ids)
+    if stale:
+        _refresh(stale, now)
+    return _read(vendor_ids, now)
+
+
+async def aget_many(vendor_ids):
+    """get_many() for async views; only a reload leaves the event loop."""
+    now = timezone.now()
+    stale = _stale(vendor_ids)
+    if stale:
+        await sync_to_async(_refresh)(stale, now)
+    return _read(vendor_ids, now)
+
+
+def estimate(vendor_id):
+    return get_many([vendor_id]).get(vendor_id)
+
+
+def order_placed(vendor_id, count=1):
+    with _lock:
+        window = _windows.get(vendor_id)
+        if window is not None:
+            window.queue += count
+
+
+def orders_moved(vendor_id, to_status, events, finished):
+    """Fold status events written by this process into its windows straight away."""
+    with _lock:
+        window = _windows.get(vendor_id)
+        if window is None:
+            return
+        window.queue = max(0, window.queue - finished)
+        if to_status == Order.OrderStatus.READY:
+            for event in events:
+                window.add(event.created_at, event.seconds_in_previous)
+
+
+def reset():
+    with _lock:
+        _windows.clear()
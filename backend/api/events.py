@@ -0,0 +1,121 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import shards
+from .pagination import to_micros
+
+
+# Seconds between keep-alive comments on an idle stream, so proxies do not
+# drop the connection.
+HEARTBEAT = getattr(settings, 'ORDER_EVENTS_HEARTBEAT', 25)
+
+
+class LocalBroker:
+    """
+    In-process pub/sub for order events.
+
+    Subscribers are asyncio queues living on the event loop of the ASGI
+    server; publish() may be called from any thread (sync views run in a
+    worker thread) and hands each message to the subscriber's own loop. An
+    idle subscriber is one queue in a set and a coroutine parked on get().
+
+    Only processes sharing this object see each other's events, so a
+    deployment with several workers swaps it for a broker with the same
+    publish/subscribe interface through the ORDER_EVENTS_BROKER setting.
+    """
+
+    # A client that falls this far behind misses events; it catches up from
+    # the delta endpoint on its next poll.
+    queue_size = 100
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, message)
+
+    @staticmethod
+    def _deliver(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                for channel in channels:
+                    self._subscribers[channel].discard(subscriber)
+                    if not self._subscribers[channel]:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'ORDER_EVENTS_BROKER', 'api.events.LocalBroker'))()
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def vendor_channel(vendor_id):
+    return f'vendor:{vendor_id}'
+
+
+def order_changed(order, event):
+    """
+    Tell the student and the vendor that an order was created or moved on.
+
+    Sent once the surrounding transaction commits, so subscribers never hear
+    about an order they cannot read yet.
+    """
+    message = json.dumps({
+        'event': event,
+        'id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'cursor': to_micros(order.updated_at),
+    })
+
+    def send():
+        broker = get_broker()
+        broker.publish(user_channel(order.user_id), message)
+        broker.publish(vendor_channel(order.vendor_id), message)
+
+    shards.on_commit(send)
+
+
+async def stream(channels, heartbeat=HEARTBEAT):
+    """Server-sent events for channels, with a comment line whenever the stream is idle."""
+    async with get_broker().subscribe(channels) as queue:
+        yield b'retry: 3000\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+            yield f'data: {message}\n\n'.encode()
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the work factor taken from settings.
+
+    It keeps the pbkdf2_sha256 algorithm name, so existing hashes still
+    verify; a hash made with a different iteration count is re-encoded with
+    the configured one the next time its owner logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
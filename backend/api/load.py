@@ -0,0 +1,80 @@
+import math
+
+from django.conf import settings
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Vendor, Order
+
+
+# Rough time a kitchen needs for one order; used to tell turned-away customers
+# how long to wait before trying again.
+PREP_MINUTES = getattr(settings, 'ORDER_PREP_MINUTES', 6)
+
+
+def reserve_slot(vendor_id):
+    """
+    Count one more active order against the vendor if it is below max_orders.
+
+    The check and the increment are a single conditional UPDATE, so parallel
+    checkouts can never push a vendor past its limit. Returns False when the
+    vendor is full.
+    """
+    return Vendor.objects.filter(
+        pk=vendor_id, current_orders__lt=F('max_orders')
+    ).update(current_orders=F('current_orders') + 1) == 1
+
+
+def estimated_wait(current_orders, max_orders):
+    """
+    Minutes until a full vendor is likely to have a free slot again, or None
+    if the vendor is not taking orders at all.
+
+    The kitchen is assumed to work through max_orders orders in parallel, so a
+    slot frees up every PREP_MINUTES / max_orders minutes.
+    """
+    if not max_orders:
+        return None
+    backlog = current_orders - max_orders + 1
+    return max(1, math.ceil(backlog * PREP_MINUTES / max_orders))
+
+
+def release_order(vendor_id, count=1):
+    """Count count active orders less against the vendor, never going below zero."""
+    if count < 1:
+        return
+    # The column is unsigned on MySQL, so the subtraction must never be evaluated below zero.
+    Vendor.objects.filter(pk=vendor_id, current_orders__gt=0).update(current_orders=Case(
+        When(current_orders__gt=count, then=F('current_orders') - count),
+        default=Value(0),
+    ))
+
+
+def reconcile(vendor_ids=None):
+    """
+    Recompute current_orders from the orders that are still active.
+
+    Only vendors whose counter has drifted are written to, and the new value
+    is counted inside the UPDATE itself so checkouts that land in between are
+    not lost. Returns the number of vendors that were corrected.
+    """
+    vendors = Vendor.objects.all()
+    orders = Order.objects.filter(status__in=Order.ACTIVE_STATUSES)
+    if vendor_ids is not None:
+        vendors = vendors.filter(pk__in=vendor_ids)
+        orders = orders.filter(vendor_id__in=vendor_ids)
+
+    actual = dict(orders.values_list('vendor_id').annotate(n=Count('id')).order_by())
+
+    drifted = [
+        vendor_id for vendor_id, current in vendors.values_list('id', 'current_orders')
+        if current != actual.get(vendor_id, 0)
+    ]
+    if not drifted:
+        return 0
+
+    active = (
+        Order.objects.filter(vendor=OuterRef('pk'), status__in=Order.ACTIVE_STATUSES)
+        .order_by().values('vendor').annotate(n=Count('id')).values('n')
+    )
+    return Vendor.objects.filter(pk__in=drifted).update(current_orders=Coalesce(Subquery(active), 0))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api import archive, shards
+
+
+class Command(BaseCommand):
+    help = 'Move finished orders older than ORDER_ARCHIVE_AFTER_DAYS out of the hot order tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Archive orders finished more than this many days ago (default: the setting).')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int,
+                            help='Stop after this many batches; run again later to continue.')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to wait between batches.')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+        moved = sum(
+            archive.archive(older_than, options['batch_size'], options['max_batches'], options['pause'])
+            for _ in shards.each()
+        )
+        self.stdout.write(f'Archived {moved} order(s).')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api import sales, shards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-vendor sales rollups from every completed order, hot and archived.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--vendor', type=int, action='append', dest='vendor_ids',
+                            help='Only rebuild this vendor (can be repeated).')
+
+    def handle(self, *args, **options):
+        counted = sum(sales.backfill(options['batch_size'], options['vendor_ids']) for _ in shards.each())
+        self.stdout.write(f'Counted {counted} completed order(s) into the sales rollups.')
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time
+import time as clock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.models import University, Vendor, MenuItem
+from api.services import VendorBusy, place_order
+
+
+class Command(BaseCommand):
+    help = 'Hammer one vendor with parallel checkouts and report throughput as it fills up.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-orders', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=6,
+                            help='Each round sends as many checkouts as the vendor has slots.')
+        parser.add_argument('--workers', type=int, default=16)
+
+    def handle(self, *args, **options):
+        # Threads need committed rows, so the fixtures are real and are
+        # deleted again at the end instead of being rolled back.
+        university = University.objects.create(name='Bench University', domain='bench.invalid')
+        try:
+            vendor = Vendor.objects.create(
+                university=university,
+                name='Bench Stall',
+                location='Bench',
+                opening_time=time(0, 0),
+                closing_time=time(23, 59),
+                max_orders=options['max_orders']
+            )
+            user = User.objects.create_user(username='bench-admission-user')
+            try:
+                item = MenuItem.objects.create(vendor=vendor, name='Chai', price='10.00')
+                cart = [{'id': item.id, 'quantity': 1}]
+
+                def checkout(_):
+                    try:
+                        place_order(user, vendor, cart)
+                        return True
+                    except VendorBusy:
+                        return False
+                    finally:
+                        connections.close_all()
+
+                batch = options['max_orders']
+                with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                    for round_no in range(1, options['rounds'] + 1):
+                        started = clock.perf_counter()
+                        results = list(pool.map(checkout, range(batch)))
+                        elapsed = clock.perf_counter() - started
+                        accepted = sum(results)
+                        self.stdout.write(
+                            f'round {round_no}: {accepted:>4} accepted, {batch - accepted:>4} turned away, '
+                            f'{batch / elapsed:8.1f} checkouts/s'
+                        )
+            finally:
+                user.delete()
+        finally:
+            university.delete()
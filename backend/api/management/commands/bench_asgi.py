@@ -0,0 +1,220 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import random
+import statistics
+import sys
+import time as clock
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+
+from api.models import MenuItem, Profile, Vendor
+
+from .bench_endpoints import percentile
+
+
+PAGES = ('home', 'vendor_menu', 'my_orders', 'vendor_dashboard')
+
+
+def _slow_queries(delay):
+    """An execute wrapper that makes every query take delay seconds longer, like a remote MySQL."""
+    def wrapper(execute, sql, params, many, context):
+        clock.sleep(delay)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+def _asgi_scope(path, cookie):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+
+
+def _wsgi_environ(path, cookie):
+    return {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Load home, vendor_menu, my_orders and vendor_dashboard through the ASGI and WSGI applications '
+        'at rising numbers of concurrent connections, using data made by generate_data, and report '
+        'throughput and p50/p95/p99 latency. No network or server is involved; WSGI is served by a '
+        'fixed pool of threads as under gunicorn, ASGI by one event loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', default='gen', help='The --tag the data was generated with.')
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help='Concurrent connections; repeat for several levels (default 10, 50, 200).')
+        parser.add_argument('--requests', type=int, default=10, help='Requests per connection.')
+        parser.add_argument('--wsgi-threads', type=int, default=16,
+                            help='Worker threads serving WSGI, like gunicorn --threads.')
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Extra time added to every query, to stand in for a database over the network.')
+        parser.add_argument('--only', choices=('asgi', 'wsgi'), help='Load only one of the two.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def setup_users(self, tag, rng):
+        """Session cookies and the pages each logged-in user can load."""
+        students = list(
+            Profile.objects.filter(user__username__startswith=f'{tag}-student-').select_related('user')[:50]
+        )
+        owners = list(
+            Vendor.objects.filter(vendor_owner__username__startswith=f'{tag}-owner-').select_related('vendor_owner')[:50]
+        )
+        if not students or not owners:
+            raise CommandError(f'No data tagged "{tag}"; run generate_data first.')
+        menus = {}
+        for vendor_id, university_id in Vendor.objects.filter(
+            pk__in=MenuItem.objects.values('vendor_id'),
+            university_id__in={profile.university_id for profile in students},
+        ).values_list('id', 'university_id'):
+            menus.setdefault(university_id, []).append(vendor_id)
+
+        def cookie(user):
+            client = Client()
+            client.force_login(user)
+            return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        users = []
+        for profile in students:
+            session = cookie(profile.user)
+            vendors = menus.get(profile.university_id) or [None]
+            users.append([
+                (session, reverse('home')),
+                (session, reverse('my_orders')),
+                *((session, reverse('vendor_menu', args=[vendor_id])) for vendor_id in vendors[:3] if vendor_id),
+            ])
+        for vendor in owners:
+            users.append([(cookie(vendor.vendor_owner), reverse('vendor_dashboard'))])
+        connections.close_all()
+        return [random.Random(rng.random()).sample(pages, len(pages)) for pages in users]
+
+    def connection_plan(self, users, concurrency, count):
+        """The (cookie, path) requests each connection sends, one after the other."""
+        return [
+            [users[n % len(users)][i % len(users[n % len(users)])] for i in range(count)]
+            for n in range(concurrency)
+        ]
+
+    def run_wsgi(self, plan, threads):
+        application = get_wsgi_application()
+
+        def send(cookie, path):
+            status = []
+            response = application(_wsgi_environ(path, cookie), lambda line, headers, exc_info=None: status.append(line))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            return int(status[0].split()[0])
+
+        # Every connection submits its requests in turn, so requests beyond the
+        # pool's threads wait in its queue like they would in a server's backlog.
+        samples = []
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            def connection(requests):
+                for cookie, path in requests:
+                    started = clock.perf_counter()
+                    code = pool.submit(send, cookie, path).result()
+                    samples.append(((clock.perf_counter() - started) * 1000, code))
+
+            with ThreadPoolExecutor(max_workers=len(plan)) as clients:
+                list(clients.map(connection, plan))
+        connections.close_all()
+        return samples
+
+    async def run_asgi(self, plan):
+        application = get_asgi_application()
+
+        async def send_one(cookie, path):
+            done = asyncio.Event()
+            received = []
+            status = []
+
+            async def receive():
+                if not received:
+                    received.append(True)
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                    done.set()
+
+            await application(_asgi_scope(path, cookie), receive, send)
+            done.set()
+            return status[0]
+
+        samples = []
+
+        async def connection(requests):
+            for cookie, path in requests:
+                started = clock.perf_counter()
+                code = await send_one(cookie, path)
+                samples.append(((clock.perf_counter() - started) * 1000, code))
+
+        await asyncio.gather(*(connection(requests) for requests in plan))
+        return samples
+
+    def report(self, name, concurrency, samples, elapsed):
+        latencies = [ms for ms, _ in samples]
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+        failed = sum(1 for _, code in samples if not 200 <= code < 400)
+        self.stdout.write(
+            f'{name:<6}{concurrency:>6}{len(samples):>7}{len(samples) / elapsed:>9.1f}'
+            f'{percentile(cuts, 50):>9.1f}{percentile(cuts, 95):>9.1f}{percentile(cuts, 99):>9.1f}{failed:>7}'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = self.setup_users(options['tag'], rng)
+
+        wrapper = _slow_queries(options['db_latency_ms'] / 1000)
+
+        def slow_down(sender, connection, **kwargs):
+            connection.execute_wrappers.append(wrapper)
+
+        if options['db_latency_ms']:
+            connection_created.connect(slow_down, weak=False)
+
+        servers = [options['only']] if options['only'] else ['wsgi', 'asgi']
+        self.stdout.write(
+            f'{len(users)} users, {options["requests"]} requests per connection, '
+            f'{options["wsgi_threads"]} WSGI threads, +{options["db_latency_ms"]:g} ms per query'
+        )
+        self.stdout.write(f'{"":<6}{"conns":>6}{"n":>7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"failed":>7}')
+        try:
+            for concurrency in options['concurrency'] or [10, 50, 200]:
+                plan = self.connection_plan(users, concurrency, options['requests'])
+                for server in servers:
+                    started = clock.perf_counter()
+                    if server == 'wsgi':
+                        samples = self.run_wsgi(plan, options['wsgi_threads'])
+                    else:
+                        samples = asyncio.run(self.run_asgi(plan))
+                    self.report(server, concurrency, samples, clock.perf_counter() - started)
+        finally:
+            connection_created.disconnect(slow_down)
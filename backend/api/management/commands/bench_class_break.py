@@ -0,0 +1,137 @@
+from collections import Counter, defaultdict
+import random
+
+from django.core.management.base import BaseCommand
+
+from api import slots
+from api.load import PREP_MINUTES, estimated_wait
+
+
+def _run(order_now, bookings, max_orders):
+    """
+    Play one break minute by minute and return its peaks.
+
+    order_now lists the minute each walk-up student first tries to check
+    out; bookings lists (minute booked, slot start) pairs. Minute 0 is the start
+    of the break. Checkouts are admitted like place_order() does, and a
+    turned-away student tries again after the Retry-After it was given.
+    Booked orders skip admission and join the kitchen when the slot is
+    released. No database is touched.
+    """
+    attempts = Counter(order_now)
+    requests = Counter(minute for minute, _ in bookings)
+    lead = int(slots.RELEASE_LEAD.total_seconds() // 60)
+    released = Counter(start - lead for _, start in bookings)
+    rate = max_orders / PREP_MINUTES
+
+    queue = credit = 0.0
+    outstanding = len(order_now) + len(bookings)
+    peak_kitchen = peak_queue = 0
+    minute = min([*order_now, *requests, *released, 0])
+    last_admitted = 0
+    while outstanding:
+        credit += rate
+        done = min(queue, int(credit))
+        queue -= done
+        credit -= done
+        outstanding -= done
+
+        queue += released.pop(minute, 0)
+        waiting = attempts.pop(minute, 0)
+        requests[minute] += waiting
+        room = max(0, int(max_orders - queue))
+        admitted = min(room, waiting)
+        queue += admitted
+        if admitted:
+            last_admitted = minute
+        if waiting > admitted:
+            retry = estimated_wait(int(queue), max_orders) or 1
+            attempts[minute + retry] += waiting - admitted
+
+        # The queue at the counter: orders in the kitchen plus students still trying to get in.
+        peak_kitchen = max(peak_kitchen, queue)
+        peak_queue = max(peak_queue, queue + sum(attempts.values()))
+        minute += 1
+    return {
+        'peak_requests': max(requests.values(), default=0),
+        'requests': sum(requests.values()),
+        'peak_kitchen': int(peak_kitchen),
+        'peak_queue': int(peak_queue),
+        'last_admitted': last_admitted,
+    }
+
+
+def simulate(students, max_orders, preorder_share, break_minutes=15, spread=3, seed=1, slot_minutes=None):
+    """
+    Compare a class break where everyone orders at the bell with one where
+    preorder_share of the students booked a pickup slot during class.
+
+    Walk-up students arrive a few minutes (about spread) into the break;
+    students who book do so at a random minute of the hour before, choosing
+    the first slot of the break that still has room. Returns the peaks of
+    both runs, keyed 'order now' and 'pre-order'.
+    """
+    slot_minutes = slot_minutes or slots.SLOT_MINUTES
+    rng = random.Random(seed)
+    lead = int(slots.RELEASE_LEAD.total_seconds() // 60)
+
+    def arrival():
+        return min(break_minutes - 1, int(rng.expovariate(1 / spread)))
+
+    walk_up = [arrival() for _ in range(students)]
+
+    order_now, bookings = [], []
+    booked = defaultdict(int)
+    per_slot = slots.capacity(max_orders)
+    for student in range(students):
+        if rng.random() >= preorder_share:
+            order_now.append(walk_up[student])
+            continue
+        minute = -rng.randint(lead + slot_minutes, 60)
+        start = 0
+        while start < break_minutes and booked[start] >= per_slot:
+            start += slot_minutes
+        if start >= break_minutes:
+            # Every slot of the break is taken; this student queues at the bell.
+            order_now.append(walk_up[student])
+            continue
+        booked[start] += 1
+        bookings.append((minute, start))
+
+    return {
+        'order now': _run(walk_up, [], max_orders),
+        'pre-order': _run(order_now, bookings, max_orders),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Simulate a class-break rush on one vendor with and without pickup slot pre-ordering.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--max-orders', type=int, default=30)
+        parser.add_argument('--preorder-share', type=float, default=0.6,
+                            help='Fraction of students who book a slot during class.')
+        parser.add_argument('--break-minutes', type=int, default=30)
+        parser.add_argument('--spread', type=float, default=3,
+                            help='Average minutes into the break at which walk-up students arrive.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        results = simulate(
+            options['students'], options['max_orders'], options['preorder_share'],
+            options['break_minutes'], options['spread'], options['seed'],
+        )
+        self.stdout.write(
+            f"{options['students']} students, max_orders={options['max_orders']}, "
+            f"{slots.capacity(options['max_orders'])} orders per {slots.SLOT_MINUTES}-minute slot, "
+            f"{options['preorder_share']:.0%} pre-ordering"
+        )
+        self.stdout.write(
+            f"{'':<10} {'peak req/min':>12} {'requests':>9} {'peak kitchen':>13} {'peak queue':>11} {'last in':>8}"
+        )
+        for name, run in results.items():
+            self.stdout.write(
+                f"{name:<10} {run['peak_requests']:>12} {run['requests']:>9} {run['peak_kitchen']:>13} "
+                f"{run['peak_queue']:>11} {run['last_admitted']:>7}m"
+            )
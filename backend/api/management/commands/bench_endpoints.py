@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import random
+import statistics
+import time as clock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.models import Profile, Vendor, MenuItem, Order
+
+
+SCENARIOS = ('home', 'vendor_menu', 'create_order', 'my_orders', 'vendor_dashboard', 'update_order_status')
+
+NEXT_STATUS = {
+    Order.OrderStatus.PENDING: Order.OrderStatus.ACCEPTED,
+    Order.OrderStatus.ACCEPTED: Order.OrderStatus.READY,
+    Order.OrderStatus.READY: Order.OrderStatus.COMPLETED,
+}
+
+
+def percentile(cuts, p):
+    return cuts[p - 1] if cuts else 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main pages with concurrent clients against data made by generate_data and report '
+        'p50/p95/p99 latency and SQL queries per page. create_order and update_order_status write real rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', default='gen', help='The --tag the data was generated with.')
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=50, help='Requests per client and page.')
+        parser.add_argument('--only', action='append', choices=SCENARIOS, help='Run only these pages.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def setup_clients(self, tag, count, rng):
+        students = list(
+            Profile.objects.filter(user__username__startswith=f'{tag}-student-')
+            .select_related('user').order_by('?')[:count]
+        )
+        owners = list(
+            Vendor.objects.filter(vendor_owner__username__startswith=f'{tag}-owner-')
+            .select_related('vendor_owner').order_by('?')[:count]
+        )
+        if not students or not owners:
+            raise CommandError(f'No data tagged "{tag}"; run generate_data first.')
+
+        vendors = {}
+        for vendor_id, university_id in Vendor.objects.filter(
+            university_id__in={profile.university_id for profile in students}
+        ).values_list('id', 'university_id'):
+            vendors.setdefault(university_id, []).append(vendor_id)
+        items = {}
+        for item_id, vendor_id in MenuItem.objects.filter(
+            vendor_id__in=[v for ids in vendors.values() for v in ids], is_available=True
+        ).values_list('id', 'vendor_id'):
+            items.setdefault(vendor_id, []).append(item_id)
+
+        clients = []
+        for n in range(count):
+            profile, vendor = students[n % len(students)], owners[n % len(owners)]
+            student = Client(SERVER_NAME='localhost')
+            student.force_login(profile.user)
+            owner = Client(SERVER_NAME='localhost')
+            owner.force_login(vendor.vendor_owner)
+            clients.append({
+                'student': student,
+                'owner': owner,
+                'vendors': [v for v in vendors[profile.university_id] if v in items],
+                'items': items,
+                'vendor_id': vendor.id,
+                'rng': random.Random(rng.random()),
+            })
+        connections.close_all()
+        return clients
+
+    def request(self, scenario, state):
+        """Build one request for the scenario, or None if there is nothing left to do."""
+        rng = state['rng']
+        if scenario == 'home':
+            return state['student'].get, reverse('home'), {}
+        if scenario == 'vendor_menu':
+            return state['student'].get, reverse('vendor_menu', args=[rng.choice(state['vendors'])]), {}
+        if scenario == 'create_order':
+            vendor_id = rng.choice(state['vendors'])
+            cart = [{'id': item_id, 'quantity': rng.randint(1, 3)}
+                    for item_id in rng.sample(state['items'][vendor_id], min(3, len(state['items'][vendor_id])))]
+            body = json.dumps({'vendor_id': vendor_id, 'items': cart})
+            return state['student'].post, reverse('create_order'), {'data': body, 'content_type': 'application/json'}
+        if scenario == 'my_orders':
+            return state['student'].get, reverse('my_orders'), {}
+        if scenario == 'vendor_dashboard':
+            return state['owner'].get, reverse('vendor_dashboard'), {}
+        if scenario == 'update_order_status':
+            queue = state.setdefault('queue', list(
+                Order.objects.filter(vendor_id=state['vendor_id'], status__in=Order.ACTIVE_STATUSES)
+                .values_list('id', 'status')
+            ))
+            if not queue:
+                return None
+            order_id, status = queue.pop(0)
+            if NEXT_STATUS[status] != Order.OrderStatus.COMPLETED:
+                queue.append((order_id, NEXT_STATUS[status]))
+            body = json.dumps({'status': NEXT_STATUS[status]})
+            return (state['owner'].post, reverse('update_order_status', args=[order_id]),
+                    {'data': body, 'content_type': 'application/json'})
+
+    def drive(self, scenario, state, count):
+        samples = []
+        try:
+            for _ in range(count):
+                request = self.request(scenario, state)
+                if request is None:
+                    break
+                send, url, kwargs = request
+                with CaptureQueriesContext(connection) as queries:
+                    started = clock.perf_counter()
+                    response = send(url, **kwargs)
+                    elapsed = clock.perf_counter() - started
+                samples.append((elapsed * 1000, len(queries), response.status_code))
+        finally:
+            connections.close_all()
+        return samples
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        clients = self.setup_clients(options['tag'], options['clients'], rng)
+
+        self.stdout.write(f'{"page":<22}{"n":>6}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+                          f'{"queries":>9}{"max q":>7}{"non-2xx":>9}')
+        with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+            for scenario in options['only'] or SCENARIOS:
+                results = pool.map(lambda state: self.drive(scenario, state, options['requests']), clients)
+                samples = [sample for result in results for sample in result]
+                if not samples:
+                    self.stdout.write(f'{scenario:<22}{0:>6}')
+                    continue
+                latencies = [ms for ms, _, _ in samples]
+                queries = [n for _, n, _ in samples]
+                cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+                failed = sum(1 for _, _, status in samples if not 200 <= status < 300)
+                self.stdout.write(
+                    f'{scenario:<22}{len(samples):>6}{percentile(cuts, 50):>9.1f}{percentile(cuts, 95):>9.1f}'
+                    f'{percentile(cuts, 99):>9.1f}{statistics.mean(queries):>9.1f}{max(queries):>7}{failed:>9}'
+                )
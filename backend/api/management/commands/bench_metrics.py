@@ -0,0 +1,58 @@
+from datetime import time
+import statistics
+import time as clock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from api.models import University, Profile, Vendor, MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Measure what MetricsMiddleware adds to the cost of serving a page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--repeats', type=int, default=5)
+
+    def run(self, middleware, user, url, count):
+        with override_settings(MIDDLEWARE=middleware):
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            client.get(url)
+            started = clock.perf_counter()
+            for _ in range(count):
+                client.get(url)
+            return (clock.perf_counter() - started) / count * 1000
+
+    def handle(self, *args, **options):
+        with_metrics = list(settings.MIDDLEWARE)
+        without = [name for name in with_metrics if name != 'api.middleware.MetricsMiddleware']
+
+        # Everything runs inside a transaction that is rolled back at the end,
+        # so the benchmark leaves no rows behind.
+        with transaction.atomic():
+            university = University.objects.create(name='Bench University', domain='bench.invalid')
+            vendor = Vendor.objects.create(university=university, name='Bench Stall', location='Bench',
+                                           opening_time=time(0, 0), closing_time=time(23, 59))
+            MenuItem.objects.bulk_create([MenuItem(vendor=vendor, name=f'Item {i}', price=10) for i in range(30)])
+            user = User.objects.create_user(username='bench-metrics-user')
+            Profile.objects.create(user=user, university=university, roll_no='1')
+            url = reverse('my_orders')
+
+            base, measured = [], []
+            for _ in range(options['repeats']):
+                base.append(self.run(without, user, url, options['requests']))
+                measured.append(self.run(with_metrics, user, url, options['requests']))
+
+            transaction.set_rollback(True)
+
+        base, measured = statistics.median(base), statistics.median(measured)
+        self.stdout.write(f'without metrics: {base:.3f} ms/request')
+        self.stdout.write(f'with metrics:    {measured:.3f} ms/request')
+        self.stdout.write(f'overhead:        {(measured - base) / base:+.1%}')
@@ -0,0 +1,65 @@
+import asyncio
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api import events
+
+
+class Command(BaseCommand):
+    help = 'Park thousands of idle order-event subscribers, then time delivery of one vendor update.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000)
+        parser.add_argument('--vendors', type=int, default=100,
+                            help='Subscribers are spread evenly over this many vendor channels.')
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options['subscribers'], options['vendors'], options['rounds']))
+
+    async def run(self, count, vendors, rounds):
+        received = asyncio.Queue()
+        # A long heartbeat keeps the subscribers truly idle while they are measured.
+        channels = [[events.vendor_channel(i % vendors)] for i in range(count)]
+
+        async def subscriber(channel):
+            async for chunk in events.stream(channel, heartbeat=3600):
+                if chunk.startswith(b'data:'):
+                    received.put_nowait(time.perf_counter())
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tasks = [asyncio.create_task(subscriber(channel)) for channel in channels]
+        await asyncio.sleep(0.5)
+        per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.stop()
+
+        broker = events.get_broker()
+        target = events.vendor_channel(0)
+        fanout = broker.subscriber_count(target)
+        self.stdout.write(f'{count} idle subscribers, ~{per_subscriber / 1024:.1f} KiB each')
+
+        # Publish from a plain thread, the way a sync view under ASGI does.
+        latencies = []
+        for _ in range(rounds):
+            sent = []
+            publisher = threading.Thread(
+                target=lambda: (sent.append(time.perf_counter()), broker.publish(target, '{}'))
+            )
+            publisher.start()
+            arrivals = [await received.get() for _ in range(fanout)]
+            publisher.join()
+            latencies.append((max(arrivals) - sent[0]) * 1000)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.stdout.write(
+            f'one vendor update to {fanout} subscribers: '
+            f'median {statistics.median(latencies):.2f} ms, worst {max(latencies):.2f} ms'
+        )
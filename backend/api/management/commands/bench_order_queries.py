@@ -0,0 +1,44 @@
+from datetime import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import University, Vendor, MenuItem
+from api.services import place_order
+
+
+class Command(BaseCommand):
+    help = 'Count the SQL queries needed to place orders of different cart sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50])
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+
+        # Everything runs inside a transaction that is rolled back at the end,
+        # so the benchmark leaves no rows behind.
+        with transaction.atomic():
+            university = University.objects.create(name='Bench University', domain='bench.invalid')
+            vendor = Vendor.objects.create(
+                university=university,
+                name='Bench Stall',
+                location='Bench',
+                opening_time=time(0, 0),
+                closing_time=time(23, 59)
+            )
+            user = User.objects.create_user(username='bench-order-user')
+            menu_items = MenuItem.objects.bulk_create([
+                MenuItem(vendor=vendor, name=f'Item {i}', price='49.50')
+                for i in range(max(sizes))
+            ])
+
+            for size in sizes:
+                cart = [{'id': item.id, 'quantity': 2, 'options': []} for item in menu_items[:size]]
+                with CaptureQueriesContext(connection) as ctx:
+                    place_order(user, vendor, cart)
+                self.stdout.write(f'{size:>4} lines: {len(ctx.captured_queries)} queries')
+
+            transaction.set_rollback(True)
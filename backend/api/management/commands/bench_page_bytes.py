@@ -0,0 +1,72 @@
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from api import assets
+from api.models import Profile, Vendor
+
+
+# Stylesheets and scripts the page loads from our own static files.
+ASSET = re.compile(r'<(?:link rel="stylesheet" href|script src)="([^"]+)"')
+
+
+def read_asset(url):
+    name = url[len(settings.STATIC_URL):]
+    path = finders.find(name) or (staticfiles_storage.exists(name) and staticfiles_storage.path(name))
+    if not path:
+        raise CommandError(f'{url} is linked from a page but not found; run collectstatic first.')
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+class Command(BaseCommand):
+    help = (
+        'Report the bytes sent per page view, using data made by generate_data. "inline" is what the '
+        'page cost while its CSS and JavaScript were inlined: the HTML plus every asset, uncompressed, '
+        'on every view. "first" is the HTML plus the compressed bundles; "repeat" is a later view, '
+        'once the browser holds the fingerprinted bundles. HTML is counted uncompressed throughout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', default='gen', help='The --tag the data was generated with.')
+
+    def pages(self, tag):
+        profile = Profile.objects.filter(user__username__startswith=f'{tag}-student-').select_related('user').first()
+        vendor = Vendor.objects.filter(vendor_owner__username__startswith=f'{tag}-owner-').select_related('vendor_owner').first()
+        if profile is None or vendor is None:
+            raise CommandError(f'No data tagged "{tag}"; run generate_data first.')
+        menu = Vendor.objects.filter(university_id=profile.university_id).values_list('id', flat=True).first() or vendor.id
+
+        anonymous, student, owner = (Client(SERVER_NAME='localhost') for _ in range(3))
+        student.force_login(profile.user)
+        owner.force_login(vendor.vendor_owner)
+        return [
+            ('login', anonymous, reverse('login')),
+            ('home', student, reverse('home')),
+            ('vendor_menu', student, reverse('vendor_menu', args=[menu])),
+            ('my_orders', student, reverse('my_orders')),
+            ('vendor_dashboard', owner, reverse('vendor_dashboard')),
+        ]
+
+    def handle(self, *args, **options):
+        encoding = 'br' if assets.brotli is not None else 'gzip'
+        self.stdout.write(f'bundles counted {encoding}-compressed')
+        self.stdout.write(f'{"page":<18}{"html":>8}{"assets":>8}{encoding:>8}{"inline":>9}{"first":>9}{"repeat":>9}')
+        totals = [0] * 6
+        for name, client, url in self.pages(options['tag']):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url} answered {response.status_code}.')
+            html = len(response.content)
+            bundles = [read_asset(src) for src in ASSET.findall(response.content.decode()) if not src.startswith('http')]
+            raw = sum(len(bundle) for bundle in bundles)
+            packed = sum(len(assets.compress(bundle)[encoding]) for bundle in bundles)
+            row = [html, raw, packed, html + raw, html + packed, html]
+            totals = [total + value for total, value in zip(totals, row)]
+            self.stdout.write(f'{name:<18}' + ''.join(f'{value:>{width}}' for value, width in zip(row, (8, 8, 8, 9, 9, 9))))
+        self.stdout.write(f'{"all five":<18}' + ''.join(f'{value:>{width}}' for value, width in zip(totals, (8, 8, 8, 9, 9, 9))))
@@ -0,0 +1,72 @@
+from datetime import time
+import random
+import statistics
+import time as clock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg
+
+from api import ratings
+from api.models import University, Vendor, Review
+
+
+class Command(BaseCommand):
+    help = 'Compare stored rating aggregates with AVG() over the reviews when listing vendors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=1_000_000)
+        parser.add_argument('--vendors', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def timed(self, func, rounds):
+        timings = []
+        for _ in range(rounds):
+            started = clock.perf_counter()
+            func()
+            timings.append((clock.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        rng = random.Random(11)
+
+        # Everything runs inside a transaction that is rolled back at the end,
+        # so the benchmark leaves no rows behind.
+        with transaction.atomic():
+            university = University.objects.create(name='Bench University', domain='bench.invalid')
+            vendors = Vendor.objects.bulk_create([
+                Vendor(university=university, name=f'Stall {i}', location='Bench',
+                       opening_time=time(0, 0), closing_time=time(23, 59))
+                for i in range(options['vendors'])
+            ])
+            user = User.objects.create_user(username='bench-ratings-user')
+
+            remaining = options['reviews']
+            while remaining:
+                batch = min(remaining, 10_000)
+                Review.objects.bulk_create([
+                    Review(user=user, vendor=rng.choice(vendors), rating=rng.randint(1, 5))
+                    for _ in range(batch)
+                ])
+                remaining -= batch
+            self.stdout.write(f"{options['reviews']} reviews over {len(vendors)} vendors")
+
+            started = clock.perf_counter()
+            ratings.rebuild()
+            self.stdout.write(f'rebuild from scratch: {clock.perf_counter() - started:.2f} s')
+
+            listing = Vendor.objects.filter(university=university)
+            stored = self.timed(lambda: list(listing.values('id', 'avg_rating')), options['rounds'])
+            live = self.timed(lambda: list(listing.annotate(avg=Avg('review__rating')).values('id', 'avg')),
+                              options['rounds'])
+            self.stdout.write(f'listing with stored averages: {stored:.2f} ms')
+            self.stdout.write(f'listing with AVG() per request: {live:.2f} ms')
+
+            incremental = self.timed(
+                lambda: Review.objects.create(user=user, vendor=rng.choice(vendors), rating=rng.randint(1, 5)),
+                options['rounds']
+            )
+            self.stdout.write(f'one new review, aggregates included: {incremental:.2f} ms')
+
+            transaction.set_rollback(True)
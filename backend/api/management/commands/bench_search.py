@@ -0,0 +1,54 @@
+from datetime import time
+from decimal import Decimal
+import random
+import statistics
+import time as clock
+
+from django.core.management.base import BaseCommand
+
+from api.models import Vendor, MenuItem
+from api.search import UniversityIndex, parse
+
+
+DISHES = ['paneer tikka', 'paneer roll', 'chicken biryani', 'veg biryani', 'masala dosa', 'cold coffee',
+          'aloo paratha', 'chole bhature', 'maggi', 'egg roll', 'veg momos', 'chicken momos', 'samosa', 'chai']
+CATEGORIES = ['Snacks', 'Main Course', 'Beverages', 'Rolls', 'South Indian', 'Chinese']
+QUERIES = ['paneer under ₹100, veg, open now', 'biryani', 'momo', 'cold cofee', 'rolls under 60', 'chai open now']
+
+
+class Command(BaseCommand):
+    help = 'Time searches against an in-memory index of synthetic vendors and dishes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=200)
+        parser.add_argument('--items', type=int, default=60, help='Dishes per vendor.')
+        parser.add_argument('--rounds', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        index = UniversityIndex()
+        # Unsaved model instances: the index only reads their attributes.
+        for v in range(options['vendors']):
+            index.put_vendor(Vendor(
+                id=v, name=f'Stall {v}', description='Campus food, fresh and fast',
+                opening_time=time(0, 0), closing_time=time(23, 59)
+            ))
+            for i in range(options['items']):
+                index.put_item(MenuItem(
+                    id=v * options['items'] + i, vendor_id=v, name=rng.choice(DISHES),
+                    category=rng.choice(CATEGORIES), short_description='House special',
+                    price=Decimal(rng.randrange(20, 300)), is_veg=rng.random() < 0.6
+                ))
+
+        self.stdout.write(f"{len(index.docs)} documents indexed")
+        for text in QUERIES:
+            query = parse(text)
+            timings = []
+            for _ in range(options['rounds']):
+                started = clock.perf_counter()
+                results = index.search(query)
+                timings.append((clock.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'{text!r:40} {len(results["items"]):>3} dishes  '
+                f'median {statistics.median(timings):.2f} ms  p99 {sorted(timings)[int(len(timings) * 0.99) - 1]:.2f} ms'
+            )
@@ -0,0 +1,186 @@
+from datetime import time, timedelta
+from decimal import Decimal
+import json
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api import directory, load, menu, ratings, sales
+from api.bulk import explicit_timestamps
+from api.models import University, Profile, Vendor, MenuItem, Order, OrderItem, Review
+
+
+CATEGORIES = {
+    'Snacks': ['Samosa', 'Vada Pav', 'Kachori', 'Aloo Tikki', 'Bread Pakora', 'French Fries'],
+    'Main Course': ['Paneer Butter Masala', 'Dal Makhani', 'Chicken Biryani', 'Veg Biryani', 'Rajma Chawal'],
+    'Rolls': ['Paneer Roll', 'Egg Roll', 'Chicken Roll', 'Aloo Roll'],
+    'South Indian': ['Masala Dosa', 'Idli Sambhar', 'Uttapam', 'Medu Vada'],
+    'Chinese': ['Veg Momos', 'Chicken Momos', 'Hakka Noodles', 'Chilli Paneer', 'Fried Rice'],
+    'Beverages': ['Chai', 'Cold Coffee', 'Lassi', 'Nimbu Pani', 'Mango Shake'],
+}
+NON_VEG = ('Chicken', 'Egg')
+OPTIONS = [None, ['Extra Cheese', 'Less Spicy'], ['Half', 'Full'], ['Sugar', 'No Sugar'], ['Add Butter']]
+
+
+def next_id(model):
+    # Primary keys are assigned up front because bulk_create does not return
+    # them on every backend (MySQL in particular).
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a realistic, production-sized synthetic dataset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', default='gen', help='Prefix for generated names; must not be in use yet.')
+        parser.add_argument('--universities', type=int, default=5)
+        parser.add_argument('--vendors', type=int, default=20, help='Vendors per university.')
+        parser.add_argument('--items-min', type=int, default=50)
+        parser.add_argument('--items-max', type=int, default=300)
+        parser.add_argument('--students', type=int, default=100_000)
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--reviews', type=int, default=200_000)
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many past days.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def bulk(self, model, objs):
+        for start in range(0, len(objs), self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(objs[start:start + self.batch_size])
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        tag = options['tag']
+        self.batch_size = options['batch_size']
+        if University.objects.filter(name__startswith=f'{tag} ').exists():
+            raise CommandError(f'Data tagged "{tag}" already exists; pick another --tag.')
+
+        # Hashing is deliberately slow, so every generated user shares one hash.
+        password = make_password('password')
+        now = timezone.now()
+
+        university_id = next_id(University)
+        universities = [
+            University(id=university_id + u, name=f'{tag} University {u}', domain=f'u{u}.{tag}.invalid')
+            for u in range(options['universities'])
+        ]
+        self.bulk(University, universities)
+
+        user_id = next_id(User)
+        owners, vendors = [], []
+        vendor_id = next_id(Vendor)
+        for university in universities:
+            for v in range(options['vendors']):
+                owner = User(id=user_id, username=f'{tag}-owner-{university.id}-{v}', password=password)
+                user_id += 1
+                owners.append(owner)
+                vendors.append(Vendor(
+                    id=vendor_id, university_id=university.id, vendor_owner_id=owner.id,
+                    name=f'{rng.choice(["Annapurna", "Campus", "Chai", "Tandoor", "Dosa", "Momo"])} '
+                         f'{rng.choice(["Corner", "Point", "Hub", "Express", "Kitchen"])} {v}',
+                    location=f'Block {chr(65 + v % 8)}', description='Fresh, fast and easy on the pocket.',
+                    opening_time=time(rng.choice([7, 8, 9, 11]), 0),
+                    closing_time=time(rng.choice([17, 20, 22, 23]), 30),
+                    vendor_type=rng.choice(Vendor.ServiceType.values),
+                    max_orders=rng.choice([10, 20, 40]),
+                ))
+                vendor_id += 1
+        self.bulk(User, owners)
+        self.bulk(Vendor, vendors)
+        self.stdout.write(f'{len(universities)} universities, {len(vendors)} vendors')
+
+        item_id = next_id(MenuItem)
+        items, items_by_vendor = [], {}
+        for vendor in vendors:
+            for i in range(rng.randint(options['items_min'], options['items_max'])):
+                category = rng.choice(list(CATEGORIES))
+                name = rng.choice(CATEGORIES[category])
+                items.append(MenuItem(
+                    id=item_id, vendor_id=vendor.id, category=category, name=f'{name} {i}',
+                    short_description=f'House {name.lower()}',
+                    price=Decimal(rng.randrange(15, 350)), is_veg=not name.startswith(NON_VEG),
+                    is_available=rng.random() > 0.05, options=rng.choice(OPTIONS),
+                ))
+                items_by_vendor.setdefault(vendor.id, []).append(items[-1])
+                item_id += 1
+        self.bulk(MenuItem, items)
+        self.stdout.write(f'{len(items)} menu items')
+
+        students, profiles = [], []
+        for s in range(options['students']):
+            students.append(User(id=user_id, username=f'{tag}-student-{s}', password=password))
+            profiles.append(Profile(user_id=user_id, university_id=rng.choice(universities).id, roll_no=str(s)))
+            user_id += 1
+        self.bulk(User, students)
+        self.bulk(Profile, profiles)
+        self.stdout.write(f'{len(students)} students')
+
+        vendors_by_university = {}
+        for vendor in vendors:
+            vendors_by_university.setdefault(vendor.university_id, []).append(vendor)
+
+        order_id, order_item_id = next_id(Order), next_id(OrderItem)
+        finished = [(Order.OrderStatus.COMPLETED, 0.9), (Order.OrderStatus.REJECTED, 0.1)]
+        written = 0
+        with explicit_timestamps(Order):
+            while written < options['orders']:
+                size = min(self.batch_size, options['orders'] - written)
+                orders, lines = [], []
+                for _ in range(size):
+                    profile = rng.choice(profiles)
+                    vendor = rng.choice(vendors_by_university[profile.university_id])
+                    created = now - timedelta(days=rng.random() * options['days'])
+                    # Only orders from the last hour can still be in the kitchen.
+                    if now - created < timedelta(hours=1):
+                        status = rng.choice(Order.ACTIVE_STATUSES)
+                    else:
+                        status = rng.choices([s for s, _ in finished], [w for _, w in finished])[0]
+                    total = Decimal('0.00')
+                    menu_items = items_by_vendor[vendor.id]
+                    for item in rng.sample(menu_items, rng.randint(1, min(4, len(menu_items)))):
+                        quantity = rng.randint(1, 3)
+                        total += item.price * quantity
+                        lines.append(OrderItem(
+                            id=order_item_id, order_id=order_id, menu_item_id=item.id, quantity=quantity,
+                            price=item.price, customization=json.dumps(item.options[:1] if item.options else [])
+                        ))
+                        order_item_id += 1
+                    orders.append(Order(
+                        id=order_id, user_id=profile.user_id, vendor_id=vendor.id, total_amount=total,
+                        status=status, created_at=created,
+                        # Never in the future, or update polls and their ETags would jump ahead.
+                        updated_at=min(now, created + timedelta(minutes=rng.randint(5, 40))),
+                    ))
+                    order_id += 1
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders)
+                    OrderItem.objects.bulk_create(lines)
+                written += size
+                self.stdout.write(f'  {written} orders', ending='\r')
+        self.stdout.write(f'{written} orders')
+
+        reviews = []
+        for _ in range(options['reviews']):
+            profile = rng.choice(profiles)
+            vendor = rng.choice(vendors_by_university[profile.university_id])
+            item = rng.choice(items_by_vendor[vendor.id]) if rng.random() < 0.5 else None
+            reviews.append(Review(user_id=profile.user_id, vendor_id=vendor.id, item=item,
+                                  rating=rng.choices([1, 2, 3, 4, 5], [1, 1, 3, 5, 4])[0]))
+        self.bulk(Review, reviews)
+        self.stdout.write(f'{len(reviews)} reviews')
+
+        # Bulk inserts skip the signals that normally keep derived data current.
+        load.reconcile([vendor.id for vendor in vendors])
+        ratings.rebuild()
+        sales.backfill(self.batch_size, [vendor.id for vendor in vendors])
+        for university in universities:
+            directory.invalidate(university.id)
+        for vendor in vendors:
+            menu.bump(vendor.id)
+        self.stdout.write(self.style.SUCCESS('Done. Every generated user logs in with "password".'))
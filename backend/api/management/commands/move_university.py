@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import rebalance, shards
+
+
+class Command(BaseCommand):
+    help = "Move a university's vendors and orders to another database shard while it stays online."
+
+    def add_arguments(self, parser):
+        parser.add_argument('university', type=int, help='Id of the university to move.')
+        parser.add_argument('shard', choices=shards.aliases(), help='Database alias to move it to.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--settle', type=float,
+                            help='Seconds to wait for every process to see a shard map change '
+                                 '(default: SHARD_MAP_SECONDS).')
+        parser.add_argument('--keep-source', action='store_true',
+                            help='Leave the copied rows on the old shard.')
+
+    def handle(self, *args, **options):
+        try:
+            copied = rebalance.move(options['university'], options['shard'], options['batch_size'],
+                                    options['settle'], options['keep_source'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Moved university {options['university']} to {options['shard']} ({copied} rows).")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import shards, snapshots
+from api.models import Vendor
+
+
+class Command(BaseCommand):
+    help = 'Write the JSON menu snapshot of every vendor (or the given ones) to STATIC_ROOT/menus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('vendor_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        if not snapshots.enabled():
+            raise CommandError('Menu snapshots are off; set MENU_SNAPSHOTS (KHANAKHALO_MENU_SNAPSHOTS=1).')
+        published = 0
+        for _ in shards.each():
+            vendors = Vendor.objects.order_by('pk')
+            if options['vendor_ids']:
+                vendors = vendors.filter(pk__in=options['vendor_ids'])
+            for vendor_id in vendors.values_list('pk', flat=True):
+                snapshots.publish(vendor_id)
+                published += 1
+        self.stdout.write(f'Published {published} menus to {snapshots.root()}.')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import ratings, shards
+
+
+class Command(BaseCommand):
+    help = 'Recompute rating sums, counts and averages for every vendor and menu item from the reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = sum(ratings.rebuild(options['batch_size']) for _ in shards.each())
+        self.stdout.write(f'Rebuilt ratings for {written} vendor(s) and menu item(s).')
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import load, shards
+
+
+class Command(BaseCommand):
+    help = 'Recompute Vendor.current_orders from the orders that are still active.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', type=int, action='append', dest='vendor_ids',
+                            help='Only reconcile this vendor (can be repeated).')
+        parser.add_argument('--every', type=int, default=0,
+                            help='Keep running and reconcile every N seconds.')
+
+    def handle(self, *args, **options):
+        while True:
+            corrected = sum(load.reconcile(options['vendor_ids']) for _ in shards.each())
+            self.stdout.write(f'Corrected {corrected} vendor(s).')
+            if not options['every']:
+                break
+            time.sleep(options['every'])
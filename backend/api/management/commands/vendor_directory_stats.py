@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import directory
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the cached vendor directory.'
+
+    def handle(self, *args, **options):
+        counts = directory.stats()
+        total = counts['hits'] + counts['misses']
+        ratio = counts['hits'] / total if total else 0
+        self.stdout.write(f"hits: {counts['hits']}  misses: {counts['misses']}  hit ratio: {ratio:.1%}")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.cache import cache
+
+
+def _key(vendor_id):
+    return f'menu-version:{vendor_id}'
+
+
+def version(vendor_id):
+    """
+    Current version of a vendor's menu page, in microseconds since the epoch.
+
+    The version doubles as the page's modification time. If it has been
+    evicted from the cache it restarts at the current time, which only costs
+    one full render per client.
+    """
+    now = time.time_ns() // 1000
+    return cache.get_or_set(_key(vendor_id), now, None)
+
+
+def bump(vendor_id):
+    """Mark the vendor's menu as changed, orphaning every fragment cached under the old version."""
+    cache.set(_key(vendor_id), time.time_ns() // 1000, None)
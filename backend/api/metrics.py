@@ -0,0 +1,102 @@
+from bisect import bisect_left
+from collections import defaultdict
+import threading
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _ViewStats:
+    __slots__ = ('latency', 'queries', 'sql_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = defaultdict(int)
+
+
+class Registry:
+    """
+    Per-view request counters kept in process memory.
+
+    Every observation is a handful of integer additions under one lock, so
+    recording costs microseconds. Each worker process exports its own
+    numbers; Prometheus adds them up across the instances it scrapes.
+    """
+
+    def __init__(self):
+        self._views = defaultdict(_ViewStats)
+        self._lock = threading.Lock()
+
+    def observe(self, view, status, seconds, queries, sql_seconds, response_bytes):
+        with self._lock:
+            stats = self._views[view]
+            stats.latency.observe(seconds)
+            stats.queries.observe(queries)
+            stats.sql_seconds += sql_seconds
+            stats.response_bytes += response_bytes
+            stats.statuses[f'{status // 100}xx'] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """All counters in the Prometheus text exposition format."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            def histogram(name, help_text, attr):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, stats in views:
+                    hist = getattr(stats, attr)
+                    running = 0
+                    for bound, count in zip(hist.bounds, hist.counts):
+                        running += count
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {running}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {hist.count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {hist.sum}')
+                    lines.append(f'{name}_count{{view="{view}"}} {hist.count}')
+
+            def counter(name, help_text, value):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for view, stats in views:
+                    lines.append(f'{name}{{view="{view}"}} {value(stats)}')
+
+            histogram('khanakhalo_request_duration_seconds', 'Time spent handling a request.', 'latency')
+            histogram('khanakhalo_request_sql_queries', 'SQL queries issued per request.', 'queries')
+            counter('khanakhalo_request_sql_seconds_total', 'Time spent waiting on SQL.',
+                    lambda stats: stats.sql_seconds)
+            counter('khanakhalo_response_bytes_total', 'Bytes in non-streaming response bodies.',
+                    lambda stats: stats.response_bytes)
+
+            lines.append('# HELP khanakhalo_requests_total Requests by status class.')
+            lines.append('# TYPE khanakhalo_requests_total counter')
+            for view, stats in views:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'khanakhalo_requests_total{{view="{view}",status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
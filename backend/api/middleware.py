@@ -0,0 +1,236 @@
+from contextlib import ExitStack
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
+
+from . import assets, context, metrics, routers, shards
+
+
+logger = logging.getLogger('api.slow_requests')
+
+
+class _SyncAndAsync:
+    """
+    Base for middleware that runs as plain sync code under WSGI and stays on
+    the event loop under ASGI, so async views are not pushed into a thread.
+    Subclasses implement call() and acall().
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+
+class StaticAssetsMiddleware(_SyncAndAsync):
+    """
+    Serve collected static files (see api.assets.serve) before the rest of
+    the stack runs, so asset requests skip sessions, auth and the database.
+    The production profile puts it first; in development runserver serves
+    static files itself.
+    """
+
+    def call(self, request):
+        response = assets.serve(request)
+        return self.get_response(request) if response is None else response
+
+    async def acall(self, request):
+        response = assets.serve(request)
+        return await self.get_response(request) if response is None else response
+
+
+class KhanaContextMiddleware(_SyncAndAsync):
+    """
+    Attach request.khana_ctx, a cached snapshot of the user's university,
+    roll number and managed vendor.
+
+    The snapshot is built on first use after login and then read from the
+    cache, so views no longer join through user.profile or
+    user.managed_vendor. Must come after AuthenticationMiddleware. Async
+    views resolve it with context.aget() instead of touching the lazy object.
+    """
+
+    def call(self, request):
+        request.khana_ctx = SimpleLazyObject(lambda: context.get(request.user))
+        return self.get_response(request)
+
+    async def acall(self, request):
+        request.khana_ctx = SimpleLazyObject(lambda: context.get(request.user))
+        return await self.get_response(request)
+
+
+class ShardMiddleware(_SyncAndAsync):
+    """
+    Make the shard of the user's university active for the whole request.
+
+    While the university is being moved to another shard, requests that
+    could write are turned away with a 503 and a Retry-After instead of
+    writing to a copy that is about to be left behind, and reads see
+    shards.is_moving() so they skip their own writes. Must come after
+    KhanaContextMiddleware; does nothing while there is only one shard.
+    """
+
+    def call(self, request):
+        if len(shards.aliases()) == 1 or not request.user.is_authenticated:
+            return self.get_response(request)
+        university_id = request.khana_ctx.home_university_id
+        if university_id is None:
+            return self.get_response(request)
+
+        placement = shards.placement(university_id)
+        if self._blocked(request, placement):
+            return self._busy()
+        with shards.active(placement.alias, moving=placement.moving):
+            return self.get_response(request)
+
+    async def acall(self, request):
+        if len(shards.aliases()) == 1:
+            return await self.get_response(request)
+        university_id = (await context.aget(await request.auser())).home_university_id
+        if university_id is None:
+            return await self.get_response(request)
+
+        placement = await sync_to_async(shards.placement)(university_id)
+        if self._blocked(request, placement):
+            return self._busy()
+        with shards.active(placement.alias, moving=placement.moving):
+            return await self.get_response(request)
+
+    @staticmethod
+    def _blocked(request, placement):
+        return placement.moving and request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+    @staticmethod
+    def _busy():
+        response = JsonResponse(
+            {'status': 'busy', 'message': 'Your campus is being moved to a new server; try again in a moment.'},
+            status=503
+        )
+        response['Retry-After'] = str(shards.MAP_SECONDS)
+        return response
+
+
+class ReplicaPinMiddleware(_SyncAndAsync):
+    """
+    Keep a user's reads on the primary database while their writes may not
+    have reached the replicas yet.
+
+    Requests that can write (anything but GET, HEAD and OPTIONS) read from
+    the primary throughout. When one succeeds, a short-lived cookie pins the
+    browser's next REPLICA_PIN_SECONDS of requests to the primary too, so a
+    student who just placed an order sees it on My Orders. Should come
+    before SessionMiddleware so session reads are pinned as well.
+    """
+
+    cookie_name = 'kk_primary'
+
+    def call(self, request):
+        if not self._pins(request):
+            return self.get_response(request)
+        with routers.pinned():
+            return self._remember(request, self.get_response(request))
+
+    async def acall(self, request):
+        if not self._pins(request):
+            return await self.get_response(request)
+        with routers.pinned():
+            return self._remember(request, await self.get_response(request))
+
+    def _pins(self, request):
+        return bool(routers.replicas()) and (self._writes(request) or self.cookie_name in request.COOKIES)
+
+    @staticmethod
+    def _writes(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+    def _remember(self, request, response):
+        if self._writes(request) and response.status_code < 400:
+            response.set_cookie(self.cookie_name, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class _QueryRecorder:
+    """execute_wrapper that counts and times every SQL statement of a request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.queries.append((elapsed, sql))
+
+
+class MetricsMiddleware(_SyncAndAsync):
+    """
+    Record latency, SQL query count, SQL time and response size per view.
+
+    The numbers go to api.metrics.registry and are served at /metrics.
+    Requests slower than SLOW_REQUEST_MS are logged together with their
+    slowest queries. Should come first, so it times the whole stack.
+    """
+
+    def call(self, request):
+        recorder = _QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self._watch(stack, recorder)
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def acall(self, request):
+        recorder = _QueryRecorder()
+        started = time.perf_counter()
+        stack = ExitStack()
+        # The async ORM runs a request's queries on that request's sync
+        # thread, so the wrappers go onto that thread's connections.
+        await sync_to_async(self._watch)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    @staticmethod
+    def _watch(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    @staticmethod
+    def _record(request, response, elapsed, recorder):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+        metrics.registry.observe(view, response.status_code, elapsed, recorder.count, recorder.seconds, size)
+
+        if elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            slowest = sorted(recorder.queries, key=lambda query: query[0], reverse=True)[:10]
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms, %d queries, %.0f ms in SQL\n%s',
+                request.method, request.path, view, elapsed * 1000, recorder.count, recorder.seconds * 1000,
+                '\n'.join(f'  {seconds * 1000:7.1f} ms  {sql}' for seconds, sql in slowest)
+            )
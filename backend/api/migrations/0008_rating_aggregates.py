@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:15
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    # The aggregates start at zero; fill them from the reviews already written.
+    alias = schema_editor.connection.alias
+    Review = apps.get_model('api', 'Review')
+    for model_name, column in (('Vendor', 'vendor_id'), ('MenuItem', 'item_id')):
+        model = apps.get_model('api', model_name)
+        totals = (
+            Review.objects.using(alias).exclude(**{column: None})
+            .values(column).annotate(total=Sum('rating'), n=Count('id')).order_by()
+        )
+        for row in totals:
+            model.objects.using(alias).filter(pk=row[column]).update(
+                rating_sum=row['total'],
+                rating_count=row['n'],
+                avg_rating=(Decimal(row['total']) / row['n']).quantize(Decimal('0.01')),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_order_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=8)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Approval'), ('ACCEPTED', 'Cooking / Processing'), ('READY', 'Ready for Pickup'), ('COMPLETED', 'Completed'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('order_method', models.CharField(choices=[('PICKUP', 'Pickup'), ('DELIVERY', 'Delivery')], max_length=10)),
+                ('lines', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='api.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='archived_user_created_idx'), models.Index(fields=['vendor', 'created_at', 'id'], name='archived_vendor_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(db_index=True)),
+                ('from_status', models.CharField(choices=[('PENDING', 'Pending Approval'), ('ACCEPTED', 'Cooking / Processing'), ('READY', 'Ready for Pickup'), ('COMPLETED', 'Completed'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('to_status', models.CharField(choices=[('PENDING', 'Pending Approval'), ('ACCEPTED', 'Cooking / Processing'), ('READY', 'Ready for Pickup'), ('COMPLETED', 'Completed'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('seconds_in_previous', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='api.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'to_status', 'created_at'], name='status_event_vendor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_order_status_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='pickup_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedorder',
+            name='status',
+            field=models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('PENDING', 'Pending Approval'), ('ACCEPTED', 'Cooking / Processing'), ('READY', 'Ready for Pickup'), ('COMPLETED', 'Completed'), ('REJECTED', 'Rejected')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('PENDING', 'Pending Approval'), ('ACCEPTED', 'Cooking / Processing'), ('READY', 'Ready for Pickup'), ('COMPLETED', 'Completed'), ('REJECTED', 'Rejected')], default='PENDING', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='orderstatusevent',
+            name='from_status',
+            field=models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('PENDING', 'Pending Approval'), ('ACCEPTED', 'Cooking / Processing'), ('READY', 'Ready for Pickup'), ('COMPLETED', 'Completed'), ('REJECTED', 'Rejected')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='orderstatusevent',
+            name='to_status',
+            field=models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('PENDING', 'Pending Approval'), ('ACCEPTED', 'Cooking / Processing'), ('READY', 'Ready for Pickup'), ('COMPLETED', 'Completed'), ('REJECTED', 'Rejected')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PickupSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('reserved', models.PositiveIntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pickup_slots', to='api.vendor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'starts_at', 'shard'), name='pickup_slot_key')],
+            },
+        ),
+    ]
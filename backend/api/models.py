@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from decimal import Decimal
 import json
 
 class University(models.Model):
@@ -9,6 +10,10 @@ class University(models.Model):
     address = models.CharField(max_length=255, blank=True)
     logo_url = models.URLField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Database alias holding the university's vendors and orders (see api.shards);
+    # moving_to is set while move_university copies them to another shard.
+    shard = models.CharField(max_length=64, default='default')
+    moving_to = models.CharField(max_length=64, blank=True)
 
     class Meta:
         verbose_name_plural = "Universities"
@@ -27,7 +32,11 @@ class Profile(models.Model):
         return self.user.username
 
 class Vendor(models.Model):
-    vendor_owner = models.OneToOneField(User, on_delete=models.CASCADE, related_name='managed_vendor', null=True, blank=True)
+    # Vendors and everything below them may live on another database than
+    # users and universities (see api.shards), so those keys are not enforced
+    # by the database.
+    vendor_owner = models.OneToOneField(User, on_delete=models.CASCADE, related_name='managed_vendor', null=True, blank=True,
+                                        db_constraint=False)
 
     class ServiceType(models.TextChoices):
         RESTAURANT = 'RESTAURANT', 'Restaurant'
@@ -41,7 +50,7 @@ class Vendor(models.Model):
         NON_VEG = 'NON_VEG', 'Non-Veg Available'
         BOTH = 'BOTH', 'Veg & Non-Veg'
 
-    university = models.ForeignKey(University, on_delete=models.CASCADE)
+    university = models.ForeignKey(University, on_delete=models.CASCADE, db_constraint=False)
     name = models.CharField(max_length=100)
     location = models.CharField(max_length=255) 
     description = models.TextField(blank=True, help_text="A short, catchy description of the vendor.")
@@ -60,6 +69,8 @@ class Vendor(models.Model):
     current_orders = models.PositiveIntegerField(default=0)
     max_orders = models.PositiveIntegerField(default=10)
     avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     @property
@@ -89,6 +100,8 @@ class MenuItem(models.Model):
     is_available = models.BooleanField(default=True)
     options = models.JSONField(blank=True, null=True)
     avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -97,6 +110,7 @@ class MenuItem(models.Model):
 
 class Order(models.Model):
     class OrderStatus(models.TextChoices):
+        SCHEDULED = 'SCHEDULED', 'Scheduled'
         PENDING = 'PENDING', 'Pending Approval'
         ACCEPTED = 'ACCEPTED', 'Cooking / Processing'
         READY = 'READY', 'Ready for Pickup'
@@ -107,19 +121,79 @@ class Order(models.Model):
         PICKUP = 'PICKUP', 'Pickup'
         DELIVERY = 'DELIVERY', 'Delivery'
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    ACTIVE_STATUSES = (OrderStatus.PENDING, OrderStatus.ACCEPTED, OrderStatus.READY)
+    FINISHED_STATUSES = (OrderStatus.COMPLETED, OrderStatus.REJECTED)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders', db_constraint=False)
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='orders')
     
     total_amount = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, choices=OrderStatus.choices, default=OrderStatus.PENDING)
     order_method = models.CharField(max_length=10, choices=OrderMethod.choices, default=OrderMethod.PICKUP)
+    # Set for orders placed ahead for a pickup slot; they wait as SCHEDULED
+    # until the kitchen needs to start on them.
+    pickup_at = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', 'status', 'created_at'], name='order_vendor_status_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            models.Index(fields=['vendor', 'updated_at'], name='order_vendor_updated_idx'),
+            models.Index(fields=['user', 'updated_at'], name='order_user_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+class PickupSlot(models.Model):
+    """
+    One shard of a vendor's capacity for a pickup slot.
+
+    Each slot's capacity is split over several rows so that a rush on one
+    slot spreads its reservations over several rows instead of queueing on
+    one (see api.slots).
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='pickup_slots')
+    starts_at = models.DateTimeField()
+    shard = models.PositiveSmallIntegerField()
+    capacity = models.PositiveIntegerField()
+    reserved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'starts_at', 'shard'], name='pickup_slot_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} @ {self.starts_at} #{self.shard}: {self.reserved}/{self.capacity}"
+
+
+class OrderStatusEvent(models.Model):
+    """
+    One step of an order through the kitchen; rows are only ever appended.
+
+    order_id is a plain column rather than a foreign key so the history
+    outlives the order when it is archived.
+    """
+    order_id = models.BigIntegerField(db_index=True)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    to_status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    # How long the order sat in from_status before this step.
+    seconds_in_previous = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', 'to_status', 'created_at'], name='status_event_vendor_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -131,12 +205,13 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.menu_item.name}"
 
 class Review(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, blank=True, null=True)
     item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, blank=True, null=True)
     rating = models.PositiveIntegerField() 
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
@@ -144,4 +219,82 @@ class Review(models.Model):
                 check=models.Q(vendor__isnull=False) | models.Q(item__isnull=False),
                 name='review_must_be_for_vendor_or_item'
             )
-        ]
\ No newline at end of file
+        ]
+
+class ArchivedOrder(models.Model):
+    """
+    A finished order moved out of the hot Order/OrderItem tables by api.archive.
+
+    The row keeps the order's id, and its items are folded into one JSON
+    column, so an archived order is read back with a single row and no joins.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders', db_constraint=False)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='archived_orders')
+
+    total_amount = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
+    status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    order_method = models.CharField(max_length=10, choices=Order.OrderMethod.choices)
+    lines = models.JSONField(default=list)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='archived_user_created_idx'),
+            models.Index(fields=['vendor', 'created_at', 'id'], name='archived_vendor_created_idx'),
+        ]
+
+    @property
+    def items(self):
+        # Quacks like order.items so templates and JSON helpers need no special case.
+        return ArchivedItems(self.lines)
+
+    def __str__(self):
+        return f"Archived order #{self.id}"
+
+
+class ArchivedItems:
+
+    class Line:
+        def __init__(self, data):
+            self.menu_item = MenuItem(id=data['menu_item_id'], name=data['name'])
+            self.quantity = data['quantity']
+            self.price = Decimal(data['price'])
+            self.customization = data.get('customization')
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def all(self):
+        return [self.Line(data) for data in self._lines]
+
+    def count(self):
+        return len(self._lines)
+
+
+class SalesRollup(models.Model):
+    """
+    Completed sales of one menu item in one local hour, kept current by api.sales.
+
+    Analytics read these rows instead of the order tables, so a report costs
+    the same however many orders a vendor has taken.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='sales')
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='sales')
+
+    quantity = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'day', 'hour', 'menu_item'], name='sales_rollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} @ {self.day} {self.hour:02d}:00"
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+import heapq
+
+from django.db.models import Q
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+MAX_ID = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor from the client cannot be decoded."""
+
+
+def to_micros(dt):
+    """Exact integer microseconds since the epoch, safe to round-trip through JSON."""
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(micros):
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def encode_cursor(obj):
+    """Turn the (created_at, id) of the last row on a page into an opaque string."""
+    return f'{to_micros(obj.created_at)}-{obj.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        micros, pk = (int(part) for part in cursor.split('-'))
+        # Out of range for a datetime or a BIGINT column.
+        if pk > MAX_ID:
+            raise OverflowError
+        return from_micros(micros), pk
+    except (AttributeError, ValueError, OverflowError):
+        raise InvalidCursor(f'Bad cursor "{cursor}".')
+
+
+def keyset_page(queryset, cursor=None, size=20):
+    """
+    Return one page of queryset, newest first, and the cursor for the next one.
+
+    Rows are ordered by (created_at, id) and the page starts strictly after
+    the cursor, so the database seeks straight to it through the index
+    instead of counting past an OFFSET. The cursor is None on the last page.
+    """
+    return _cut(list(_page(queryset, cursor, size)), size)
+
+
+def _page(queryset, cursor, size):
+    # One row more than the page, to tell whether another page follows.
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return queryset[:size + 1]
+
+
+def _cut(rows, size):
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(rows[-1])
+
+
+def merged_keyset_page(querysets, cursor=None, size=20):
+    """
+    Like keyset_page, over several querysets whose rows share one id space.
+
+    Each queryset contributes at most one page, and the pages are merged in
+    memory; the same cursor then continues every queryset where it left off.
+    """
+    return _merge([keyset_page(queryset, cursor, size) for queryset in querysets], size)
+
+
+async def amerged_keyset_page(querysets, cursor=None, size=20):
+    """merged_keyset_page() through the async ORM."""
+    pages = []
+    for queryset in querysets:
+        pages.append(_cut([row async for row in _page(queryset, cursor, size)], size))
+    return _merge(pages, size)
+
+
+def _merge(pages, size):
+    rows = [page for page, _ in pages]
+    more = any(next_cursor is not None for _, next_cursor in pages)
+    rows = list(heapq.merge(*rows, key=lambda row: (row.created_at, row.id), reverse=True))
+    if len(rows) > size:
+        more = True
+        rows = rows[:size]
+    return rows, encode_cursor(rows[-1]) if more else None
@@ -0,0 +1,119 @@
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Round
+
+from . import directory, menu, shards, snapshots
+from .models import Vendor, MenuItem, Review
+
+
+def _apply(model, pk, delta_sum, delta_count):
+    """
+    Move one running (sum, count) pair and its average in a single UPDATE.
+
+    The new average is computed from the column values inside the statement,
+    so concurrent reviews of the same vendor cannot overwrite each other.
+    """
+    new_sum = _moved('rating_sum', delta_sum)
+    new_count = _moved('rating_count', delta_count)
+    average = ExpressionWrapper(new_sum * Value(1.0) / new_count, output_field=DecimalField())
+    model.objects.filter(pk=pk).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        avg_rating=Case(
+            When(rating_count__lte=-delta_count, then=Value(Decimal('0.00'))),
+            default=Round(average, 2),
+            output_field=DecimalField(),
+        )
+    )
+
+
+def _moved(column, delta):
+    if delta >= 0:
+        return F(column) + delta
+    # The columns are unsigned on MySQL, so a removal that finds the aggregate
+    # already drifted to zero must stop there rather than go below it.
+    return Case(
+        When(**{f'{column}__gt': -delta}, then=F(column) + delta),
+        default=Value(0),
+    )
+
+
+def _targets(vendor_id, item_id):
+    if vendor_id:
+        yield Vendor, vendor_id
+    if item_id:
+        yield MenuItem, item_id
+
+
+def _changed(vendor_ids, item_ids=()):
+    # Ratings are shown on the home page and the menu, both of which are cached,
+    # and in the published menu snapshots.
+    # A review of an item alone still changes the menu of the item's vendor.
+    vendor_ids = {vendor_id for vendor_id in vendor_ids if vendor_id}
+    item_ids = [item_id for item_id in item_ids if item_id]
+    if item_ids:
+        vendor_ids.update(MenuItem.objects.filter(pk__in=item_ids).values_list('vendor_id', flat=True))
+    if not vendor_ids:
+        return
+    for university_id in set(Vendor.objects.filter(pk__in=vendor_ids).values_list('university_id', flat=True)):
+        directory.invalidate(university_id)
+    for vendor_id in vendor_ids:
+        menu.bump(vendor_id)
+        if snapshots.enabled():
+            shards.on_commit(lambda vendor_id=vendor_id: snapshots.publish(vendor_id))
+
+
+def review_saved(review, previous=None):
+    """
+    Fold a new or edited review into the aggregates.
+
+    previous is the (rating, vendor_id, item_id) the review had before an
+    edit, or None for a new review.
+    """
+    if previous is not None:
+        rating, vendor_id, item_id = previous
+        if (rating, vendor_id, item_id) == (review.rating, review.vendor_id, review.item_id):
+            return
+        for model, pk in _targets(vendor_id, item_id):
+            _apply(model, pk, -rating, -1)
+    for model, pk in _targets(review.vendor_id, review.item_id):
+        _apply(model, pk, review.rating, 1)
+    _changed({review.vendor_id, previous and previous[1]}, {review.item_id, previous and previous[2]})
+
+
+def review_deleted(review):
+    for model, pk in _targets(review.vendor_id, review.item_id):
+        _apply(model, pk, -review.rating, -1)
+    _changed({review.vendor_id}, {review.item_id})
+
+
+def rebuild(batch_size=500):
+    """
+    Recompute every aggregate from the Review table, batch_size rows at a time.
+
+    Caches are invalidated once both vendors and items are written, so no
+    page is cached between the two with half of the new figures.
+    Returns the number of vendors and menu items written.
+    """
+    written = 0
+    for model, column in ((Vendor, 'vendor_id'), (MenuItem, 'item_id')):
+        pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            totals = {
+                row[column]: (row['total'], row['n'])
+                for row in Review.objects.filter(**{f'{column}__in': batch})
+                .values(column).annotate(total=Sum('rating'), n=Count('id')).order_by()
+            }
+            objs = []
+            for pk in batch:
+                total, n = totals.get(pk, (0, 0))
+                average = (Decimal(total) / n).quantize(Decimal('0.01')) if n else Decimal('0.00')
+                objs.append(model(pk=pk, rating_sum=total, rating_count=n, avg_rating=average))
+            model.objects.bulk_update(objs, ['rating_sum', 'rating_count', 'avg_rating'])
+            written += len(objs)
+    vendor_ids = list(Vendor.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(vendor_ids), batch_size):
+        _changed(vendor_ids[start:start + batch_size])
+    return written
@@ -0,0 +1,189 @@
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from . import directory, shards, signals
+from .bulk import explicit_timestamps
+from .models import (
+    ArchivedOrder, MenuItem, Order, OrderItem, OrderStatusEvent, PickupSlot, Review, SalesRollup, University, Vendor
+)
+
+
+logger = logging.getLogger('api.rebalance')
+
+# Parents before children, so a copied row never points at a missing one.
+MODELS = [Vendor, MenuItem, Review, Order, OrderItem, ArchivedOrder, SalesRollup, OrderStatusEvent, PickupSlot]
+
+# Rows that are only ever inserted, with increasing keys; everything else can
+# change in place or be deleted and is caught up while writes are held off.
+# (Archived orders keep their order's key, so they are not among these.)
+APPEND_ONLY = {OrderItem, OrderStatusEvent}
+
+# Rows are stamped by the clocks of every app server, which may run behind the
+# database's; the catch-up looks this much further back to allow for that.
+CLOCK_MARGIN = timedelta(seconds=getattr(settings, 'SHARD_MOVE_CLOCK_MARGIN_SECONDS', 60))
+
+
+def _rows(model, alias, vendor_ids):
+    rows = model.objects.using(alias)
+    if model is Vendor:
+        return rows.filter(pk__in=vendor_ids)
+    if model is OrderItem:
+        return rows.filter(order__vendor_id__in=vendor_ids)
+    if model is Review:
+        return rows.filter(Q(vendor_id__in=vendor_ids) | Q(item__vendor_id__in=vendor_ids))
+    return rows.filter(vendor_id__in=vendor_ids)
+
+
+def _copy(rows, target, batch_size, after=0, overwrite=False):
+    """
+    Copy rows to target in primary key order, starting after the key after.
+
+    Rows already on the target are skipped, or overwritten with overwrite.
+    Returns the last key copied.
+    """
+    model = rows.model
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    options = {'update_conflicts': True, 'unique_fields': ['pk'], 'update_fields': fields} if overwrite \
+        else {'ignore_conflicts': True}
+    with explicit_timestamps(model):
+        while True:
+            batch = list(rows.filter(pk__gt=after).order_by('pk')[:batch_size])
+            if not batch:
+                return after
+            model.objects.using(target).bulk_create(batch, **options)
+            after = batch[-1].pk
+
+
+def _changed(model, rows, vendor_ids, since, after):
+    """
+    The rows of model the catch-up copies again: those that may have changed
+    since since, and any added after the key after.
+    """
+    if model in (Vendor, MenuItem):
+        # A campus's vendors and menus are few, and their counters and ratings
+        # move through UPDATEs that stamp no time, so they are copied whole.
+        return rows
+    if model in (Order, Review):
+        return rows.filter(Q(updated_at__gte=since) | Q(pk__gt=after))
+    if model is ArchivedOrder:
+        return rows.filter(archived_at__gte=since)
+    # Slots and rollups only move with an order: a slot when one is booked or
+    # cancelled, the rollup of its day when it completes.
+    orders = _rows(Order, rows.db, vendor_ids).filter(updated_at__gte=since)
+    if model is PickupSlot:
+        return rows.filter(Q(pk__gt=after) | Q(starts_at__in=orders.exclude(pickup_at=None).values('pickup_at')))
+    days = {timezone.localdate(created_at) for created_at in orders.values_list('created_at', flat=True)}
+    return rows.filter(Q(pk__gt=after) | Q(day__in=days))
+
+
+def _delete_missing(source_rows, target_rows, batch_size):
+    """
+    Delete the target rows that are gone from the source, batch_size keys at a time.
+
+    Each batch of target keys costs one COUNT over its key range on the
+    source; only ranges that lost rows are compared key by key.
+    """
+    after = 0
+    while True:
+        batch = list(target_rows.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        after = batch[-1]
+        in_range = source_rows.filter(pk__gte=batch[0], pk__lte=after)
+        if in_range.count() == len(batch):
+            continue
+        kept = set(in_range.values_list('pk', flat=True))
+        with signals.quiet():
+            target_rows.filter(pk__in=[pk for pk in batch if pk not in kept]).delete()
+
+
+def _database_now(alias):
+    # Any table will do for reading the clock; this one exists on every database.
+    return MigrationRecorder.Migration.objects.using(alias).annotate(now=Now()).values_list('now', flat=True).first()
+
+
+def _place(university_id, **fields):
+    University.objects.filter(pk=university_id).update(**fields)
+    shards.shard_map.reset()
+
+
+def move(university_id, target, batch_size=1000, settle=None, keep_source=False):
+    """
+    Move a university's vendors, menus, reviews and orders to the target shard.
+
+    1. Everything is copied while the campus keeps working.
+    2. The university is marked as moving; once every process has seen that
+       (settle seconds, the shard map's lifetime) writes are turned away by
+       ShardMiddleware, and whatever changed during the copy is copied again
+       and whatever was deleted is deleted from the target, so the pause
+       grows with the changes rather than with the campus.
+    3. The shard map is pointed at the target. Writes stay held off for one
+       more settle period so no process writes to the old shard from a stale
+       map, then the flag is cleared.
+    4. The old rows are deleted unless keep_source is set.
+
+    Ids are kept, so every shard must hand out distinct ids. Returns the
+    number of rows copied in the first pass.
+    """
+    settle = shards.MAP_SECONDS if settle is None else settle
+    university = University.objects.get(pk=university_id)
+    source = university.shard
+    if target == source:
+        raise ValueError(f'{university} is already on {target}.')
+    if target not in shards.aliases():
+        raise ValueError(f'Unknown shard "{target}".')
+
+    copied_vendor_ids = list(
+        Vendor.objects.using(source).filter(university_id=university_id).values_list('pk', flat=True)
+    )
+    started = _database_now(source) - CLOCK_MARGIN
+    copied_up_to, copied = {}, 0
+    for model in MODELS:
+        rows = _rows(model, source, copied_vendor_ids)
+        copied += rows.count()
+        copied_up_to[model] = _copy(rows, target, batch_size)
+        logger.info('Copied %s rows of %s to %s.', model.__name__, university, target)
+
+    _place(university_id, moving_to=target)
+    time.sleep(settle)
+
+    # Writes are held off from here on; catch up on what changed meanwhile.
+    vendor_ids = list(Vendor.objects.using(source).filter(university_id=university_id).values_list('pk', flat=True))
+    # Vendors deleted during the copy are still on the target.
+    moved_ids = {*copied_vendor_ids, *vendor_ids}
+    for model in MODELS:
+        rows = _rows(model, source, moved_ids)
+        if model in APPEND_ONLY:
+            _copy(rows, target, batch_size, after=copied_up_to[model])
+        elif model is ArchivedOrder:
+            # Never deleted, so there is nothing to reconcile.
+            _copy(_changed(model, rows, moved_ids, started, copied_up_to[model]), target, batch_size)
+        else:
+            _copy(_changed(model, rows, moved_ids, started, copied_up_to[model]), target, batch_size, overwrite=True)
+            # Such as archived orders, removed menu items and reviews, or a closed vendor's whole menu.
+            _delete_missing(rows, _rows(model, target, moved_ids), batch_size)
+
+    _place(university_id, shard=target)
+    time.sleep(settle)
+    _place(university_id, moving_to='')
+    directory.invalidate(university_id)
+
+    if not keep_source:
+        for model in reversed(MODELS):
+            rows = _rows(model, source, vendor_ids)
+            while True:
+                ids = list(rows.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                # Quietly, or the vendors would be dropped from the search
+                # index and caches, which now serve the target.
+                with signals.quiet():
+                    model.objects.using(source).filter(pk__in=ids).delete()
+    return copied
@@ -0,0 +1,157 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from . import shards
+
+
+logger = logging.getLogger('api.routers')
+
+# A replica that failed its health check is left alone for this long.
+HEALTH_CHECK_SECONDS = getattr(settings, 'DATABASE_REPLICA_HEALTH_CHECK_SECONDS', 10)
+
+_pinned = ContextVar('khana_pinned_to_primary', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+@contextmanager
+def pinned():
+    """Send every read inside the block to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class _Health:
+    """When each replica was last checked in this process, and whether it answered."""
+
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def is_up(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+            if checked is not None and now - checked[0] < HEALTH_CHECK_SECONDS:
+                return checked[1]
+            # Claim the check so other threads keep the old answer meanwhile.
+            self._checked[alias] = (now, checked[1] if checked else True)
+        up = self.check(alias)
+        with self._lock:
+            self._checked[alias] = (now, up)
+        return up
+
+    @staticmethod
+    def check(alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except DatabaseError:
+            logger.warning('Read replica %s is unreachable; reading from the primary.', alias, exc_info=True)
+            connections[alias].close()
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+health = _Health()
+_turns = itertools.count()
+
+
+def choose():
+    """A healthy replica in round-robin order, or the primary if none is."""
+    aliases = replicas()
+    start = next(_turns)
+    for offset in range(len(aliases)):
+        alias = aliases[(start + offset) % len(aliases)]
+        if health.is_up(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Send writes to the primary and spread reads over DATABASE_REPLICAS.
+
+    Reads stay on the primary while pinned: inside pinned(), for every
+    request that writes, and for a short while after it (see
+    ReplicaPinMiddleware), so users see their own orders straight away.
+    They also stay there inside a transaction on the primary, which must
+    see its own writes.
+    Objects loaded from one database keep reading their relations from it.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in (DEFAULT_DB_ALIAS, *replicas()):
+            return instance._state.db
+        # Inside a transaction on the primary, a replica could not see what
+        # the transaction has written so far.
+        if not replicas() or is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return choose()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ShardRouter:
+    """
+    Send queries on sharded models to the active shard (see api.shards).
+
+    Has no opinion on anything on the default shard, so ReplicaRouter after
+    it still spreads those reads over the replicas. Rows keep using the
+    shard they were loaded from, and every shard gets the full schema.
+    """
+
+    def _shard(self, model, hints):
+        if not shards.is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in shards.aliases():
+            alias = instance._state.db
+        else:
+            alias = shards.current()
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if shards.is_sharded(obj1) or shards.is_sharded(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in shards.aliases():
+            return True
+        return None
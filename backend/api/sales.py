@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import shards
+from .models import ArchivedOrder, MenuItem, Order, OrderItem, SalesRollup, Vendor
+
+
+def _bucket(created_at):
+    local = timezone.localtime(created_at)
+    return local.date(), local.hour
+
+
+class _Totals:
+    """Sales folded into (vendor, day, hour, menu item) keys before they are written."""
+
+    def __init__(self):
+        self.quantity = defaultdict(int)
+        self.revenue = defaultdict(Decimal)
+        self.orders = defaultdict(set)
+
+    def add(self, order_id, vendor_id, created_at, menu_item_id, quantity, price):
+        key = (vendor_id, *_bucket(created_at), menu_item_id)
+        self.quantity[key] += quantity
+        self.revenue[key] += Decimal(price) * quantity
+        self.orders[key].add(order_id)
+
+    def write(self):
+        """
+        Add the totals to the rollup rows, creating rows that do not exist yet.
+
+        Each key is one UPDATE that increments the columns in place, so
+        concurrent writers add up instead of overwriting each other.
+        """
+        for key, quantity in self.quantity.items():
+            vendor_id, day, hour, menu_item_id = key
+            row = SalesRollup.objects.filter(vendor_id=vendor_id, day=day, hour=hour, menu_item_id=menu_item_id)
+            increment = {
+                'quantity': F('quantity') + quantity,
+                'orders': F('orders') + len(self.orders[key]),
+                'revenue': F('revenue') + self.revenue[key],
+            }
+            if row.update(**increment):
+                continue
+            try:
+                with shards.atomic():
+                    SalesRollup.objects.create(
+                        vendor_id=vendor_id, day=day, hour=hour, menu_item_id=menu_item_id,
+                        quantity=quantity, orders=len(self.orders[key]), revenue=self.revenue[key],
+                    )
+            except IntegrityError:
+                # Someone created the row between our UPDATE and INSERT.
+                row.update(**increment)
+
+
+def record_completed(order_ids):
+    """Count freshly completed orders into the rollups, with one read of their items."""
+    totals = _Totals()
+    for row in OrderItem.objects.filter(order_id__in=order_ids).values_list(
+        'order_id', 'order__vendor_id', 'order__created_at', 'menu_item_id', 'quantity', 'price'
+    ):
+        totals.add(*row)
+    totals.write()
+
+
+def backfill(batch_size=1000, vendor_ids=None):
+    """
+    Rebuild the rollups from every completed order, hot and archived.
+
+    Each vendor is rebuilt in one transaction, so its report never shows
+    the rollups half deleted or half refilled. Orders are read in id ranges
+    of batch_size, and only those that finished before a cutoff taken ahead
+    of the reads are counted, in both tables alike; anything completed
+    later is recorded by record_completed() as usual, so nothing is counted
+    twice. Returns the number of orders counted.
+    """
+    if vendor_ids is None:
+        vendor_ids = list(Vendor.objects.order_by('pk').values_list('pk', flat=True))
+    counted = 0
+    for vendor_id in vendor_ids:
+        with shards.atomic():
+            SalesRollup.objects.filter(vendor_id=vendor_id).delete()
+            cutoff = timezone.now()
+            counted += _rebuild(vendor_id, cutoff, batch_size)
+    return counted
+
+
+def _rebuild(vendor_id, cutoff, batch_size):
+    counted = 0
+    for model in (Order, ArchivedOrder):
+        queryset = model.objects.filter(vendor_id=vendor_id, status=Order.OrderStatus.COMPLETED, updated_at__lt=cutoff)
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            totals = _Totals()
+            if model is Order:
+                for row in OrderItem.objects.filter(order_id__in=batch).values_list(
+                    'order_id', 'order__vendor_id', 'order__created_at', 'menu_item_id', 'quantity', 'price'
+                ):
+                    totals.add(*row)
+            else:
+                for order in ArchivedOrder.objects.filter(pk__in=batch).only('vendor_id', 'created_at', 'lines'):
+                    for line in order.lines:
+                        totals.add(order.id, order.vendor_id, order.created_at,
+                                   line['menu_item_id'], line['quantity'], line['price'])
+            totals.write()
+            counted += len(batch)
+    return counted
+
+
+def _money(value):
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def report(vendor_id, days=30, top=10):
+    """Daily revenue, best-selling items and busiest hours of the last days days."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = SalesRollup.objects.filter(vendor_id=vendor_id, day__gte=since).order_by()
+
+    daily = rows.values('day').annotate(revenue=Sum('revenue'), items_sold=Sum('quantity')).order_by('day')
+    by_item = list(
+        rows.values('menu_item_id').annotate(revenue=Sum('revenue'), items_sold=Sum('quantity'))
+        .order_by('-items_sold', '-revenue')[:top]
+    )
+    names = dict(MenuItem.objects.filter(pk__in=[row['menu_item_id'] for row in by_item]).values_list('id', 'name'))
+    hourly = rows.values('hour').annotate(revenue=Sum('revenue'), items_sold=Sum('quantity')).order_by('hour')
+
+    return {
+        'since': since.isoformat(),
+        'days': [
+            {'day': row['day'].isoformat(), 'revenue': _money(row['revenue']), 'items_sold': row['items_sold']}
+            for row in daily
+        ],
+        'top_items': [
+            {'id': row['menu_item_id'], 'name': names.get(row['menu_item_id'], ''),
+             'revenue': _money(row['revenue']), 'items_sold': row['items_sold']}
+            for row in by_item
+        ],
+        'peak_hours': sorted(
+            ({'hour': row['hour'], 'revenue': _money(row['revenue']), 'items_sold': row['items_sold']} for row in hourly),
+            key=lambda row: -row['items_sold']
+        ),
+    }
@@ -0,0 +1,336 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+import heapq
+import re
+import threading
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Vendor, MenuItem
+
+
+# Field weights: a hit in a name counts for more than one in a description.
+NAME, CATEGORY, TEXT = 3, 2, 1
+
+# Share of a query word's trigrams a document must contain to count as a match.
+MIN_OVERLAP = 0.6
+
+_WORD = re.compile(r'\w+')
+_NON_VEG = re.compile(r'\bnon[\s-]?veg(?:etarian)?\b')
+_VEG = re.compile(r'\b(?:pure\s+)?veg(?:etarian)?\b')
+_OPEN_NOW = re.compile(r'\bopen(?:\s+now)?\b')
+_MAX_PRICE = re.compile(r'\b(?:under|below|upto|up\s+to|less\s+than)\s*(?:rs\.?|₹)?\s*(\d+(?:\.\d+)?)|<\s*(?:rs\.?|₹)?\s*(\d+(?:\.\d+)?)')
+_MIN_PRICE = re.compile(r'\b(?:over|above|more\s+than)\s*(?:rs\.?|₹)?\s*(\d+(?:\.\d+)?)|>\s*(?:rs\.?|₹)?\s*(\d+(?:\.\d+)?)')
+
+
+def tokenize(text):
+    return _WORD.findall((text or '').lower())
+
+
+def grams(word):
+    """Trigrams of a word; words shorter than three letters are their own gram."""
+    if len(word) < 3:
+        return {word}
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+@dataclass
+class Query:
+    words: list
+    veg: bool = None
+    open_now: bool = False
+    max_price: Decimal = None
+    min_price: Decimal = None
+
+
+def parse(text):
+    """
+    Split free text into search words and filters.
+
+    "paneer under ₹100, veg, open now" becomes the word "paneer" with a
+    price cap of 100, a veg-only filter and an open-now filter.
+    """
+    text = (text or '').lower()
+    query = Query(words=[])
+
+    def take(pattern, text):
+        match = pattern.search(text)
+        if not match:
+            return None, text
+        return match, text[:match.start()] + ' ' + text[match.end():]
+
+    match, text = take(_MAX_PRICE, text)
+    if match:
+        query.max_price = Decimal(match.group(1) or match.group(2))
+    match, text = take(_MIN_PRICE, text)
+    if match:
+        query.min_price = Decimal(match.group(1) or match.group(2))
+    match, text = take(_NON_VEG, text)
+    if match:
+        query.veg = False
+    else:
+        match, text = take(_VEG, text)
+        if match:
+            query.veg = True
+    match, text = take(_OPEN_NOW, text)
+    query.open_now = match is not None
+
+    query.words = tokenize(text)
+    return query
+
+
+@dataclass
+class _Doc:
+    key: tuple
+    data: dict
+    grams: dict = field(default_factory=dict)
+    tokens: dict = field(default_factory=dict)
+
+
+class UniversityIndex:
+    """
+    Inverted trigram index over the vendors and dishes of one university.
+
+    Each document keeps the gram and token weights it contributed, so it can
+    be removed or replaced without touching the rest of the index.
+    """
+
+    def __init__(self, generation=None):
+        self.generation = generation
+        self.docs = {}
+        self.vendors = {}
+        self.postings = defaultdict(dict)
+        self.lock = threading.Lock()
+
+    def _add(self, doc, fields):
+        for text, weight in fields:
+            for token in tokenize(text):
+                doc.tokens[token] = max(doc.tokens.get(token, 0), weight)
+                for gram in grams(token):
+                    doc.grams[gram] = max(doc.grams.get(gram, 0), weight)
+        for gram, weight in doc.grams.items():
+            self.postings[gram][doc.key] = weight
+        self.docs[doc.key] = doc
+
+    def _remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for gram in doc.grams:
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self.postings[gram]
+
+    def put_vendor(self, vendor):
+        with self.lock:
+            self._remove(('vendor', vendor.id))
+            self.vendors[vendor.id] = {
+                'opening_time': vendor.opening_time,
+                'closing_time': vendor.closing_time,
+                'name': vendor.name,
+            }
+            self._add(
+                _Doc(('vendor', vendor.id), {
+                    'id': vendor.id,
+                    'name': vendor.name,
+                    'has_veg': vendor.dietary_focus != Vendor.DietaryFocus.NON_VEG,
+                    'has_non_veg': vendor.dietary_focus != Vendor.DietaryFocus.VEG_ONLY,
+                }),
+                [(vendor.name, NAME), (vendor.description, TEXT), (vendor.get_vendor_type_display(), CATEGORY)]
+            )
+
+    def remove_vendor(self, vendor_id):
+        with self.lock:
+            self._remove(('vendor', vendor_id))
+            self.vendors.pop(vendor_id, None)
+            for key in [key for key, doc in self.docs.items() if doc.data.get('vendor_id') == vendor_id]:
+                self._remove(key)
+
+    def put_item(self, item):
+        with self.lock:
+            self._remove(('item', item.id))
+            self._add(
+                _Doc(('item', item.id), {
+                    'id': item.id,
+                    'vendor_id': item.vendor_id,
+                    'name': item.name,
+                    'category': item.category,
+                    'price': item.price,
+                    'is_veg': item.is_veg,
+                    'is_available': item.is_available,
+                }),
+                [(item.name, NAME), (item.category, CATEGORY), (item.short_description, TEXT)]
+            )
+
+    def remove_item(self, item_id):
+        with self.lock:
+            self._remove(('item', item_id))
+
+    def _score(self, words):
+        if not words:
+            return {key: 0 for key in self.docs}
+
+        scores = None
+        for word in words:
+            word_grams = grams(word)
+            hits = defaultdict(int)
+            weights = defaultdict(int)
+            for gram in word_grams:
+                for key, weight in self.postings.get(gram, {}).items():
+                    hits[key] += 1
+                    weights[key] = max(weights[key], weight)
+
+            word_scores = {}
+            for key, count in hits.items():
+                overlap = count / len(word_grams)
+                if overlap < MIN_OVERLAP:
+                    continue
+                exact = self.docs[key].tokens.get(word, 0)
+                word_scores[key] = weights[key] * overlap + exact
+
+            # Every word has to match, so keep only documents matched so far.
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {key: scores[key] + s for key, s in word_scores.items() if key in scores}
+            if not scores:
+                break
+        return scores or {}
+
+    def search(self, query, limit=20):
+        now = timezone.localtime(timezone.now()).time()
+
+        def is_open(vendor_id):
+            vendor = self.vendors.get(vendor_id)
+            return vendor is not None and vendor['opening_time'] <= now <= vendor['closing_time']
+
+        with self.lock:
+            scored = self._score(query.words)
+            vendors, items = [], []
+            for key, score in scored.items():
+                data = self.docs[key].data
+                if key[0] == 'vendor':
+                    if query.open_now and not is_open(data['id']):
+                        continue
+                    if query.veg is True and not data['has_veg']:
+                        continue
+                    if query.veg is False and not data['has_non_veg']:
+                        continue
+                    # A price only makes sense for dishes.
+                    if query.max_price is not None or query.min_price is not None:
+                        continue
+                    vendors.append((score, data))
+                else:
+                    if query.open_now and not is_open(data['vendor_id']):
+                        continue
+                    if query.veg is not None and data['is_veg'] != query.veg:
+                        continue
+                    if query.max_price is not None and data['price'] > query.max_price:
+                        continue
+                    if query.min_price is not None and data['price'] < query.min_price:
+                        continue
+                    items.append((score, data))
+
+            by_rank = lambda pair: (-pair[0], pair[1]['name'])
+            vendors = [dict(data, is_open=is_open(data['id'])) for _, data in heapq.nsmallest(limit, vendors, key=by_rank)]
+            items = [
+                dict(data, vendor=self.vendors.get(data['vendor_id'], {}).get('name', ''), price=str(data['price']))
+                for _, data in heapq.nsmallest(limit, items, key=by_rank)
+            ]
+        return {'vendors': vendors, 'items': items}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _generation_key(university_id):
+    return f'search-generation:{university_id}'
+
+
+def _build(university_id, generation):
+    index = UniversityIndex(generation)
+    for vendor in Vendor.objects.filter(university_id=university_id):
+        index.put_vendor(vendor)
+    for item in MenuItem.objects.filter(vendor__university_id=university_id):
+        index.put_item(item)
+    return index
+
+
+def get_index(university_id):
+    """
+    The index for a university, built on first use.
+
+    Changes made in this process are applied to the index in place by the
+    model signals. They also move a generation counter in the shared cache,
+    which tells other processes to rebuild their copy on the next search.
+    """
+    generation = cache.get(_generation_key(university_id), 0)
+    index = _indexes.get(university_id)
+    if index is None or index.generation != generation:
+        index = _build(university_id, generation)
+        with _indexes_lock:
+            _indexes[university_id] = index
+    return index
+
+
+def search(university_id, text, limit=20):
+    return get_index(university_id).search(parse(text), limit)
+
+
+def _touch(university_id):
+    """Apply a local change: move the shared generation and keep our index current with it."""
+    key = _generation_key(university_id)
+    cache.add(key, 0, None)
+    try:
+        generation = cache.incr(key)
+    except ValueError:
+        generation = None
+    index = _indexes.get(university_id)
+    if index is not None:
+        if index.generation is not None and generation == index.generation + 1:
+            index.generation = generation
+            return index
+        # Another process changed this university too; rebuild lazily.
+        with _indexes_lock:
+            _indexes.pop(university_id, None)
+    return None
+
+
+def vendor_saved(vendor):
+    for university_id, index in list(_indexes.items()):
+        if university_id != vendor.university_id and ('vendor', vendor.id) in index.docs:
+            index.remove_vendor(vendor.id)
+            _touch(university_id)
+    index = _touch(vendor.university_id)
+    if index is not None:
+        index.put_vendor(vendor)
+
+
+def vendor_deleted(vendor):
+    index = _touch(vendor.university_id)
+    if index is not None:
+        index.remove_vendor(vendor.id)
+
+
+def item_saved(item):
+    if item.vendor_id is None:
+        return
+    index = _touch(item.vendor.university_id)
+    if index is not None:
+        index.put_item(item)
+
+
+def item_deleted(item):
+    if item.vendor_id is None:
+        return
+    university_id = Vendor.objects.filter(pk=item.vendor_id).values_list('university_id', flat=True).first()
+    if university_id is None:
+        return
+    index = _touch(university_id)
+    if index is not None:
+        index.remove_item(item.id)
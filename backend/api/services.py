@@ -0,0 +1,212 @@
+from decimal import Decimal
+import json
+
+from django.utils import timezone
+
+from . import estimates, events, load, sales, shards, slots
+from .models import MenuItem, Order, OrderItem, OrderStatusEvent, Vendor
+
+
+class OrderError(Exception):
+    """Raised when a cart cannot be turned into an order."""
+
+
+class SlotFull(OrderError):
+    """Raised when the chosen pickup slot has no places left."""
+
+
+class VendorBusy(OrderError):
+    """Raised when the vendor already has max_orders active orders."""
+
+    def __init__(self, vendor, wait_minutes):
+        self.vendor = vendor
+        self.wait_minutes = wait_minutes
+        if wait_minutes is None:
+            message = f'{vendor.name} is not taking orders right now.'
+        else:
+            message = f'{vendor.name} is too busy right now. Try again in about {wait_minutes} min.'
+        super().__init__(message)
+
+
+def _turn_away(vendor):
+    current, limit = Vendor.objects.filter(pk=vendor.pk).values_list('current_orders', 'max_orders').get()
+    return VendorBusy(vendor, load.estimated_wait(current, limit))
+
+
+def _parse_cart(cart_items):
+    if not cart_items:
+        raise OrderError('Your cart is empty.')
+
+    lines = []
+    for item in cart_items:
+        try:
+            item_id = int(item['id'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            raise OrderError('Invalid cart item.')
+        if quantity < 1:
+            raise OrderError('Quantity must be at least 1.')
+        lines.append((item_id, quantity, item.get('options', [])))
+    return lines
+
+
+def place_order(user, vendor, cart_items, method=Order.OrderMethod.PICKUP, pickup_at=None):
+    """
+    Create an order and all of its items in a single transaction.
+
+    Every menu item in the cart is fetched with one query and the order
+    items are written with one bulk insert, so the number of queries does
+    not grow with the size of the cart. A slot is reserved on the vendor's
+    load counter before anything is inserted; if the vendor is already at
+    max_orders, VendorBusy is raised and nothing is written.
+
+    With pickup_at, a place in that pickup slot is reserved instead and the
+    order waits as SCHEDULED until api.slots releases it to the kitchen;
+    SlotFull is raised if the slot is taken.
+    """
+    method = (method or Order.OrderMethod.PICKUP).upper()
+    if method not in Order.OrderMethod.values:
+        raise OrderError(f'Unknown order method "{method}".')
+    if pickup_at is not None and not slots.is_bookable(vendor, pickup_at):
+        raise OrderError('That pickup time is not available.')
+
+    lines = _parse_cart(cart_items)
+
+    with shards.atomic():
+        menu_items = MenuItem.objects.in_bulk({item_id for item_id, _, _ in lines})
+
+        total = Decimal('0.00')
+        for item_id, quantity, _ in lines:
+            menu_item = menu_items.get(item_id)
+            if menu_item is None or menu_item.vendor_id != vendor.id:
+                raise OrderError(f'Item {item_id} is not on this menu.')
+            if not menu_item.is_available:
+                raise OrderError(f'{menu_item.name} is sold out.')
+            total += menu_item.price * quantity
+
+        if pickup_at is not None:
+            if not slots.reserve(vendor, pickup_at):
+                raise SlotFull(f'The {timezone.localtime(pickup_at):%H:%M} pickup slot is full; pick another time.')
+        elif not load.reserve_slot(vendor.id):
+            raise _turn_away(vendor)
+
+        order = Order.objects.create(
+            user=user,
+            vendor=vendor,
+            total_amount=total,
+            order_method=method,
+            status=Order.OrderStatus.SCHEDULED if pickup_at is not None else Order.OrderStatus.PENDING,
+            pickup_at=pickup_at
+        )
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                menu_item=menu_items[item_id],
+                quantity=quantity,
+                price=menu_items[item_id].price,
+                customization=json.dumps(options)
+            )
+            for item_id, quantity, options in lines
+        ])
+
+        events.order_changed(order, 'created')
+        if pickup_at is None:
+            shards.on_commit(lambda: estimates.order_placed(vendor.id))
+
+    return order
+
+
+# The statuses an order may be moved to, and the statuses it may come from.
+TRANSITIONS = {
+    Order.OrderStatus.ACCEPTED: (Order.OrderStatus.PENDING,),
+    Order.OrderStatus.READY: (Order.OrderStatus.ACCEPTED,),
+    Order.OrderStatus.COMPLETED: (Order.OrderStatus.READY,),
+    Order.OrderStatus.REJECTED: (Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED),
+}
+
+# Per-order outcomes of transition_orders().
+MOVED = 'moved'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+INVALID = 'invalid'
+CONFLICT = 'conflict'
+
+
+def transition_orders(vendor_id, order_ids, new_status):
+    """
+    Move many of a vendor's orders to new_status at once.
+
+    Orders are grouped by the status they are expected to be in, and each
+    group is moved by one conditional UPDATE that also checks the vendor, so
+    an order that another click moved in the meantime is left alone. Orders
+    that finish give their slots back in one more UPDATE, every step is
+    appended to the status log, and completed orders are added to the sales
+    rollups. Returns a dict of
+    order id to outcome (MOVED, NOT_FOUND, FORBIDDEN, INVALID or CONFLICT).
+    """
+    if new_status not in TRANSITIONS:
+        raise OrderError(f'Unknown order status "{new_status}".')
+    try:
+        order_ids = {int(order_id) for order_id in order_ids}
+    except (TypeError, ValueError):
+        raise OrderError('Invalid order id.')
+
+    results = dict.fromkeys(order_ids, NOT_FOUND)
+    rows = Order.objects.filter(pk__in=order_ids).values_list('id', 'vendor_id', 'user_id', 'status', 'updated_at')
+
+    expected = {}
+    customers = {}
+    since = {}
+    for order_id, owner_id, user_id, status, updated_at in rows:
+        if owner_id != vendor_id:
+            results[order_id] = FORBIDDEN
+        elif status not in TRANSITIONS[new_status]:
+            results[order_id] = INVALID
+        else:
+            expected.setdefault(status, []).append(order_id)
+            customers[order_id] = user_id
+            since[order_id] = updated_at
+
+    now = timezone.now()
+    with shards.atomic():
+        finished = 0
+        completed = []
+        log = []
+        for status, ids in expected.items():
+            updated = Order.objects.filter(pk__in=ids, vendor_id=vendor_id, status=status).update(
+                status=new_status, updated_at=now
+            )
+            if updated == len(ids):
+                moved = ids
+            else:
+                # Some orders changed between the read and the UPDATE; the
+                # ones that carry our timestamp are the ones we moved.
+                moved = set(Order.objects.filter(pk__in=ids, status=new_status, updated_at=now)
+                            .values_list('id', flat=True))
+            for order_id in ids:
+                results[order_id] = MOVED if order_id in moved else CONFLICT
+            log.extend(
+                OrderStatusEvent(order_id=order_id, vendor_id=vendor_id, from_status=status, to_status=new_status,
+                                 seconds_in_previous=max(0, int((now - since[order_id]).total_seconds())),
+                                 created_at=now)
+                for order_id in moved
+            )
+            if new_status == Order.OrderStatus.COMPLETED:
+                completed.extend(moved)
+            if new_status in Order.FINISHED_STATUSES and status in Order.ACTIVE_STATUSES:
+                finished += len(moved)
+
+        load.release_order(vendor_id, finished)
+        OrderStatusEvent.objects.bulk_create(log)
+        if completed:
+            sales.record_completed(completed)
+        shards.on_commit(lambda: estimates.orders_moved(vendor_id, new_status, log, finished))
+
+        for order_id, outcome in results.items():
+            if outcome == MOVED:
+                order = Order(id=order_id, vendor_id=vendor_id, user_id=customers[order_id],
+                              status=new_status, updated_at=now)
+                events.order_changed(order, 'status')
+
+    return results
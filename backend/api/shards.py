@@ -0,0 +1,119 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+# How long a process trusts its copy of the shard map. Moving a university
+# waits this long at each step, so every process has seen the step before
+# the next one starts.
+MAP_SECONDS = getattr(settings, 'SHARD_MAP_SECONDS', 10)
+
+# The api models whose rows live on their university's shard; everything
+# else (users, profiles, universities, sessions) stays on the default database.
+SHARDED_MODELS = frozenset({
+    'vendor', 'menuitem', 'review', 'order', 'orderitem',
+    'archivedorder', 'salesrollup', 'orderstatusevent', 'pickupslot',
+})
+
+Placement = namedtuple('Placement', 'alias moving')
+
+_current = ContextVar('khana_shard', default=DEFAULT_DB_ALIAS)
+_moving = ContextVar('khana_shard_moving', default=False)
+
+
+def aliases():
+    return getattr(settings, 'DATABASE_SHARDS', [DEFAULT_DB_ALIAS])
+
+
+def is_sharded(model):
+    # Works on instances too, including lazy ones such as request.user.
+    return model._meta.app_label == 'api' and model._meta.model_name in SHARDED_MODELS
+
+
+def current():
+    """The shard queries on sharded models go to in this context."""
+    return _current.get()
+
+
+def is_moving():
+    """Whether the request's university is being moved off the active shard, so nothing may be written to it."""
+    return _moving.get()
+
+
+@contextmanager
+def active(alias, moving=False):
+    token = _current.set(alias)
+    moving_token = _moving.set(moving)
+    try:
+        yield alias
+    finally:
+        _moving.reset(moving_token)
+        _current.reset(token)
+
+
+def each():
+    """Make every shard active in turn, for jobs that cover all universities."""
+    for alias in aliases():
+        with active(alias):
+            yield alias
+
+
+def atomic():
+    return transaction.atomic(using=current())
+
+
+def on_commit(func):
+    transaction.on_commit(func, using=current())
+
+
+class _Map:
+    """Where each university lives, reloaded in one query every MAP_SECONDS."""
+
+    def __init__(self):
+        self._placements = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, university_id):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= MAP_SECONDS:
+            self.load()
+        return self._placements.get(university_id, Placement(DEFAULT_DB_ALIAS, False))
+
+    def load(self):
+        from .models import University
+
+        placements = {
+            university_id: Placement(shard, bool(moving_to))
+            for university_id, shard, moving_to in University.objects.values_list('id', 'shard', 'moving_to')
+        }
+        with self._lock:
+            self._placements = placements
+            self._loaded_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._placements = {}
+            self._loaded_at = None
+
+
+shard_map = _Map()
+
+
+def placement(university_id):
+    return shard_map.get(university_id)
+
+
+def for_university(university_id):
+    return placement(university_id).alias
+
+
+@contextmanager
+def university(university_id):
+    """Make the shard holding university_id active."""
+    with active(for_university(university_id)):
+        yield
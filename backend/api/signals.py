@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import context, directory, menu, ratings, search, shards, snapshots
+from .models import University, Profile, Vendor, MenuItem, Review
+
+
+_quiet = ContextVar('khana_signals_quiet', default=False)
+
+
+@contextmanager
+def quiet():
+    """
+    Skip the handlers below, for rows deleted while a university moves between
+    shards: nothing really changed, and the caches, search index and rating
+    aggregates already follow the copy that stays.
+    """
+    token = _quiet.set(True)
+    try:
+        yield
+    finally:
+        _quiet.reset(token)
+
+
+def _unless_quiet(handler):
+    @wraps(handler)
+    def wrapper(sender, instance, **kwargs):
+        if not _quiet.get():
+            handler(sender, instance, **kwargs)
+    return wrapper
+
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+@_unless_quiet
+def invalidate_vendor_directory(sender, instance, **kwargs):
+    directory.invalidate(instance.university_id)
+    menu.bump(instance.id)
+
+
+@receiver(post_save, sender=Vendor)
+@_unless_quiet
+def index_vendor(sender, instance, **kwargs):
+    search.vendor_saved(instance)
+
+
+@receiver(post_delete, sender=Vendor)
+@_unless_quiet
+def unindex_vendor(sender, instance, **kwargs):
+    search.vendor_deleted(instance)
+
+
+@receiver(post_save, sender=University)
+@_unless_quiet
+def invalidate_university_directory(sender, instance, **kwargs):
+    directory.invalidate(instance.id)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@_unless_quiet
+def bump_menu_version(sender, instance, **kwargs):
+    if instance.vendor_id:
+        menu.bump(instance.vendor_id)
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+@receiver([post_save, post_delete], sender=MenuItem)
+@_unless_quiet
+def publish_menu_snapshot(sender, instance, **kwargs):
+    vendor_id = instance.id if sender is Vendor else instance.vendor_id
+    if vendor_id and snapshots.enabled():
+        shards.on_commit(lambda: snapshots.publish(vendor_id))
+
+
+@receiver(post_save, sender=MenuItem)
+@_unless_quiet
+def index_menu_item(sender, instance, **kwargs):
+    search.item_saved(instance)
+
+
+@receiver(post_delete, sender=MenuItem)
+@_unless_quiet
+def unindex_menu_item(sender, instance, **kwargs):
+    search.item_deleted(instance)
+
+
+@receiver(pre_save, sender=Review)
+@_unless_quiet
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('rating', 'vendor_id', 'item_id').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+@_unless_quiet
+def aggregate_review(sender, instance, created, **kwargs):
+    ratings.review_saved(instance, None if created else getattr(instance, '_previous_rating', None))
+
+
+@receiver(post_delete, sender=Review)
+@_unless_quiet
+def unaggregate_review(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+@_unless_quiet
+def invalidate_profile_context(sender, instance, **kwargs):
+    context.invalidate(instance.user_id)
+
+
+@receiver(pre_save, sender=Vendor)
+@_unless_quiet
+def remember_previous_owner(sender, instance, **kwargs):
+    instance._previous_owner_id = None
+    if instance.pk:
+        instance._previous_owner_id = (
+            Vendor.objects.filter(pk=instance.pk).values_list('vendor_owner_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+@_unless_quiet
+def invalidate_owner_context(sender, instance, **kwargs):
+    context.invalidate(instance.vendor_owner_id)
+    context.invalidate(getattr(instance, '_previous_owner_id', None))
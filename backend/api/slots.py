@@ -0,0 +1,149 @@
+from datetime import timedelta
+import math
+import random
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import estimates, events, shards
+from .load import PREP_MINUTES
+from .models import Order, OrderStatusEvent, PickupSlot, Vendor
+
+
+SLOT_MINUTES = getattr(settings, 'PICKUP_SLOT_MINUTES', 15)
+
+# Rows each slot's capacity is split over; more shards, less waiting on row locks.
+SHARDS = getattr(settings, 'PICKUP_SLOT_SHARDS', 4)
+
+# How far ahead students can book.
+HORIZON = timedelta(hours=getattr(settings, 'PICKUP_SLOT_HORIZON_HOURS', 6))
+
+# Scheduled orders join the kitchen queue this long before their pickup time.
+RELEASE_LEAD = timedelta(minutes=PREP_MINUTES)
+
+
+def capacity(max_orders):
+    """Orders a kitchen that cooks max_orders at once can turn out in one slot."""
+    return math.ceil(max_orders * SLOT_MINUTES / PREP_MINUTES)
+
+
+def _shard_capacities(total):
+    return [total // SHARDS + (1 if shard < total % SHARDS else 0) for shard in range(SHARDS)]
+
+
+def slot_start(moment):
+    """The start of the slot moment falls in, in local time."""
+    local = timezone.localtime(moment)
+    minutes = local.hour * 60 + local.minute
+    start = minutes - minutes % SLOT_MINUTES
+    return local.replace(hour=start // 60, minute=start % 60, second=0, microsecond=0)
+
+
+def _candidates(vendor, now):
+    """Slot starts a student can still book: far enough ahead to cook, and while the vendor is open."""
+    starts = []
+    start = slot_start(now + RELEASE_LEAD) + timedelta(minutes=SLOT_MINUTES)
+    while start <= now + HORIZON:
+        if vendor.opening_time <= start.time() <= vendor.closing_time:
+            starts.append(start)
+        start += timedelta(minutes=SLOT_MINUTES)
+    return starts
+
+
+def is_bookable(vendor, starts_at, now=None):
+    now = now or timezone.now()
+    return starts_at in _candidates(vendor, now)
+
+
+def upcoming(vendor, now=None):
+    """Bookable slots with the number of orders each can still take, in one query."""
+    now = now or timezone.now()
+    starts = _candidates(vendor, now)
+    booked = {
+        row['starts_at']: (row['capacity'], row['reserved'])
+        for row in PickupSlot.objects.filter(vendor=vendor, starts_at__in=starts)
+        .values('starts_at').annotate(capacity=Sum('capacity'), reserved=Sum('reserved')).order_by()
+    }
+    default = capacity(vendor.max_orders)
+    slots = []
+    for start in starts:
+        total, reserved = booked.get(start, (default, 0))
+        slots.append({'starts_at': start, 'remaining': max(0, total - reserved)})
+    return slots
+
+
+def reserve(vendor, starts_at):
+    """
+    Take one place in a slot; returns False if the slot is full.
+
+    The shards are tried in random order, each with a conditional UPDATE, so
+    students booking the same slot at the same moment mostly land on
+    different rows. Missing shard rows are created first, sized from the
+    vendor's max_orders at that time.
+    """
+    PickupSlot.objects.bulk_create([
+        PickupSlot(vendor=vendor, starts_at=starts_at, shard=shard, capacity=size)
+        for shard, size in enumerate(_shard_capacities(capacity(vendor.max_orders)))
+    ], ignore_conflicts=True)
+
+    shards = list(range(SHARDS))
+    random.shuffle(shards)
+    for shard in shards:
+        if PickupSlot.objects.filter(
+            vendor=vendor, starts_at=starts_at, shard=shard, reserved__lt=F('capacity')
+        ).update(reserved=F('reserved') + 1):
+            return True
+    return False
+
+
+def release_due(vendor_id, now=None):
+    """
+    Move the vendor's scheduled orders whose pickup is near into the kitchen queue.
+
+    Called whenever the dashboard loads or polls, so orders appear just in
+    time to be cooked for their slot. Returns the number of orders released.
+    """
+    if shards.is_moving():
+        # The rows are being copied to another shard; a write now would be
+        # left behind. They are released once the move is over.
+        return 0
+    now = now or timezone.now()
+    due = list(
+        Order.objects.filter(
+            vendor_id=vendor_id, status=Order.OrderStatus.SCHEDULED, pickup_at__lte=now + RELEASE_LEAD
+        ).values_list('id', 'user_id', 'updated_at')
+    )
+    if not due:
+        return 0
+
+    ids = [order_id for order_id, _, _ in due]
+    with shards.atomic():
+        updated = Order.objects.filter(pk__in=ids, status=Order.OrderStatus.SCHEDULED).update(
+            status=Order.OrderStatus.PENDING, updated_at=now
+        )
+        if updated == len(ids):
+            released = due
+        else:
+            # Another poll released some of them first.
+            mine = set(Order.objects.filter(pk__in=ids, status=Order.OrderStatus.PENDING, updated_at=now)
+                       .values_list('id', flat=True))
+            released = [row for row in due if row[0] in mine]
+        if not released:
+            return 0
+
+        # Slot capacity already admitted these orders, so they join the
+        # queue even if it is over max_orders for a moment.
+        Vendor.objects.filter(pk=vendor_id).update(current_orders=F('current_orders') + len(released))
+        OrderStatusEvent.objects.bulk_create([
+            OrderStatusEvent(order_id=order_id, vendor_id=vendor_id, from_status=Order.OrderStatus.SCHEDULED,
+                             to_status=Order.OrderStatus.PENDING, created_at=now,
+                             seconds_in_previous=max(0, int((now - updated_at).total_seconds())))
+            for order_id, _, updated_at in released
+        ])
+        for order_id, user_id, _ in released:
+            order = Order(id=order_id, vendor_id=vendor_id, user_id=user_id,
+                          status=Order.OrderStatus.PENDING, updated_at=now)
+            events.order_changed(order, 'status')
+        shards.on_commit(lambda: estimates.order_placed(vendor_id, len(released)))
+    return len(released)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import assets
+from .models import MenuItem, Vendor
+
+
+# Versions of a vendor's menu kept next to the current one, for clients that
+# read the pointer just before it moved on.
+KEEP_VERSIONS = getattr(settings, 'MENU_SNAPSHOT_KEEP_VERSIONS', 3)
+
+POINTER = 'latest.json'
+
+
+def enabled():
+    return getattr(settings, 'MENU_SNAPSHOTS', False)
+
+
+def root():
+    """Where snapshots are written: the menus folder of STATIC_ROOT."""
+    return os.path.join(settings.STATIC_ROOT, 'menus')
+
+
+def url_prefix():
+    return f'{settings.STATIC_URL}menus/'
+
+
+def build(vendor):
+    """The snapshot of a vendor's menu, without its version."""
+    items = MenuItem.objects.filter(vendor=vendor).order_by('pk').values(
+        'id', 'category', 'name', 'short_description', 'image_url', 'price', 'is_veg', 'is_available', 'options'
+    )
+    return {
+        'vendor': {
+            'id': vendor.id,
+            'name': vendor.name,
+            'description': vendor.description,
+            'location': vendor.location,
+            'type': vendor.get_vendor_type_display(),
+            'avg_rating': str(vendor.avg_rating),
+        },
+        'items': [{**item, 'price': str(item['price']), 'options': item['options'] or []} for item in items],
+    }
+
+
+def _write(path, content):
+    # Write beside the target and rename, so a reader never sees half a file.
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(handle, 'wb') as file:
+        file.write(content)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def publish(vendor_id):
+    """
+    Write the vendor's menu to STATIC_ROOT/menus/<vendor_id>/ as
+    menu.<hash>.json with .gz/.br copies, then point latest.json at it.
+
+    The hash covers the whole snapshot, so an unchanged menu keeps its file
+    and the fingerprinted name can be cached forever. Menus of vendors that
+    no longer exist are removed. Returns the published file name, or None.
+    """
+    if not enabled():
+        return None
+    vendor = Vendor.objects.filter(pk=vendor_id).first()
+    if vendor is None:
+        unpublish(vendor_id)
+        return None
+
+    snapshot = build(vendor)
+    version = hashlib.sha256(json.dumps(snapshot, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    name = f'menu.{version}.json'
+    folder = os.path.join(root(), str(vendor_id))
+    os.makedirs(folder, exist_ok=True)
+
+    path = os.path.join(folder, name)
+    if not os.path.exists(path):
+        content = json.dumps({**snapshot, 'version': version}, separators=(',', ':'), default=str).encode()
+        for encoding, copy in assets.compress(content).items():
+            if len(copy) < len(content):
+                _write(path + assets.ENCODINGS[encoding], copy)
+        _write(path, content)
+    pointer = {'version': version, 'url': f'{url_prefix()}{vendor_id}/{name}', 'published_at': timezone.now().isoformat()}
+    _write(os.path.join(folder, POINTER), json.dumps(pointer).encode())
+    _prune(folder, name)
+    return name
+
+
+def _prune(folder, current):
+    versions = sorted(
+        (entry for entry in os.scandir(folder) if entry.name.startswith('menu.') and entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime, reverse=True,
+    )
+    for entry in versions[KEEP_VERSIONS + 1:]:
+        if entry.name == current:
+            continue
+        for suffix in ('', *assets.ENCODINGS.values()):
+            try:
+                os.remove(entry.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def unpublish(vendor_id):
+    folder = os.path.join(root(), str(vendor_id))
+    if not os.path.isdir(folder):
+        return
+    for entry in os.scandir(folder):
+        os.remove(entry.path)
+    os.rmdir(folder)
@@ -1,2 +1,1474 @@
-from django.test import TestCase
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+import json
+import re
+import tempfile
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
 
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    archive, assets, directory, estimates, events, load, metrics, ratings, rebalance, routers, sales, search, shards,
+    slots, snapshots,
+)
+from . import context as khana_context
+from .middleware import ReplicaPinMiddleware
+from .models import (
+    University, Profile, Vendor, MenuItem, Order, OrderItem, Review, ArchivedOrder, SalesRollup, OrderStatusEvent,
+    PickupSlot
+)
+from .services import OrderError, SlotFull, VendorBusy, place_order, transition_orders
+
+
+def make_vendor(university, name='Chai Point', **kwargs):
+    kwargs.setdefault('opening_time', time(0, 0))
+    kwargs.setdefault('closing_time', time(23, 59))
+    return Vendor.objects.create(university=university, name=name, location='Block A', **kwargs)
+
+
+class PlaceOrderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='1')
+        cls.items = MenuItem.objects.bulk_create([
+            MenuItem(vendor=cls.vendor, name=f'Item {i}', price=Decimal('10.10'))
+            for i in range(50)
+        ])
+
+    def cart(self, size):
+        return [{'id': item.id, 'quantity': 3} for item in self.items[:size]]
+
+    def test_query_count_does_not_grow_with_cart(self):
+        for size in (1, 10, 50):
+            with self.assertNumQueries(6):
+                place_order(self.user, self.vendor, self.cart(size))
+
+    def test_total_is_exact_decimal(self):
+        order = place_order(self.user, self.vendor, self.cart(10))
+        self.assertEqual(order.total_amount, Decimal('303.00'))
+        self.assertEqual(order.items.count(), 10)
+
+    def test_rejects_item_from_another_vendor(self):
+        other = make_vendor(self.university, name='Other')
+        item = MenuItem.objects.create(vendor=other, name='Samosa', price=15)
+        with self.assertRaises(OrderError):
+            place_order(self.user, self.vendor, [{'id': item.id, 'quantity': 1}])
+        self.assertFalse(Order.objects.exists())
+
+    def test_rejects_unavailable_item(self):
+        item = MenuItem.objects.create(vendor=self.vendor, name='Maggi', price=30, is_available=False)
+        with self.assertRaises(OrderError):
+            place_order(self.user, self.vendor, [{'id': item.id, 'quantity': 1}])
+
+
+class VendorLoadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+
+    def test_release_never_goes_negative(self):
+        load.release_order(self.vendor.id)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.current_orders, 0)
+
+    def test_reconcile_fixes_drift(self):
+        Order.objects.create(user=self.user, vendor=self.vendor)
+        Order.objects.create(user=self.user, vendor=self.vendor, status=Order.OrderStatus.COMPLETED)
+        Vendor.objects.filter(pk=self.vendor.pk).update(current_orders=7)
+
+        self.assertEqual(load.reconcile(), 1)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.current_orders, 1)
+        self.assertEqual(load.reconcile(), 0)
+
+
+class AdmissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university, max_orders=2)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def checkout(self):
+        return place_order(self.user, self.vendor, [{'id': self.item.id, 'quantity': 1}])
+
+    def test_full_vendor_turns_orders_away(self):
+        self.checkout()
+        self.checkout()
+        with self.assertRaises(VendorBusy) as ctx:
+            self.checkout()
+        self.assertEqual(ctx.exception.wait_minutes, load.estimated_wait(2, 2))
+        self.assertEqual(Order.objects.count(), 2)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.current_orders, 2)
+
+    def test_released_slot_can_be_reused(self):
+        self.checkout()
+        self.checkout()
+        load.release_order(self.vendor.id)
+        self.checkout()
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_closed_vendor_has_no_wait_estimate(self):
+        Vendor.objects.filter(pk=self.vendor.pk).update(max_orders=0)
+        with self.assertRaises(VendorBusy) as ctx:
+            self.checkout()
+        self.assertIsNone(ctx.exception.wait_minutes)
+
+    def test_create_order_returns_429_when_full(self):
+        Vendor.objects.filter(pk=self.vendor.pk).update(current_orders=2)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('create_order'),
+            {'vendor_id': self.vendor.id, 'items': [{'id': self.item.id, 'quantity': 1}]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['status'], 'busy')
+        self.assertEqual(response['Retry-After'], str(response.json()['estimated_wait'] * 60))
+        self.assertFalse(Order.objects.exists())
+
+
+class VendorDashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+        khana_context.get(self.owner)
+
+    def add_orders(self, count, status=Order.OrderStatus.PENDING):
+        for i in range(count):
+            user = User.objects.create_user(username=f'{status}-{Order.objects.count()}')
+            Profile.objects.create(user=user, university=self.university, roll_no=str(i))
+            order = Order.objects.create(user=user, vendor=self.vendor, status=status)
+            OrderItem.objects.create(order=order, menu_item=self.item, quantity=1, price=10)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_dashboard_query_count_is_constant(self):
+        self.add_orders(1)
+        baseline = self.count_queries(reverse('vendor_dashboard'))
+        self.add_orders(20)
+        self.add_orders(20, Order.OrderStatus.ACCEPTED)
+        self.assertEqual(self.count_queries(reverse('vendor_dashboard')), baseline)
+
+    def test_dashboard_only_lists_active_orders(self):
+        self.add_orders(2)
+        self.add_orders(3, Order.OrderStatus.COMPLETED)
+        response = self.client.get(reverse('vendor_dashboard'))
+        self.assertEqual(len(response.context['orders']), 2)
+
+    def test_history_is_paginated_with_constant_queries(self):
+        self.add_orders(1, Order.OrderStatus.COMPLETED)
+        baseline = self.count_queries(reverse('vendor_order_history'))
+        self.add_orders(30, Order.OrderStatus.REJECTED)
+        self.assertEqual(self.count_queries(reverse('vendor_order_history')), baseline)
+
+        first = self.client.get(reverse('vendor_order_history'))
+        response = self.client.get(reverse('vendor_order_history'), {'cursor': first.context['next_cursor']})
+        self.assertEqual(len(response.context['orders']), 6)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_out_of_range_cursor_starts_over(self):
+        response = self.client.get(reverse('vendor_order_history'), {'cursor': '99999999999999999999-1'})
+        self.assertRedirects(response, reverse('vendor_order_history'))
+
+
+class MyOrdersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+        for _ in range(25):
+            order = Order.objects.create(user=cls.user, vendor=cls.vendor)
+            OrderItem.objects.create(order=order, menu_item=cls.item, quantity=1, price=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_load_more_walks_the_whole_history_once(self):
+        response = self.client.get(reverse('my_orders'))
+        seen = [order.id for order in response.context['orders']]
+        cursor = response.context['next_cursor']
+        while cursor:
+            data = self.client.get(reverse('my_orders_more'), {'cursor': cursor}).json()
+            seen += [order['id'] for order in data['orders']]
+            cursor = data['next_cursor']
+
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_query_count_does_not_depend_on_history(self):
+        cursor = self.client.get(reverse('my_orders')).context['next_cursor']
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('my_orders_more'), {'cursor': cursor})
+        baseline = len(ctx.captured_queries)
+        for _ in range(25):
+            Order.objects.create(user=self.user, vendor=self.vendor)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('my_orders_more'), {'cursor': cursor})
+        self.assertEqual(len(ctx.captured_queries), baseline)
+
+    def test_bad_cursor_is_rejected(self):
+        for cursor in ('nope', '99999999999999999999-1', f'{10 ** 18}-1', '1-99999999999999999999'):
+            response = self.client.get(reverse('my_orders_more'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+
+class OrderUpdatesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='42')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+        cls.order = Order.objects.create(user=cls.user, vendor=cls.vendor)
+        OrderItem.objects.create(order=cls.order, menu_item=cls.item, quantity=1, price=10)
+        Order.objects.filter(pk=cls.order.pk).update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def poll(self, url, cursor):
+        return self.client.get(url, {'since': cursor}, HTTP_IF_NONE_MATCH=f'"{cursor}"')
+
+    def test_unchanged_poll_is_a_single_query_304(self):
+        self.client.force_login(self.user)
+        cursor = self.client.get(reverse('my_orders')).context['updates_cursor']
+        with self.assertNumQueries(3):
+            response = self.poll(reverse('my_orders_updates'), cursor)
+        self.assertEqual(response.status_code, 304)
+
+    def test_status_change_is_returned_once_cursor_moves(self):
+        self.client.force_login(self.owner)
+        cursor = self.client.get(reverse('vendor_dashboard')).context['updates_cursor']
+        Order.objects.filter(pk=self.order.pk).update(
+            status=Order.OrderStatus.ACCEPTED, updated_at=timezone.now() - timedelta(seconds=30)
+        )
+
+        response = self.poll(reverse('vendor_orders_updates'), cursor)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([(o['id'], o['status'], o['roll_no']) for o in data['orders']],
+                         [(self.order.id, 'ACCEPTED', '42')])
+        self.assertEqual(response['ETag'], f'"{data["cursor"]}"')
+        self.assertEqual(self.poll(reverse('vendor_orders_updates'), data['cursor']).status_code, 304)
+
+    def test_recent_change_is_not_cached(self):
+        # An order stamped just before this one may still be committing.
+        self.client.force_login(self.user)
+        cursor = self.client.get(reverse('my_orders')).context['updates_cursor']
+        Order.objects.filter(pk=self.order.pk).update(status=Order.OrderStatus.ACCEPTED, updated_at=timezone.now())
+
+        response = self.poll(reverse('my_orders_updates'), cursor)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        response = self.poll(reverse('my_orders_updates'), response.json()['cursor'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_bad_cursor_is_rejected(self):
+        self.client.force_login(self.user)
+        for since in ('yesterday', '99999999999999999999', '-99999999999999999999'):
+            response = self.client.get(reverse('my_orders_updates'), {'since': since})
+            self.assertEqual(response.status_code, 400, since)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('vendor_orders_updates'), {'since': '99999999999999999999'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderEventsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    async def test_broker_delivers_across_threads(self):
+        broker = events.LocalBroker()
+        async with broker.subscribe(['vendor:1']) as queue:
+            threading.Thread(target=broker.publish, args=('vendor:1', 'hello')).start()
+            self.assertEqual(await asyncio.wait_for(queue.get(), 1), 'hello')
+            self.assertEqual(broker.subscriber_count('vendor:1'), 1)
+        self.assertEqual(broker.subscriber_count('vendor:1'), 0)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_order_lifecycle_is_published_after_commit(self):
+        published = []
+
+        class RecordingBroker:
+            def publish(self, channel, message):
+                published.append((channel, json.loads(message)['event']))
+
+        with mock.patch.object(events, 'get_broker', return_value=RecordingBroker()):
+            with self.captureOnCommitCallbacks(execute=True):
+                order = place_order(self.user, self.vendor, [{'id': self.item.id, 'quantity': 1}])
+            self.client.force_login(self.owner)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('update_order_status', args=[order.id]),
+                                 {'status': 'ACCEPTED'}, content_type='application/json')
+
+        self.assertEqual(published, [
+            (events.user_channel(self.user.id), 'created'),
+            (events.vendor_channel(self.vendor.id), 'created'),
+            (events.user_channel(self.user.id), 'status'),
+            (events.vendor_channel(self.vendor.id), 'status'),
+        ])
+
+    def test_vendor_stream_requires_ownership(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('order_events'), {'scope': 'vendor'})
+        self.assertEqual(response.status_code, 403)
+
+
+class VendorDirectoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='1')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_repeat_visits_are_served_from_cache(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertFalse(any('api_vendor' in q['sql'] for q in ctx.captured_queries))
+        self.assertContains(response, 'Chai Point')
+        self.assertEqual(directory.stats(), {'hits': 1, 'misses': 1})
+
+    def test_saving_a_vendor_invalidates_its_university(self):
+        self.client.get(reverse('home'))
+        self.vendor.name = 'Tea Point'
+        self.vendor.save()
+        self.assertContains(self.client.get(reverse('home')), 'Tea Point')
+        self.assertEqual(directory.stats()['misses'], 2)
+
+    def test_entry_expires_at_next_opening_or_closing(self):
+        now = timezone.localtime(timezone.now()).replace(hour=10, minute=0, second=0, microsecond=0)
+        seconds = directory._seconds_until_next_boundary(now, [time(9, 0), time(10, 30), time(18, 0)])
+        self.assertEqual(seconds, 30 * 60)
+        seconds = directory._seconds_until_next_boundary(now, [time(9, 0)])
+        self.assertEqual(seconds, 23 * 60 * 60)
+
+
+class VendorMenuCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10, options=['Sugar'])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('vendor_menu', args=[self.vendor.id])
+
+    def test_repeat_visit_gets_304(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Chai')
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cached_fragment_skips_menu_query(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Sugar')
+        self.assertFalse(any('api_menuitem' in q['sql'] for q in ctx.captured_queries))
+
+    def test_editing_an_item_bumps_the_version(self):
+        etag = self.client.get(self.url)['ETag']
+        self.item.price = 12
+        self.item.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '₹12')
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university, name='Tandoor Corner')
+        cls.closed = make_vendor(cls.university, name='Night Canteen', opening_time=time(0, 0), closing_time=time(0, 0))
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='1')
+        MenuItem.objects.create(vendor=cls.vendor, name='Paneer Tikka', category='Starters', price=90)
+        MenuItem.objects.create(vendor=cls.vendor, name='Paneer Butter Masala', category='Main Course', price=160)
+        MenuItem.objects.create(vendor=cls.vendor, name='Chicken Tikka', price=80, is_veg=False)
+        MenuItem.objects.create(vendor=cls.closed, name='Paneer Roll', price=70)
+
+    def setUp(self):
+        cache.clear()
+        search._indexes.clear()
+
+    def names(self, text):
+        return [item['name'] for item in search.search(self.university.id, text)['items']]
+
+    def test_parses_filters_out_of_free_text(self):
+        query = search.parse('paneer under ₹100, veg, open now')
+        self.assertEqual(query.words, ['paneer'])
+        self.assertEqual(query.max_price, Decimal('100'))
+        self.assertIs(query.veg, True)
+        self.assertTrue(query.open_now)
+        self.assertIs(search.parse('non-veg rolls').veg, False)
+
+    def test_finds_dishes_with_filters(self):
+        self.assertEqual(self.names('paneer under ₹100, veg, open now'), ['Paneer Tikka'])
+        self.assertEqual(self.names('tikka non-veg'), ['Chicken Tikka'])
+        self.assertEqual(set(self.names('panir')), set())
+        self.assertEqual(set(self.names('panee')), {'Paneer Tikka', 'Paneer Butter Masala', 'Paneer Roll'})
+
+    def test_index_follows_model_changes(self):
+        self.names('paneer')
+        item = MenuItem.objects.create(vendor=self.vendor, name='Paneer Paratha', price=60)
+        self.assertIn('Paneer Paratha', self.names('paratha'))
+        item.name = 'Aloo Paratha'
+        item.save()
+        self.assertEqual(self.names('paratha'), ['Aloo Paratha'])
+        item.delete()
+        self.assertEqual(self.names('paratha'), [])
+
+    def test_search_endpoint_is_scoped_to_university(self):
+        other = University.objects.create(name='Other University', domain='other.edu')
+        MenuItem.objects.create(vendor=make_vendor(other, name='Elsewhere'), name='Paneer Wrap', price=50)
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('search'), {'q': 'paneer'}).json()
+        self.assertNotIn('Paneer Wrap', [item['name'] for item in data['items']])
+        self.assertEqual(data['items'][0]['vendor'], 'Tandoor Corner')
+
+
+class RatingAggregateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def assertRating(self, obj, total, count, average):
+        obj.refresh_from_db()
+        self.assertEqual((obj.rating_sum, obj.rating_count, obj.avg_rating), (total, count, Decimal(average)))
+
+    def test_create_edit_delete_keep_aggregates_exact(self):
+        first = Review.objects.create(user=self.user, vendor=self.vendor, item=self.item, rating=5)
+        Review.objects.create(user=self.user, vendor=self.vendor, rating=2)
+        self.assertRating(self.vendor, 7, 2, '3.50')
+        self.assertRating(self.item, 5, 1, '5.00')
+
+        first.rating = 4
+        first.save()
+        self.assertRating(self.vendor, 6, 2, '3.00')
+        self.assertRating(self.item, 4, 1, '4.00')
+
+        first.delete()
+        self.assertRating(self.vendor, 2, 1, '2.00')
+        self.assertRating(self.item, 0, 0, '0.00')
+
+    def test_rebuild_repairs_drift(self):
+        Review.objects.create(user=self.user, vendor=self.vendor, rating=3)
+        Review.objects.create(user=self.user, vendor=self.vendor, rating=4)
+        Vendor.objects.filter(pk=self.vendor.pk).update(rating_sum=0, rating_count=9, avg_rating=1)
+        ratings.rebuild(batch_size=1)
+        self.assertRating(self.vendor, 7, 2, '3.50')
+
+    def test_item_review_bumps_its_vendors_menu(self):
+        with mock.patch.object(ratings.menu, 'bump') as bump:
+            Review.objects.create(user=self.user, item=self.item, rating=4)
+        bump.assert_called_once_with(self.vendor.pk)
+
+    def test_removal_from_drifted_aggregate_stops_at_zero(self):
+        review = Review.objects.create(user=self.user, vendor=self.vendor, rating=5)
+        Vendor.objects.filter(pk=self.vendor.pk).update(rating_sum=2, rating_count=0)
+        review.delete()
+        self.assertRating(self.vendor, 0, 0, '0.00')
+
+
+class LoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, username):
+        return self.client.post(reverse('login'), {'username': username, 'password': 'pass'})
+
+    def test_password_is_hashed_once(self):
+        with mock.patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.verify', autospec=True,
+                        return_value=True) as verify:
+            self.login('student')
+        self.assertEqual(verify.call_count, 1)
+
+    def test_role_is_resolved_at_login(self):
+        self.assertRedirects(self.login('owner'), reverse('vendor_dashboard'), fetch_redirect_response=False)
+        self.assertTrue(khana_context.get(self.owner).is_vendor)
+        self.client.logout()
+        self.assertRedirects(self.login('student'), reverse('home'), fetch_redirect_response=False)
+        self.assertFalse(khana_context.get(self.user).is_vendor)
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_hash_is_upgraded_to_configured_work_factor(self):
+        self.login('student')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password.split('$')[1], '1000')
+
+
+class KhanaContextTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.profile = Profile.objects.create(user=cls.user, university=cls.university, roll_no='7')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_requests_skip_profile_and_vendor_lookups(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('home'))
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('api_profile', tables)
+        self.assertNotIn('api_vendor', tables)
+
+    def test_snapshot_follows_profile_and_vendor_changes(self):
+        self.assertEqual(khana_context.get(self.user).roll_no, '7')
+        self.profile.roll_no = '8'
+        self.profile.save()
+        self.assertEqual(khana_context.get(self.user).roll_no, '8')
+
+        self.assertEqual(khana_context.get(self.owner).vendor_id, self.vendor.id)
+        self.vendor.vendor_owner = self.user
+        self.vendor.save()
+        self.assertIsNone(khana_context.get(self.owner).vendor_id)
+        self.assertEqual(khana_context.get(self.user).vendor_id, self.vendor.id)
+
+    def test_only_the_owning_vendor_can_move_an_order(self):
+        order = Order.objects.create(user=self.user, vendor=self.vendor)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('update_order_status', args=[order.id]),
+                                    {'status': 'ACCEPTED'}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='1')
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.client.force_login(self.user)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_requests_are_exported_per_view(self):
+        self.client.get(reverse('my_orders'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('khanakhalo_request_duration_seconds_count{view="my_orders"} 1', body)
+        self.assertIn('khanakhalo_requests_total{view="my_orders",status="2xx"} 1', body)
+        queries = next(line for line in body.splitlines()
+                       if line.startswith('khanakhalo_request_sql_queries_sum{view="my_orders"}'))
+        self.assertGreater(int(queries.split()[-1]), 0)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_queries(self):
+        with self.assertLogs('api.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('my_orders'))
+        self.assertIn('api_order', logs.output[0])
+
+    def test_metrics_are_not_public(self):
+        self.client.logout()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_scrapers_present_the_token(self):
+        self.client.logout()
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.9'])
+    def test_allowed_addresses_need_no_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+
+class OrderTransitionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.other = make_vendor(cls.university, name='Other')
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+        khana_context.get(self.owner)
+
+    def checkout(self):
+        return place_order(self.user, self.vendor, [{'id': self.item.id, 'quantity': 1}])
+
+    def move(self, orders, status):
+        return self.client.post(reverse('update_orders_status'),
+                                {'orders': [order.id for order in orders], 'status': status},
+                                content_type='application/json')
+
+    def test_batch_reports_each_order(self):
+        pending = [self.checkout() for _ in range(3)]
+        accepted = Order.objects.create(user=self.user, vendor=self.vendor, status=Order.OrderStatus.ACCEPTED)
+        foreign = Order.objects.create(user=self.user, vendor=self.other)
+
+        response = self.move(pending + [accepted, foreign], 'ACCEPTED')
+        self.assertEqual(response.json()['results'], {
+            **{str(order.id): 'moved' for order in pending},
+            str(accepted.id): 'invalid',
+            str(foreign.id): 'forbidden',
+        })
+        self.assertEqual(Order.objects.filter(vendor=self.vendor, status='ACCEPTED').count(), 4)
+        self.assertEqual(Order.objects.get(pk=foreign.pk).status, 'PENDING')
+
+    def test_query_count_does_not_grow_with_batch(self):
+        small = [self.checkout() for _ in range(2)]
+        with CaptureQueriesContext(connection) as baseline:
+            self.move(small, 'ACCEPTED')
+        large = [self.checkout() for _ in range(6)]
+        with self.assertNumQueries(len(baseline)):
+            self.move(large, 'ACCEPTED')
+
+    def test_finishing_orders_frees_their_slots(self):
+        orders = [self.checkout() for _ in range(3)]
+        self.move(orders, 'REJECTED')
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.current_orders, 0)
+        # Rejecting again is refused and must not release anything twice.
+        self.checkout()
+        self.assertEqual(set(self.move(orders, 'REJECTED').json()['results'].values()), {'invalid'})
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.current_orders, 1)
+
+    def test_moved_orders_show_up_in_the_delta_feed(self):
+        order = self.checkout()
+        cursor = self.client.get(reverse('vendor_dashboard')).context['updates_cursor']
+        self.move([order], 'ACCEPTED')
+        response = self.client.get(reverse('vendor_orders_updates'), {'since': cursor})
+        self.assertEqual([(o['id'], o['status']) for o in response.json()['orders']], [(order.id, 'ACCEPTED')])
+
+    def test_single_order_endpoint_rejects_skipping_a_step(self):
+        order = self.checkout()
+        response = self.client.post(reverse('update_order_status', args=[order.id]),
+                                    {'status': 'COMPLETED'}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(reverse('update_order_status', args=[order.id]),
+                                    {'status': 'BOGUS'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'PENDING')
+
+
+class ArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='42')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def add_order(self, status, days_ago):
+        order = Order.objects.create(user=self.user, vendor=self.vendor, status=status, total_amount=20)
+        OrderItem.objects.create(order=order, menu_item=self.item, quantity=2, price=10)
+        when = timezone.now() - timedelta(days=days_ago)
+        Order.objects.filter(pk=order.pk).update(created_at=when, updated_at=when)
+        return order
+
+    def test_only_old_finished_orders_move(self):
+        old = [self.add_order(Order.OrderStatus.COMPLETED, 200 + i) for i in range(5)]
+        stuck = self.add_order(Order.OrderStatus.ACCEPTED, 200)
+        recent = self.add_order(Order.OrderStatus.COMPLETED, 1)
+
+        self.assertEqual(archive.archive(timedelta(days=90), batch_size=2), 5)
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {stuck.id, recent.id})
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[o.id for o in old]).exists())
+        archived = ArchivedOrder.objects.get(pk=old[0].pk)
+        self.assertEqual(archived.lines, [
+            {'menu_item_id': self.item.id, 'name': 'Chai', 'quantity': 2, 'price': '10.00', 'customization': None}
+        ])
+        self.assertEqual(archive.archive(timedelta(days=90)), 0)
+
+    def test_history_reads_fall_through_to_the_archive(self):
+        for i in range(12):
+            self.add_order(Order.OrderStatus.COMPLETED, 100 + i)
+        for i in range(4):
+            self.add_order(Order.OrderStatus.REJECTED, i)
+        expected = list(Order.objects.order_by('-created_at').values_list('id', flat=True))
+        archive.archive(timedelta(days=90))
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('my_orders'))
+        seen = [order.id for order in response.context['orders']]
+        cursor = response.context['next_cursor']
+        while cursor:
+            data = self.client.get(reverse('my_orders_more'), {'cursor': cursor}).json()
+            seen += [order['id'] for order in data['orders']]
+            cursor = data['next_cursor']
+        self.assertEqual(seen, expected)
+        self.assertEqual(data['orders'][-1]['items'], [{'name': 'Chai', 'quantity': 2, 'price': '10.00'}])
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('vendor_order_history'))
+        self.assertEqual([order.id for order in response.context['orders']], expected)
+        self.assertContains(response, 'Roll No: 42')
+
+
+class SalesRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        cls.chai = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+        cls.samosa = MenuItem.objects.create(vendor=cls.vendor, name='Samosa', price=15)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+        khana_context.get(self.owner)
+
+    def complete(self, cart):
+        order = place_order(self.user, self.vendor, [{'id': item.id, 'quantity': n} for item, n in cart])
+        for status in ('ACCEPTED', 'READY', 'COMPLETED'):
+            self.client.post(reverse('update_orders_status'), {'orders': [order.id], 'status': status},
+                             content_type='application/json')
+        return order
+
+    def test_completed_orders_are_rolled_up(self):
+        self.complete([(self.chai, 2), (self.samosa, 1)])
+        self.complete([(self.chai, 1)])
+        rejected = place_order(self.user, self.vendor, [{'id': self.samosa.id, 'quantity': 5}])
+        self.client.post(reverse('update_orders_status'), {'orders': [rejected.id], 'status': 'REJECTED'},
+                         content_type='application/json')
+
+        data = self.client.get(reverse('vendor_analytics')).json()
+        self.assertEqual(data['days'], [{'day': timezone.localdate().isoformat(), 'revenue': '45.00', 'items_sold': 4}])
+        self.assertEqual([(row['name'], row['items_sold']) for row in data['top_items']], [('Chai', 3), ('Samosa', 1)])
+        self.assertEqual(data['peak_hours'][0]['hour'], timezone.localtime().hour)
+        self.assertEqual(SalesRollup.objects.get(menu_item=self.chai).orders, 2)
+
+    def test_backfill_matches_incremental_rollups(self):
+        for _ in range(3):
+            self.complete([(self.chai, 2), (self.samosa, 1)])
+        archive.archive(timedelta(0))
+        self.complete([(self.samosa, 2)])
+        live = sorted(SalesRollup.objects.values_list('menu_item_id', 'quantity', 'orders', 'revenue'))
+
+        self.assertEqual(sales.backfill(batch_size=2), 4)
+        self.assertEqual(sorted(SalesRollup.objects.values_list('menu_item_id', 'quantity', 'orders', 'revenue')), live)
+
+    def test_failed_backfill_keeps_the_old_rollups(self):
+        self.complete([(self.chai, 2)])
+        with mock.patch.object(sales._Totals, 'write', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                sales.backfill()
+        self.assertEqual(SalesRollup.objects.get(menu_item=self.chai).quantity, 2)
+
+    def test_report_query_count_does_not_grow_with_orders(self):
+        self.complete([(self.chai, 1)])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('vendor_analytics'))
+        baseline = len(ctx.captured_queries)
+        for _ in range(5):
+            self.complete([(self.chai, 1), (self.samosa, 1)])
+        with self.assertNumQueries(baseline):
+            self.client.get(reverse('vendor_analytics'))
+
+
+class WaitEstimateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner, max_orders=4)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='1')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def setUp(self):
+        cache.clear()
+        estimates.reset()
+
+    def checkout(self):
+        return place_order(self.user, self.vendor, [{'id': self.item.id, 'quantity': 1}])
+
+    def test_transitions_are_logged_with_time_spent(self):
+        order = self.checkout()
+        Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(minutes=3))
+        transition_orders(self.vendor.id, [order.id], 'ACCEPTED')
+        transition_orders(self.vendor.id, [order.id], 'READY')
+
+        log = list(OrderStatusEvent.objects.filter(order_id=order.id).order_by('id'))
+        self.assertEqual([(e.from_status, e.to_status) for e in log], [('PENDING', 'ACCEPTED'), ('ACCEPTED', 'READY')])
+        self.assertAlmostEqual(log[0].seconds_in_previous, 180, delta=5)
+
+    def test_estimate_follows_measured_prep_time(self):
+        self.assertEqual(estimates.estimate(self.vendor.id).prep_minutes, load.PREP_MINUTES)
+        now = timezone.now()
+        OrderStatusEvent.objects.bulk_create([
+            OrderStatusEvent(order_id=i, vendor=self.vendor, from_status='ACCEPTED', to_status='READY',
+                             seconds_in_previous=seconds, created_at=now - timedelta(minutes=i))
+            for i, seconds in enumerate([600, 720, 480], start=1)
+        ])
+        Vendor.objects.filter(pk=self.vendor.pk).update(current_orders=6)
+        estimates.reset()
+
+        estimate = estimates.estimate(self.vendor.id)
+        self.assertTrue(estimate.measured)
+        self.assertEqual((estimate.prep_minutes, estimate.queue), (10, 6))
+        # Four orders cook at once, so the seventh waits for a second round.
+        self.assertEqual(estimate.wait_minutes, 18)
+        with self.assertNumQueries(0):
+            estimates.get_many([self.vendor.id])
+
+    def test_wait_is_shown_on_home_and_at_checkout(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'~{load.PREP_MINUTES} min wait')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create_order'),
+                                        {'vendor_id': self.vendor.id, 'items': [{'id': self.item.id, 'quantity': 1}]},
+                                        content_type='application/json')
+        self.assertEqual(response.json()['estimated_wait'], load.PREP_MINUTES)
+        self.assertEqual(self.client.get(reverse('vendor_wait', args=[self.vendor.id])).json()['queue'], 1)
+
+
+class PickupSlotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner, max_orders=2)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='1')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def setUp(self):
+        cache.clear()
+        estimates.reset()
+        # Pin the clock to midday so there are always slots left before closing.
+        self.now = timezone.make_aware(datetime.combine(timezone.localdate(), time(12, 0)))
+        patcher = mock.patch('django.utils.timezone.now', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.slot = slots.upcoming(self.vendor)[0]['starts_at']
+
+    def book(self, pickup_at=None):
+        return place_order(self.user, self.vendor, [{'id': self.item.id, 'quantity': 1}], pickup_at=pickup_at or self.slot)
+
+    def test_scheduled_order_does_not_count_against_the_kitchen(self):
+        order = self.book()
+        self.assertEqual(order.status, Order.OrderStatus.SCHEDULED)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.current_orders, 0)
+        self.assertEqual(PickupSlot.objects.filter(vendor=self.vendor, starts_at=self.slot).count(), slots.SHARDS)
+
+    def test_slot_capacity_holds_across_shards(self):
+        capacity = slots.capacity(self.vendor.max_orders)
+        for _ in range(capacity):
+            self.book()
+        with self.assertRaises(SlotFull):
+            self.book()
+        self.assertEqual(Order.objects.filter(pickup_at=self.slot).count(), capacity)
+
+    def test_unbookable_times_are_rejected(self):
+        with self.assertRaises(OrderError):
+            self.book(self.now + timedelta(minutes=1))
+        with self.assertRaises(OrderError):
+            self.book(self.slot + timedelta(minutes=1))
+        self.assertFalse(Order.objects.exists())
+
+    def test_due_orders_are_released_to_the_dashboard(self):
+        order = self.book()
+        self.assertEqual(slots.release_due(self.vendor.id), 0)
+
+        self.now = self.slot - slots.RELEASE_LEAD
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('vendor_dashboard'))
+        self.assertContains(response, f'id="card-{order.id}"')
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatus.PENDING)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.current_orders, 1)
+        self.assertTrue(OrderStatusEvent.objects.filter(order_id=order.id, from_status='SCHEDULED').exists())
+        self.assertEqual(slots.release_due(self.vendor.id), 0)
+
+    def test_conditional_poll_releases_due_orders(self):
+        order = self.book()
+        self.client.force_login(self.owner)
+        cursor = self.client.get(reverse('vendor_dashboard')).context['updates_cursor']
+
+        self.now = self.slot - slots.RELEASE_LEAD
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('vendor_orders_updates'), {'since': cursor},
+                                       HTTP_IF_NONE_MATCH=f'"{cursor}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([o['id'] for o in response.json()['orders']], [order.id])
+
+    def test_booking_through_the_api(self):
+        self.client.force_login(self.user)
+        listed = self.client.get(reverse('vendor_slots', args=[self.vendor.id])).json()['slots']
+        first = listed[0]
+        self.assertEqual(first['remaining'], slots.capacity(self.vendor.max_orders))
+
+        response = self.client.post(reverse('create_order'),
+                                    {'vendor_id': self.vendor.id, 'items': [{'id': self.item.id, 'quantity': 1}],
+                                     'pickup_at': first['starts_at']},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('pickup_at', response.json())
+        listed = self.client.get(reverse('vendor_slots', args=[self.vendor.id])).json()['slots']
+        self.assertEqual(listed[0]['remaining'], first['remaining'] - 1)
+
+
+class FakeReplicaHealth:
+    """Replicas answer their health check unless their alias is in self.down."""
+
+    def setUp(self):
+        super().setUp()
+        routers.health.reset()
+        self.addCleanup(routers.health.reset)
+        self.down = set()
+        patcher = mock.patch.object(routers.health, 'check', side_effect=lambda alias: alias not in self.down)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = routers.ReplicaRouter()
+
+
+# Not a TestCase: the transaction each of its tests runs in would keep every read on the primary.
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(FakeReplicaHealth, TransactionTestCase):
+
+    def test_reads_are_spread_over_healthy_replicas(self):
+        self.assertEqual({self.router.db_for_read(Order) for _ in range(4)}, {'replica1', 'replica2'})
+        self.assertEqual(self.router.db_for_write(Order), 'default')
+
+        routers.health.reset()
+        self.down = {'replica2'}
+        self.assertEqual({self.router.db_for_read(Order) for _ in range(4)}, {'replica1'})
+        routers.health.reset()
+        self.down = {'replica1', 'replica2'}
+        self.assertEqual(self.router.db_for_read(Order), 'default')
+
+    def test_pinned_reads_and_loaded_objects_stay_on_their_database(self):
+        with routers.pinned():
+            self.assertEqual(self.router.db_for_read(Order), 'default')
+        vendor = Vendor()
+        vendor._state.db = 'default'
+        self.assertEqual(self.router.db_for_read(OrderItem, instance=vendor), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'api'))
+
+    def test_reads_inside_a_transaction_stay_on_the_primary(self):
+        self.assertIn(Order.objects.filter(status=Order.OrderStatus.PENDING).db, {'replica1', 'replica2'})
+        with transaction.atomic():
+            self.assertEqual(Order.objects.filter(status=Order.OrderStatus.PENDING).db, 'default')
+            self.assertEqual({self.router.db_for_read(Order) for _ in range(4)}, {'default'})
+        self.assertIn(self.router.db_for_read(Order), {'replica1', 'replica2'})
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRoutingTests(FakeReplicaHealth, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='1')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def test_writes_pin_the_browser_to_the_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(routers.is_pinned())
+            return HttpResponse(status=400 if request.path == '/bad/' else 200)
+
+        middleware = ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+
+        self.assertNotIn('kk_primary', middleware(factory.get('/')).cookies)
+        response = middleware(factory.post('/'))
+        self.assertEqual(response.cookies['kk_primary']['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertNotIn('kk_primary', middleware(factory.post('/bad/')).cookies)
+        request = factory.get('/')
+        request.COOKIES['kk_primary'] = '1'
+        middleware(request)
+        self.assertEqual(seen, [False, True, True, True])
+
+    def test_checkout_pins_reads(self):
+        # Both replicas are down, so every read lands on the test database.
+        self.down = {'replica1', 'replica2'}
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('create_order'),
+                                    {'vendor_id': self.vendor.id, 'items': [{'id': self.item.id, 'quantity': 1}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn('kk_primary', response.cookies)
+
+
+@skipIf(len(settings.DATABASE_SHARDS) < 2, 'Needs a second database in DATABASE_SHARDS.')
+class ShardingTests(TestCase):
+    databases = {'default', *settings.DATABASE_SHARDS[1:2]}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shard = settings.DATABASE_SHARDS[1]
+        cls.university = University.objects.create(name='Far University', domain='far.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='42')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Chai', price=10)
+
+    def setUp(self):
+        cache.clear()
+        estimates.reset()
+        shards.shard_map.reset()
+        self.addCleanup(shards.shard_map.reset)
+
+    def checkout(self):
+        self.client.force_login(self.user)
+        return self.client.post(reverse('create_order'),
+                                {'vendor_id': self.vendor.id, 'items': [{'id': self.item.id, 'quantity': 1}]},
+                                content_type='application/json')
+
+    def test_university_moves_with_its_orders(self):
+        self.assertEqual(self.checkout().status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('move_university', self.university.id, self.shard, settle=0, stdout=StringIO())
+
+        self.assertEqual(University.objects.get(pk=self.university.pk).shard, self.shard)
+        self.assertFalse(Vendor.objects.using('default').exists())
+        self.assertFalse(Order.objects.using('default').exists())
+        self.assertEqual(Order.objects.using(self.shard).count(), 1)
+        self.assertEqual(OrderItem.objects.using(self.shard).count(), 1)
+
+        # Students and the vendor now read and write on the new shard.
+        self.assertEqual(self.checkout().status_code, 200)
+        self.assertEqual(Order.objects.using(self.shard).count(), 2)
+        self.assertContains(self.client.get(reverse('home')), 'Chai Point')
+        self.assertContains(self.client.get(reverse('vendor_menu', args=[self.vendor.id])), 'Chai')
+        self.client.force_login(self.owner)
+        self.assertContains(self.client.get(reverse('vendor_dashboard')), 'Roll No: 42', count=2)
+
+    def test_writes_wait_while_a_university_moves(self):
+        University.objects.filter(pk=self.university.pk).update(moving_to=self.shard)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+    def test_rows_deleted_during_the_copy_are_not_moved(self):
+        samosa = MenuItem.objects.create(vendor=self.vendor, name='Samosa', price=15)
+        Review.objects.create(user=self.user, item=self.item, rating=4)
+
+        def settle(seconds):
+            # The first wait comes right after the first copy.
+            if samosa.pk:
+                samosa.delete()
+                Review.objects.all().delete()
+
+        with mock.patch.object(rebalance.time, 'sleep', side_effect=settle):
+            call_command('move_university', self.university.id, self.shard, settle=0, stdout=StringIO())
+
+        self.assertEqual(list(MenuItem.objects.using(self.shard).values_list('pk', 'rating_count')), [(self.item.pk, 0)])
+        self.assertFalse(Review.objects.using(self.shard).exists())
+        self.assertFalse(MenuItem.objects.using('default').exists())
+
+    def test_catch_up_copies_only_recent_changes(self):
+        old = [Order.objects.create(user=self.user, vendor=self.vendor) for _ in range(3)]
+        Order.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        Review.objects.create(user=self.user, vendor=self.vendor, rating=3)
+        Review.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        copies = []
+
+        def copy(rows, *args, **kwargs):
+            copies.append((rows.model, rows.count()))
+            return real_copy(rows, *args, **kwargs)
+
+        def settle(seconds):
+            if len(copies) == len(rebalance.MODELS):
+                Order.objects.filter(pk=old[0].pk).update(status=Order.OrderStatus.ACCEPTED, updated_at=timezone.now())
+
+        real_copy = rebalance._copy
+        with mock.patch.object(rebalance, '_copy', side_effect=copy), \
+                mock.patch.object(rebalance.time, 'sleep', side_effect=settle):
+            rebalance.move(self.university.id, self.shard, batch_size=2)
+
+        catch_up = dict(copies[len(rebalance.MODELS):])
+        self.assertEqual((catch_up[Order], catch_up[Review]), (1, 0))
+        self.assertEqual(Order.objects.using(self.shard).get(pk=old[0].pk).status, Order.OrderStatus.ACCEPTED)
+        self.assertEqual(Order.objects.using(self.shard).count(), 3)
+
+    def test_scheduled_orders_wait_while_a_university_moves(self):
+        order = Order.objects.create(user=self.user, vendor=self.vendor, status=Order.OrderStatus.SCHEDULED,
+                                     pickup_at=timezone.now())
+        University.objects.filter(pk=self.university.pk).update(moving_to=self.shard)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(reverse('vendor_dashboard')).status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatus.SCHEDULED)
+
+        University.objects.filter(pk=self.university.pk).update(moving_to='')
+        shards.shard_map.reset()
+        self.client.get(reverse('vendor_dashboard'))
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatus.PENDING)
+
+    def test_router_follows_the_active_shard(self):
+        router = routers.ShardRouter()
+        self.assertIsNone(router.db_for_read(Order))
+        with shards.active(self.shard):
+            self.assertEqual(router.db_for_write(Order), self.shard)
+            self.assertIsNone(router.db_for_read(User))
+        self.assertTrue(router.allow_migrate(self.shard, 'api'))
+
+
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.owner = User.objects.create_user(username='owner', password='pass')
+        cls.vendor = make_vendor(cls.university, vendor_owner=cls.owner)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='7')
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Masala Chai', price=10)
+        cls.order = place_order(cls.user, cls.vendor, [{'id': cls.item.id, 'quantity': 2}])
+
+    def setUp(self):
+        cache.clear()
+        estimates.reset()
+        metrics.registry.reset()
+
+    async def test_student_pages_render_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('home'))
+        self.assertContains(response, 'Chai Point')
+        self.assertContains(response, 'Welcome, student')
+        response = await self.async_client.get(reverse('vendor_menu', args=[self.vendor.id]))
+        self.assertContains(response, 'Masala Chai')
+        response = await self.async_client.get(reverse('my_orders'))
+        self.assertContains(response, f'data-order-id="{self.order.id}"')
+        self.assertEqual((await self.async_client.get(reverse('vendor_menu', args=[0]))).status_code, 404)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    async def test_dashboard_renders_under_asgi(self):
+        await self.async_client.aforce_login(self.owner)
+        response = await self.async_client.get(reverse('vendor_dashboard'))
+        self.assertContains(response, 'Roll No: 7')
+
+        body = (await self.async_client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1')).content.decode()
+        queries = next(line for line in body.splitlines()
+                       if line.startswith('khanakhalo_request_sql_queries_sum{view="vendor_dashboard"}'))
+        self.assertGreater(int(queries.split()[-1]), 0)
+
+    async def test_login_is_still_required(self):
+        response = await self.async_client.get(reverse('my_orders'))
+        self.assertEqual(response.status_code, 302)
+
+
+class StaticAssetsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.user = User.objects.create_user(username='student', password='pass')
+        Profile.objects.create(user=cls.user, university=cls.university, roll_no='7')
+
+    def setUp(self):
+        cache.clear()
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        production = override_settings(
+            STATIC_ROOT=static_root.name,
+            STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'api.assets.CompressedManifestStaticFilesStorage'}},
+            MIDDLEWARE=['api.middleware.StaticAssetsMiddleware', *settings.MIDDLEWARE],
+        )
+        production.enable()
+        self.addCleanup(production.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_pages_link_fingerprinted_bundles(self):
+        self.client.force_login(self.user)
+        page = self.client.get(reverse('home')).content.decode()
+        self.assertNotIn('<style>', page)
+        self.assertNotIn('<script>', page)
+        bundles = re.findall(r'"/static/(css/home\.[0-9a-f]{12}\.css|js/home\.[0-9a-f]{12}\.js)"', page)
+        self.assertEqual(len(bundles), 2)
+
+        response = self.client.get(f'/static/{bundles[1]}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={assets.STATIC_MAX_AGE}, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = self.client.get(f'/static/{bundles[1]}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unhashed_and_missing_files(self):
+        response = self.client.get('/static/js/home.js')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], f'public, max-age={assets.STATIC_PLAIN_MAX_AGE}')
+        self.assertEqual(self.client.get('/static/js/missing.js').status_code, 404)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_refused_encodings_are_not_sent(self):
+        page = self.client.get(reverse('login')).content.decode()
+        bundle = re.search(r'"(/static/css/[^"]+\.[0-9a-f]{12}\.css)"', page).group(1)
+        response = self.client.get(bundle, HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+
+        self.assertEqual(assets.accepted_encodings('br;q=0, gzip'), {'gzip'})
+        self.assertEqual(assets.accepted_encodings('gzip;q=0.5, *;q=0'), {'gzip'})
+        self.assertEqual(assets.accepted_encodings('GZIP;Q=0, *'), {'br'})
+        self.assertEqual(assets.accepted_encodings(''), set())
+
+
+class MenuSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = University.objects.create(name='Test University', domain='test.edu')
+        cls.vendor = make_vendor(cls.university)
+        cls.item = MenuItem.objects.create(vendor=cls.vendor, name='Masala Chai', price=10,
+                                           options=[{'name': 'Sugar', 'price': 2}])
+
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        enabled = override_settings(
+            MENU_SNAPSHOTS=True, STATIC_ROOT=static_root.name,
+            MIDDLEWARE=['api.middleware.StaticAssetsMiddleware', *settings.MIDDLEWARE],
+        )
+        enabled.enable()
+        self.addCleanup(enabled.disable)
+        self.latest = f'/static/menus/{self.vendor.id}/latest.json'
+
+    def snapshot(self):
+        pointer = json.loads(b''.join(self.client.get(self.latest).streaming_content))
+        return pointer, json.loads(b''.join(self.client.get(pointer['url']).streaming_content))
+
+    def test_editing_an_item_publishes_a_new_version(self):
+        first = snapshots.publish(self.vendor.id)
+        self.assertEqual(snapshots.publish(self.vendor.id), first)
+        pointer, menu = self.snapshot()
+        self.assertEqual(menu['vendor']['name'], 'Chai Point')
+        self.assertEqual(menu['items'], [{
+            'id': self.item.id, 'category': 'General', 'name': 'Masala Chai', 'short_description': '',
+            'image_url': None, 'price': '10.00', 'is_veg': True, 'is_available': True,
+            'options': [{'name': 'Sugar', 'price': 2}],
+        }])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.price = Decimal('12.00')
+            self.item.is_available = False
+            self.item.save()
+        new_pointer, menu = self.snapshot()
+        self.assertNotEqual(new_pointer['version'], pointer['version'])
+        self.assertEqual((menu['items'][0]['price'], menu['items'][0]['is_available']), ('12.00', False))
+
+    def test_reviews_republish_the_rating(self):
+        snapshots.publish(self.vendor.id)
+        pointer, menu = self.snapshot()
+        self.assertEqual(menu['vendor']['avg_rating'], '0.00')
+        user = User.objects.create_user(username='student', password='pass')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=user, vendor=self.vendor, rating=4)
+        new_pointer, menu = self.snapshot()
+        self.assertNotEqual(new_pointer['version'], pointer['version'])
+        self.assertEqual(menu['vendor']['avg_rating'], '4.00')
+
+    def test_snapshots_are_served_precompressed_and_versioned(self):
+        snapshots.publish(self.vendor.id)
+        pointer = self.client.get(self.latest)
+        self.assertEqual(pointer['Cache-Control'], 'no-cache')
+        url = json.loads(b''.join(pointer.streaming_content))['url']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_deleting_the_vendor_removes_its_menu(self):
+        snapshots.publish(self.vendor.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.delete()
+        self.assertEqual(self.client.get(self.latest).status_code, 404)
+
+    def test_shell_and_service_worker(self):
+        shell = self.client.get(reverse('menu_shell'))
+        self.assertContains(shell, 'id="menu-root"')
+        self.assertNotContains(shell, 'Chai Point')
+        worker = self.client.get(reverse('service_worker'))
+        self.assertEqual(worker['Content-Type'], 'text/javascript; charset=utf-8')
+        self.assertContains(worker, '"menus_url": "/static/menus/"')
+        with override_settings(MENU_SNAPSHOTS=False):
+            self.assertEqual(self.client.get(reverse('service_worker')).status_code, 404)
+            self.assertIsNone(snapshots.publish(self.vendor.id))
+
+
+class GenerateDataTests(TestCase):
+
+    def test_small_dataset_is_consistent(self):
+        call_command('generate_data', universities=2, vendors=2, items_min=3, items_max=5, students=20,
+                     orders=200, reviews=50, batch_size=64, days=1, stdout=StringIO())
+
+        self.assertEqual(Vendor.objects.count(), 4)
+        self.assertEqual(Profile.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 200)
+        self.assertFalse(Order.objects.filter(items__isnull=True).exists())
+        # Orders are spread over the past day, not all stamped with the time of the run.
+        self.assertTrue(Order.objects.filter(created_at__lt=timezone.now() - timedelta(hours=2)).exists())
+        self.assertFalse(Order.objects.filter(updated_at__gt=timezone.now()).exists())
+        for vendor in Vendor.objects.all():
+            active = vendor.orders.filter(status__in=Order.ACTIVE_STATUSES).count()
+            self.assertEqual(vendor.current_orders, active)
+            self.assertEqual(vendor.rating_count, Review.objects.filter(vendor=vendor).count())
+        self.assertTrue(self.client.login(username='gen-student-0', password='password'))
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite serialises writers, so there is no race to test.')
+class VendorLoadConcurrencyTests(TransactionTestCase):
+    checkouts = 300
+
+    def test_parallel_checkouts_keep_counter_exact(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        vendor = make_vendor(university, max_orders=self.checkouts)
+        user = User.objects.create_user(username='student')
+        item = MenuItem.objects.create(vendor=vendor, name='Chai', price=10)
+
+        def checkout(_):
+            try:
+                place_order(user, vendor, [{'id': item.id, 'quantity': 1}])
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            list(pool.map(checkout, range(self.checkouts)))
+
+        vendor.refresh_from_db()
+        self.assertEqual(vendor.current_orders, self.checkouts)
+        self.assertEqual(load.reconcile(), 0)
+
+    def test_parallel_checkouts_never_exceed_max_orders(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        vendor = make_vendor(university, max_orders=20)
+        user = User.objects.create_user(username='student')
+        item = MenuItem.objects.create(vendor=vendor, name='Chai', price=10)
+
+        def checkout(_):
+            try:
+                place_order(user, vendor, [{'id': item.id, 'quantity': 1}])
+                return True
+            except VendorBusy:
+                return False
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            accepted = sum(pool.map(checkout, range(self.checkouts)))
+
+        vendor.refresh_from_db()
+        self.assertEqual(accepted, 20)
+        self.assertEqual(vendor.current_orders, 20)
+        self.assertEqual(Order.objects.filter(vendor=vendor).count(), 20)
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .pagination import InvalidCursor, from_micros, to_micros
+
+
+# A status change is stamped with updated_at before its transaction commits,
+# so a poll can miss a row whose timestamp is slightly older than the cursor.
+# Re-sending the last couple of seconds covers that; clients apply updates
+# idempotently, so the overlap is harmless.
+OVERLAP = timedelta(seconds=2)
+
+
+def latest_change(queryset):
+    """
+    Microseconds of the newest updated_at in queryset, or 0 if it is empty.
+
+    MAX over an index led by the filter columns and ending in updated_at is a
+    single index probe, which makes this cheap enough to run on every poll.
+    """
+    latest = queryset.order_by().aggregate(latest=Max('updated_at'))['latest']
+    return to_micros(latest) if latest else 0
+
+
+async def alatest_change(queryset):
+    latest = (await queryset.order_by().aaggregate(latest=Max('updated_at')))['latest']
+    return to_micros(latest) if latest else 0
+
+
+def latest_change_of(orders):
+    """Like latest_change, for rows that have already been fetched."""
+    return max((to_micros(order.updated_at) for order in orders), default=0)
+
+
+def etag(queryset):
+    return etag_for(latest_change(queryset))
+
+
+def etag_for(latest):
+    """
+    The ETag of a poll whose newest change is latest, or None while that
+    change is less than OVERLAP old.
+
+    Until then a row stamped earlier may still commit without moving the
+    newest change, so the same ETag would hide it from a conditional poll;
+    such polls are answered in full, overlap included.
+    """
+    if latest and from_micros(latest) > timezone.now() - OVERLAP:
+        return None
+    return f'"{latest}"'
+
+
+def changed_since(queryset, since):
+    """
+    Rows of queryset updated at or after the since cursor, oldest change first.
+
+    Without a cursor nothing is returned: clients start from the cursor that
+    was rendered into the page.
+    """
+    try:
+        micros = int(since or 0)
+        if not micros:
+            return queryset.none()
+        # OverflowError for times a datetime cannot hold.
+        start = from_micros(micros) - OVERLAP
+    except (ValueError, OverflowError):
+        raise InvalidCursor(f'Bad cursor "{since}".')
+    return queryset.filter(updated_at__gte=start).order_by('updated_at', 'id')
@@ -8,9 +8,22 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', auth_views.LogoutView.as_view(template_name='api/logout.html'), name='logout'),
+    path('search/', views.search_view, name='search'),
     path('vendor/<int:vendor_id>/', views.vendor_menu, name='vendor_menu'),
+    path('vendor/shell/', views.menu_shell, name='menu_shell'),
+    path('vendor/<int:vendor_id>/wait/', views.vendor_wait, name='vendor_wait'),
+    path('vendor/<int:vendor_id>/slots/', views.vendor_slots, name='vendor_slots'),
     path('create-order/', views.create_order, name='create_order'),
     path('my-orders/', views.my_orders, name='my_orders'),
+    path('my-orders/more/', views.my_orders_more, name='my_orders_more'),
+    path('my-orders/updates/', views.my_orders_updates, name='my_orders_updates'),
     path('vendor-dashboard/', views.vendor_dashboard, name='vendor_dashboard'),
+    path('vendor-dashboard/history/', views.vendor_order_history, name='vendor_order_history'),
+    path('vendor-dashboard/analytics/', views.vendor_analytics, name='vendor_analytics'),
+    path('vendor-dashboard/updates/', views.vendor_orders_updates, name='vendor_orders_updates'),
+    path('order-events/', views.order_events, name='order_events'),
     path('update-order/<int:order_id>/', views.update_order_status, name='update_order_status'),
+    path('update-orders/', views.update_orders_status, name='update_orders_status'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('sw.js', views.service_worker, name='service_worker'),
 ]
\ No newline at end of file
@@ -1,14 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, authenticate
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.urls import reverse
+from django.contrib.auth import login
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Prefetch
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+import hashlib
 import json
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 
+from . import directory, estimates, events, menu, metrics, sales, search, shards, slots, snapshots, updates
+from . import context as khana_context
 from .forms import UserRegisterForm
-from .models import Vendor, Profile, MenuItem, Order, OrderItem
+from .models import ArchivedOrder, Vendor, MenuItem, Order, OrderItem
+from .pagination import InvalidCursor, amerged_keyset_page, from_micros, merged_keyset_page
+from .services import (
+    CONFLICT, FORBIDDEN, INVALID, MOVED, NOT_FOUND, OrderError, SlotFull, VendorBusy, place_order,
+    transition_orders
+)
 
 def register(request):
     if request.method == 'POST':
@@ -25,35 +45,45 @@ def register(request):
 def login_view(request):
     if request.method == 'POST':
         form = AuthenticationForm(request, data=request.POST)
+        # is_valid() runs authenticate(), so the password is hashed exactly once.
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                
-
-                if hasattr(user, 'managed_vendor'):
-                    return redirect('vendor_dashboard')
-                    
-                return redirect('home')
-            else:
-                messages.error(request, 'Invalid username or password.')
+            user = form.get_user()
+            login(request, user)
+            # Resolve the user's profile and vendor once, for every later request.
+            request.khana_ctx = khana_context.get(user, refresh=True)
+
+            if request.khana_ctx.is_vendor:
+                return redirect('vendor_dashboard')
+
+            return redirect('home')
         else:
             messages.error(request, 'Invalid username or password.')
     else:
         form = AuthenticationForm()
     return render(request, 'api/login.html', {'form': form})
 
+async def _aprepare(request):
+    # Async views load what the templates would otherwise read lazily (the
+    # user, the session behind messages, khana_ctx) up front, so rendering
+    # never has to reach the database from the event loop.
+    request.user = await request.auser()
+    await request.session.akeys()
+    request.khana_ctx = await khana_context.aget(request.user)
+    return request.khana_ctx
+
 @login_required
-def home(request):
+async def home(request):
 
-    try:
-        user_university = request.user.profile.university
-        vendors = Vendor.objects.filter(university=user_university)
-    except Profile.DoesNotExist:
+    ctx = await _aprepare(request)
+    if ctx.has_profile:
+        vendor_directory = await directory.aget_directory(ctx.university_id)
+        user_university = vendor_directory['university']
+        # The directory is shared and cached; the live wait is added per request.
+        waits = await estimates.aget_many([card['id'] for card in vendor_directory['vendors']])
+        vendors = [dict(card, wait=waits.get(card['id'])) for card in vendor_directory['vendors']]
+    else:
 
-        if hasattr(request.user, 'managed_vendor'):
+        if ctx.is_vendor:
             return redirect('vendor_dashboard')
         messages.warning(request, 'Your profile is incomplete.')
         vendors = []
@@ -66,16 +96,91 @@ def home(request):
     return render(request, 'api/home.html', context)
 
 @login_required
-def vendor_menu(request, vendor_id):
-    vendor = get_object_or_404(Vendor, id=vendor_id)
+def search_view(request):
+    if not request.khana_ctx.has_profile:
+        return JsonResponse({'status': 'error', 'message': 'Your profile is incomplete.'}, status=400)
+
+    results = search.search(request.khana_ctx.university_id, request.GET.get('q', ''))
+    return JsonResponse({'status': 'success', **results})
+
+def _menu_etag(request, vendor_id):
+    # The page embeds the visitor's CSRF token, so a copy is only reusable
+    # for as long as that token stays the same.
+    get_token(request)
+    csrf = hashlib.sha1(request.META['CSRF_COOKIE'].encode()).hexdigest()[:12]
+    return f'"{menu.version(vendor_id)}-{csrf}"'
+
+def _menu_last_modified(request, vendor_id):
+    return from_micros(menu.version(vendor_id))
+
+@login_required
+@condition(etag_func=_menu_etag, last_modified_func=_menu_last_modified)
+async def vendor_menu(request, vendor_id):
+    try:
+        vendor = await Vendor.objects.aget(id=vendor_id)
+    except Vendor.DoesNotExist:
+        raise Http404('No Vendor matches the given query.')
+    # Only evaluated when the cached fragment for this menu version is missing,
+    # which the template finds out while rendering; so render on the sync side.
     menu_items = vendor.menu_items.all()
     context = {
         'vendor': vendor,
-        'menu_items': menu_items
+        'menu_items': menu_items,
+        'menu_version': menu.version(vendor_id)
     }
-    return render(request, 'api/menu.html', context)
+    return await sync_to_async(render)(request, 'api/menu.html', context)
+
+
+def menu_shell(request):
+    # menu.html without a vendor. The service worker answers every menu page
+    # with it, and menu.js fills it in from the vendor's JSON snapshot.
+    if not snapshots.enabled():
+        raise Http404('Menu snapshots are off.')
+    return render(request, 'api/menu.html', {'vendor': None})
+
+
+def service_worker(request):
+    if not snapshots.enabled():
+        raise Http404('Menu snapshots are off.')
+    shell = [static('css/menu.css'), static('js/menu.js'), static('js/offline.js')]
+    config = {
+        'shell_url': reverse('menu_shell'),
+        'shell': shell,
+        'menus_url': snapshots.url_prefix(),
+        # A new shell (new fingerprints after a deploy) means a new worker and cache.
+        'version': hashlib.sha256(' '.join(shell).encode()).hexdigest()[:12],
+    }
+    response = HttpResponse(
+        render_to_string('api/sw.js', {'config': json.dumps(config)}), content_type='text/javascript; charset=utf-8'
+    )
+    # Served from the root so it may control the menu pages; always checked for updates.
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
+@login_required
+def vendor_wait(request, vendor_id):
+    # Fetched by the menu page, whose HTML is cached for much longer than a wait estimate holds.
+    estimate = estimates.estimate(vendor_id)
+    if estimate is None:
+        return JsonResponse({'status': 'error', 'message': 'Vendor not found.'}, status=404)
+    return JsonResponse({'status': 'success', **estimate.as_json()})
+
+@login_required
+def vendor_slots(request, vendor_id):
+    vendor = get_object_or_404(Vendor, id=vendor_id)
+    return JsonResponse({
+        'status': 'success',
+        'slots': [
+            {
+                'starts_at': slot['starts_at'].isoformat(),
+                'label': slot['starts_at'].strftime('%I:%M %p').lstrip('0'),
+                'remaining': slot['remaining'],
+            }
+            for slot in slots.upcoming(vendor)
+        ],
+    })
+
 @login_required
 def create_order(request):
     if request.method == 'POST':
@@ -84,61 +189,226 @@ def create_order(request):
             vendor_id = data.get('vendor_id')
             cart_items = data.get('items')
             method = data.get('method', 'PICKUP')
+            pickup_at = data.get('pickup_at')
             
             vendor = get_object_or_404(Vendor, id=vendor_id)
-            
 
-            order = Order.objects.create(
-                user=request.user,
-                vendor=vendor,
-                total_amount=0,
-                order_method=method.upper()
-            )
-
-            total = 0
-            for item in cart_items:
-                menu_item = MenuItem.objects.get(id=item['id'])
-                item_price = menu_item.price 
-                
-                item_total = float(item_price) * item['quantity']
-                total += item_total
-                
-                OrderItem.objects.create(
-                    order=order,
-                    menu_item=menu_item,
-                    quantity=item['quantity'],
-                    price=item_price,
-                    customization=json.dumps(item.get('options', []))
-                )
-
-            order.total_amount = total
-            order.save()
-            
-            vendor.current_orders += 1
-            vendor.save()
+            try:
+                if pickup_at:
+                    pickup_at = parse_datetime(pickup_at)
+                    if pickup_at is None:
+                        raise OrderError('Invalid pickup time.')
+                    if timezone.is_naive(pickup_at):
+                        pickup_at = timezone.make_aware(pickup_at)
+                order = place_order(request.user, vendor, cart_items, method, pickup_at or None)
+            except VendorBusy as e:
+                response = JsonResponse({
+                    'status': 'busy',
+                    'message': str(e),
+                    'estimated_wait': e.wait_minutes
+                }, status=429)
+                if e.wait_minutes is not None:
+                    response['Retry-After'] = str(e.wait_minutes * 60)
+                return response
+            except SlotFull as e:
+                return JsonResponse({'status': 'full', 'message': str(e)}, status=409)
+            except OrderError as e:
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
-            return JsonResponse({'status': 'success', 'order_id': order.id})
+            if order.pickup_at:
+                return JsonResponse({
+                    'status': 'success',
+                    'order_id': order.id,
+                    'pickup_at': order.pickup_at.isoformat()
+                })
+            return JsonResponse({
+                'status': 'success',
+                'order_id': order.id,
+                'estimated_wait': estimates.estimate(vendor.id).wait_minutes
+            })
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=405)
 
+def _order_json(order, customer=False):
+    data = {
+        'id': order.id,
+        'vendor': order.vendor.name,
+        'created_at': order.created_at.isoformat(),
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'order_method': order.get_order_method_display(),
+        'total_amount': str(order.total_amount),
+        'items': [
+            {'name': item.menu_item.name, 'quantity': item.quantity, 'price': str(item.price)}
+            for item in order.items.all()
+        ],
+    }
+    if customer:
+        profile = getattr(order.user, 'profile', None)
+        data['customer'] = order.user.username
+        data['roll_no'] = profile.roll_no if profile else ''
+    return data
+
+def _updates_response(orders, since, customer=False):
+    orders = list(orders)
+    cursor = updates.latest_change_of(orders) or since
+    response = JsonResponse({
+        'status': 'success',
+        'cursor': cursor,
+        'orders': [_order_json(order, customer) for order in orders],
+    })
+    etag = updates.etag_for(int(cursor))
+    if etag:
+        response['ETag'] = etag
+    return response
+
+MY_ORDERS_PAGE_SIZE = 10
+
+def _my_orders(user):
+    return (
+        Order.objects.filter(user=user)
+        .select_related('vendor')
+        .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('menu_item')))
+    )
+
+def _my_history_sources(user):
+    # Old orders live in the archive; the page is stitched together from both tables.
+    return [_my_orders(user), ArchivedOrder.objects.filter(user=user).select_related('vendor')]
+
+def _my_history(user, cursor=None):
+    return merged_keyset_page(_my_history_sources(user), cursor, size=MY_ORDERS_PAGE_SIZE)
+
 @login_required
-def my_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'api/my_orders.html', {'orders': orders})
+async def my_orders(request):
+    await _aprepare(request)
+    orders, next_cursor = await amerged_keyset_page(_my_history_sources(request.user), size=MY_ORDERS_PAGE_SIZE)
+    return render(request, 'api/my_orders.html', {
+        'orders': orders,
+        'next_cursor': next_cursor,
+        'updates_cursor': await updates.alatest_change(Order.objects.filter(user=request.user)),
+    })
 
 @login_required
-def vendor_dashboard(request):
+def my_orders_more(request):
+    try:
+        orders, next_cursor = _my_history(request.user, request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+    return JsonResponse({
+        'status': 'success',
+        'next_cursor': next_cursor,
+        'orders': [_order_json(order) for order in orders],
+    })
+
+def _my_orders_etag(request):
+    return updates.etag(Order.objects.filter(user=request.user))
+
+@login_required
+@condition(etag_func=_my_orders_etag)
+def my_orders_updates(request):
+    since = request.GET.get('since')
     try:
-        vendor = request.user.managed_vendor
-        orders = Order.objects.filter(vendor=vendor).order_by('-created_at')
-    except (Vendor.DoesNotExist, AttributeError):
+        orders = updates.changed_since(_my_orders(request.user), since)
+    except InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return _updates_response(orders, since)
+
+def _with_customers(orders):
+    # Users live on the default database; from another shard they are fetched separately.
+    if shards.current() == DEFAULT_DB_ALIAS:
+        return orders.select_related('user__profile')
+    return orders.prefetch_related('user__profile')
+
+def _vendor_orders(vendor_id, statuses):
+    # Everything the order cards render, in three queries however many orders there are.
+    return (
+        _with_customers(Order.objects.filter(vendor=vendor_id, status__in=statuses))
+        .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('menu_item')))
+        .order_by('-created_at')
+    )
+
+@login_required
+async def vendor_dashboard(request):
+
+    vendor_id = (await _aprepare(request)).vendor_id
+    if vendor_id is None:
 
         messages.error(request, "You do not have a vendor account assigned.")
         return redirect('home')
     
-    return render(request, 'api/vendor_dashboard.html', {'orders': orders})
+    # Writes in a transaction, which the async ORM cannot do yet.
+    await sync_to_async(slots.release_due)(vendor_id)
+    return render(request, 'api/vendor_dashboard.html', {
+        'orders': [order async for order in _vendor_orders(vendor_id, Order.ACTIVE_STATUSES)],
+        'updates_cursor': await updates.alatest_change(Order.objects.filter(vendor=vendor_id)),
+    })
+
+@login_required
+def vendor_orders_updates(request):
+    vendor_id = request.khana_ctx.vendor_id
+    if vendor_id is None:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    # Release scheduled orders before the ETag is taken, so this very poll picks them up.
+    slots.release_due(vendor_id)
+    return _vendor_orders_changes(request, vendor_id)
+
+def _vendor_orders_etag(request, vendor_id):
+    return updates.etag(Order.objects.filter(vendor=vendor_id))
+
+@condition(etag_func=_vendor_orders_etag)
+def _vendor_orders_changes(request, vendor_id):
+    since = request.GET.get('since')
+    try:
+        orders = updates.changed_since(
+            _vendor_orders(vendor_id, Order.ACTIVE_STATUSES + Order.FINISHED_STATUSES), since
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return _updates_response(orders, since, customer=True)
+
+VENDOR_HISTORY_PAGE_SIZE = 25
+
+@login_required
+def vendor_order_history(request):
+
+    vendor_id = request.khana_ctx.vendor_id
+    if vendor_id is None:
+        messages.error(request, "You do not have a vendor account assigned.")
+        return redirect('home')
+
+    cursor = request.GET.get('cursor')
+    archived = _with_customers(ArchivedOrder.objects.filter(vendor=vendor_id))
+    try:
+        orders, next_cursor = merged_keyset_page(
+            [_vendor_orders(vendor_id, Order.FINISHED_STATUSES), archived], cursor, size=VENDOR_HISTORY_PAGE_SIZE
+        )
+    except InvalidCursor:
+        return redirect('vendor_order_history')
+    return render(request, 'api/vendor_order_history.html', {
+        'orders': orders, 'cursor': cursor, 'next_cursor': next_cursor,
+    })
+
+@login_required
+def vendor_analytics(request):
+    vendor_id = request.khana_ctx.vendor_id
+    if vendor_id is None:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'days must be a number.'}, status=400)
+    return JsonResponse({'status': 'success', **sales.report(vendor_id, days)})
+
+_TRANSITION_ERRORS = {
+    NOT_FOUND: (404, 'Order not found.'),
+    FORBIDDEN: (403, 'Unauthorized'),
+    INVALID: (409, 'The order cannot move to that status from where it is.'),
+    CONFLICT: (409, 'The order was changed by someone else; refresh and try again.'),
+}
 
 @login_required
 @csrf_exempt
@@ -146,23 +416,74 @@ def update_order_status(request, order_id):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            new_status = data.get('status')
-            order = get_object_or_404(Order, id=order_id)
-            
+            vendor_id = request.khana_ctx.vendor_id
+            if vendor_id is None:
+                return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
 
-            if request.user != order.vendor.vendor_owner:
-                 return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+            try:
+                outcome = transition_orders(vendor_id, [order_id], data.get('status'))[order_id]
+            except OrderError as e:
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
-            previous_status = order.status
-            order.status = new_status
-            order.save()
-
-            if new_status in ['COMPLETED', 'REJECTED'] and previous_status not in ['COMPLETED', 'REJECTED']:
-                order.vendor.current_orders = max(0, order.vendor.current_orders - 1)
-                order.vendor.save()
-                
+            if outcome != MOVED:
+                code, message = _TRANSITION_ERRORS[outcome]
+                return JsonResponse({'status': 'error', 'message': message}, status=code)
             return JsonResponse({'status': 'success'})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
             
-    return JsonResponse({'status': 'error'}, status=400)
\ No newline at end of file
+    return JsonResponse({'status': 'error'}, status=400)
+
+@login_required
+def update_orders_status(request):
+    """Move several orders to one status; the result of every order is reported separately."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=405)
+
+    vendor_id = request.khana_ctx.vendor_id
+    if vendor_id is None:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        results = transition_orders(vendor_id, data.get('orders') or [], data.get('status'))
+    except (ValueError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid request body.'}, status=400)
+    except OrderError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'new_status': data['status'],
+        'results': {str(order_id): outcome for order_id, outcome in sorted(results.items())},
+    })
+
+async def order_events(request):
+    # Needs to be served through asgi.py; under WSGI a stream ties up a worker thread.
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    if request.GET.get('scope') == 'vendor':
+        vendor_id = (await sync_to_async(khana_context.get)(user)).vendor_id
+        if vendor_id is None:
+            return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+        channels = [events.vendor_channel(vendor_id)]
+    else:
+        channels = [events.user_channel(user.id)]
+
+    response = StreamingHttpResponse(events.stream(channels), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _may_scrape(request):
+    if request.user.is_staff or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(settings.METRICS_TOKEN) and scheme.lower() == 'bearer' and constant_time_compare(token, settings.METRICS_TOKEN)
+
+def metrics_view(request):
+    if not _may_scrape(request):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,17 @@
+// Django's widgets have no placeholders, and base.css hides the labels.
+const PLACEHOLDERS = {
+    id_username: 'Username',
+    id_password: 'Password',
+    id_email: 'Email Address',
+    id_roll_no: 'Roll Number',
+    id_phone: 'Phone (Optional)',
+    id_password1: 'Password',
+    id_password2: 'Confirm Password',
+};
+
+document.addEventListener('DOMContentLoaded', function() {
+    Object.entries(PLACEHOLDERS).forEach(([id, text]) => {
+        const input = document.getElementById(id);
+        if (input) input.placeholder = text;
+    });
+});
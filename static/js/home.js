@@ -0,0 +1,52 @@
+document.addEventListener('DOMContentLoaded', function() {
+
+    const searchInput = document.getElementById('search-input');
+    const restaurantGrid = document.getElementById('restaurant-grid');
+    const allCards = restaurantGrid.querySelectorAll('.restaurant-card');
+    const dishResults = document.getElementById('dish-results');
+    let timer = null;
+
+    const showDishes = (items) => {
+        dishResults.innerHTML = '';
+        items.forEach(item => {
+            const row = document.createElement('a');
+            row.className = 'dish-result';
+            row.href = searchInput.dataset.menuUrl.replace('/0/', `/${item.vendor_id}/`);
+            const name = document.createElement('strong');
+            name.textContent = item.name;
+            const where = document.createElement('span');
+            where.textContent = ` · ${item.vendor} · ₹${item.price}`;
+            row.appendChild(name);
+            row.appendChild(where);
+            dishResults.appendChild(row);
+        });
+        dishResults.style.display = items.length ? 'block' : 'none';
+    };
+
+    // Ask the server, which searches dishes as well as stalls, then show the
+    // stalls that matched or sell a matching dish.
+    const runSearch = () => {
+        const query = searchInput.value.trim();
+        if (!query) {
+            allCards.forEach(card => card.style.display = 'block');
+            showDishes([]);
+            return;
+        }
+        fetch(`${searchInput.dataset.searchUrl}?q=${encodeURIComponent(query)}`)
+        .then(res => res.json())
+        .then(data => {
+            if (data.status !== 'success' || searchInput.value.trim() !== query) return;
+            const ids = new Set(data.vendors.map(v => String(v.id)));
+            data.items.forEach(item => ids.add(String(item.vendor_id)));
+            allCards.forEach(card => {
+                card.style.display = ids.has(card.dataset.id) ? 'block' : 'none';
+            });
+            showDishes(data.items);
+        });
+    };
+
+    searchInput.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(runSearch, 200);
+    });
+});
@@ -0,0 +1,416 @@
+// URLs rendered by menu.html; vendor URLs have 0 where the vendor id goes.
+// The shell the service worker serves has no vendor id, so it is read from the address.
+const page = document.body.dataset;
+const vendorId = page.vendorId || (location.pathname.match(/\/vendor\/(\d+)\//) || [])[1];
+const vendorUrl = url => url.replace('/0/', `/${vendorId}/`);
+
+// The cached shell's token goes stale when logging in rotates it; the cookie does not.
+function csrfToken() {
+    const cookie = document.cookie.split('; ').find(row => row.startsWith('csrftoken='));
+    return cookie ? cookie.slice('csrftoken='.length) : page.csrfToken;
+}
+
+window.addEventListener('scroll', () => {
+    let current = '';
+    document.querySelectorAll('.category-title').forEach(section => {
+        const sectionTop = section.offsetTop;
+        if (scrollY >= sectionTop - 150) {
+            current = section.getAttribute('id');
+        }
+    });
+
+    document.querySelectorAll('.cat-link').forEach(link => {
+        link.classList.remove('active');
+        if (link.getAttribute('href').includes(current)) {
+            link.classList.add('active');
+            // Auto-scroll the bar to the active button
+            link.scrollIntoView({ behavior: 'smooth', block: 'nearest', inline: 'center' });
+        }
+    });
+});
+let cart = [];
+let currentItem = {
+    id: null,
+    name: null,
+    basePrice: 0,
+    finalPrice: 0,
+    qty: 1,
+    selectedOptions: []
+};
+
+function openItemModal(id, name, price, isVeg) {
+
+    currentItem = {
+        id: id,
+        name: name,
+        basePrice: parseFloat(price),
+        finalPrice: parseFloat(price),
+        qty: 1,
+        selectedOptions: []
+    };
+
+
+    document.getElementById('modal-item-name').innerText = name;
+    document.getElementById('modal-qty').innerText = '1';
+
+
+    const optionsScript = document.getElementById(id);
+    let optionsHtml = '';
+
+    if (optionsScript && optionsScript.textContent) {
+        try {
+            const options = JSON.parse(optionsScript.textContent);
+
+            if (options.length > 0) {
+                optionsHtml += `<div class="option-group"><div class="option-title">Add-ons</div>`;
+                options.forEach((opt, index) => {
+                    optionsHtml += `
+                        <div class="option-item">
+                            <label class="option-label">
+                                <input type="checkbox" style="display:none;"
+                                       onchange="toggleOption(this, '${opt.name}', ${opt.price})"
+                                       ${opt.default ? 'checked' : ''}>
+                                <span class="checkbox-custom"></span>
+                                <span>${opt.name}</span>
+                            </label>
+                            <span class="option-price">+₹${opt.price}</span>
+                        </div>
+                    `;
+                });
+                optionsHtml += `</div>`;
+            }
+        } catch (e) { console.error("Error parsing options", e); }
+    }
+
+    document.getElementById('modal-options-container').innerHTML = optionsHtml;
+    updateModalPrice();
+
+    document.getElementById('item-modal').classList.add('active');
+}
+
+function toggleOption(checkbox, name, price) {
+    if (checkbox.checked) {
+        currentItem.selectedOptions.push({ name, price });
+    } else {
+        currentItem.selectedOptions = currentItem.selectedOptions.filter(o => o.name !== name);
+    }
+    updateModalPrice();
+}
+
+function adjustModalQty(change) {
+    if (currentItem.qty + change > 0) {
+        currentItem.qty += change;
+        updateModalPrice();
+        document.getElementById('modal-qty').innerText = currentItem.qty;
+    }
+}
+//Fancy animations to mimic swiggy (taken help from Gemini)
+function showToast(message, type = 'neutral') {
+    const container = document.getElementById('toast-container');
+    const toast = document.createElement('div');
+    toast.className = `toast ${type}`;
+
+    let icon = '';
+    if(type === 'success') icon = '<i class="fa-solid fa-check-circle"></i>';
+    if(type === 'error') icon = '<i class="fa-solid fa-circle-exclamation"></i>';
+
+    toast.innerHTML = `${icon} <span>${message}</span>`;
+
+    container.appendChild(toast);
+
+    //3 seconds
+    setTimeout(() => {
+        toast.style.opacity = '0';
+        toast.style.transform = 'translateY(-20px)';
+        setTimeout(() => toast.remove(), 300);
+    }, 3000);
+}
+
+
+function updateModalPrice() {
+    let optionsTotal = currentItem.selectedOptions.reduce((sum, opt) => sum + opt.price, 0);
+    let singleItemTotal = currentItem.basePrice + optionsTotal;
+    currentItem.finalPrice = singleItemTotal * currentItem.qty;
+
+    document.getElementById('modal-total-price').innerText = 'Add ₹' + currentItem.finalPrice.toFixed(2);
+}
+
+function closeModal(modalId) {
+    document.getElementById(modalId).classList.remove('active');
+}
+
+//cart
+function confirmAddToCart() {
+    const cartItem = {
+        ...currentItem,
+        key: Date.now() //unique ID
+    };
+    cart.push(cartItem);
+
+    updateCartUI();
+    closeModal('item-modal');
+}
+
+function removeFromCart(key) {
+    cart = cart.filter(item => item.key !== key);
+    updateCartUI();
+    if(cart.length === 0) closeModal('cart-modal');
+}
+
+function updateCartUI() {
+    const bar = document.getElementById('cart-bar');
+    const countSpan = document.getElementById('bar-count');
+    const totalSpan = document.getElementById('bar-total');
+
+    if (cart.length === 0) {
+        bar.classList.remove('visible');
+        return;
+    }
+
+    const totalQty = cart.reduce((sum, item) => sum + item.qty, 0);
+    const grandTotal = cart.reduce((sum, item) => sum + item.finalPrice, 0);
+
+    countSpan.innerText = `${totalQty} ITEM${totalQty > 1 ? 'S' : ''}`;
+    totalSpan.innerText = `₹${grandTotal.toFixed(2)}`;
+    bar.classList.add('visible');
+
+
+    const list = document.getElementById('cart-items-list');
+    list.innerHTML = cart.map(item => `
+        <div class="cart-item-row">
+            <div class="cart-item-details">
+                <h4>${item.name} <span style="font-size:0.8em;">x${item.qty}</span></h4>
+                <div class="cart-item-opts">
+                    ${item.selectedOptions.map(o => o.name).join(', ')}
+                </div>
+                <div style="font-weight:600; font-size:0.9rem;">₹${item.finalPrice.toFixed(2)}</div>
+            </div>
+            <div class="delete-item-btn" onclick="removeFromCart(${item.key})">
+                <i class="fa-solid fa-trash"></i>
+            </div>
+        </div>
+    `).join('');
+
+    document.getElementById('cart-modal-total').innerText = `₹${grandTotal.toFixed(2)}`;
+}
+
+function openCartModal() {
+    if(cart.length > 0) {
+        loadPickupSlots();
+        document.getElementById('cart-modal').classList.add('active');
+    }
+}
+
+function loadPickupSlots() {
+    fetch(vendorUrl(page.slotsUrl), { cache: 'no-store' })
+        .then(res => res.ok ? res.json() : null)
+        .then(data => {
+            if (!data) return;
+            const select = document.getElementById('pickup-at');
+            const chosen = select.value;
+            select.length = 1;
+            data.slots.forEach(slot => {
+                const option = new Option(
+                    slot.remaining ? slot.label : `${slot.label} (full)`, slot.starts_at
+                );
+                option.disabled = !slot.remaining;
+                select.add(option);
+            });
+            select.value = chosen;
+            if (select.selectedIndex < 0) select.selectedIndex = 0;
+        })
+        .catch(() => {});
+}
+
+
+function checkout() {
+    if (cart.length === 0) {
+        showToast('Your cart is empty!', 'error');
+        return;
+    }
+
+    const payload = {
+        vendor_id: vendorId,
+        method: 'PICKUP',
+        pickup_at: document.getElementById('pickup-at').value || null,
+        items: cart.map(item => ({
+            id: item.id,
+            quantity: item.qty,
+            options: item.selectedOptions
+        }))
+    };
+
+
+    fetch(page.createOrderUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken()
+        },
+        body: JSON.stringify(payload)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === 'success') {
+
+            closeModal('cart-modal');
+
+            //Fire Confetti using ai
+            confetti({
+                particleCount: 150,
+                spread: 70,
+                origin: { y: 0.6 },
+                colors: ['#e67e22', '#27ae60', '#ffffff']
+            });
+
+
+            if (data.pickup_at) {
+                const at = new Date(data.pickup_at).toLocaleTimeString([], { hour: 'numeric', minute: '2-digit' });
+                showToast(`Order booked for pickup at ${at}!`, 'success');
+            } else {
+                const wait = data.estimated_wait ? ` Ready in about ${data.estimated_wait} min.` : '';
+                showToast(`Order placed! Waiting for approval...${wait}`, 'success');
+            }
+
+            // 2-second delay so they see the confetti after which re dirct
+            setTimeout(() => {
+                window.location.href = page.myOrdersUrl;
+            }, 2000);
+
+        } else {
+            if (data.status === 'full') loadPickupSlots();
+            showToast(data.message || "Order Failed", 'error');
+        }
+    })
+    .catch(err => {
+        console.error(err);
+        alert("Network error. Please try again.");
+    });
+}
+
+// --- Live wait estimate (the page itself may come from the cache) ---
+function showWait() {
+    fetch(vendorUrl(page.waitUrl), { cache: 'no-store' })
+        .then(res => res.ok ? res.json() : null)
+        .then(data => {
+            if (data) {
+                document.getElementById('wait-estimate').innerHTML = '<i class="fa-regular fa-clock"></i> ';
+                document.getElementById('wait-estimate').appendChild(document.createTextNode(data.label));
+            }
+        })
+        .catch(() => {});
+}
+
+// --- Offline shell: build the page menu.html would have from the snapshot ---
+function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+}
+
+function slugify(text) {
+    return text.toLowerCase().replace(/[^\w\s-]/g, '').trim().replace(/[-\s]+/g, '-');
+}
+
+function itemCard(item) {
+    const card = el('div', 'item-card');
+    const info = el('div', 'item-info');
+    const veg = el('div', item.is_veg ? 'veg-icon' : 'veg-icon non-veg');
+    veg.appendChild(el('div'));
+    info.append(veg, el('div', 'item-name', item.name), el('div', 'item-price', `₹${item.price}`),
+                el('div', 'item-desc', item.short_description));
+
+    const media = el('div', 'item-image-container');
+    const image = el('img', 'item-img');
+    image.src = item.image_url || 'https://placehold.co/150x150?text=Yum';
+    image.alt = item.name;
+    const actions = el('div', 'add-btn-container');
+    const button = el('button', 'add-btn', item.is_available ? 'ADD' : 'Sold');
+    if (item.is_available) {
+        button.addEventListener('click', () => openItemModal(String(item.id), item.name, item.price, item.is_veg));
+    } else {
+        button.style.cssText = 'color: #999; border-color: #999; cursor: not-allowed;';
+    }
+    actions.appendChild(button);
+    media.append(image, actions);
+    card.append(info, media);
+    return card;
+}
+
+function renderMenu(snapshot) {
+    const vendor = snapshot.vendor;
+    document.title = `Menu - ${vendor.name}`;
+
+    const header = el('div', 'menu-header');
+    const back = el('a', 'back-nav');
+    back.href = page.homeUrl;
+    back.innerHTML = '<i class="fa-solid fa-arrow-left"></i> Back';
+    const info = el('div', 'vendor-info');
+    info.append(el('h1', null, vendor.name), el('p', null, `${vendor.description} | ${vendor.location}`));
+    const meta = el('div', 'vendor-meta');
+    const rating = el('span', 'rating-badge');
+    rating.innerHTML = '<i class="fa-solid fa-star"></i> ';
+    rating.appendChild(document.createTextNode(vendor.avg_rating));
+    const wait = el('span');
+    wait.id = 'wait-estimate';
+    meta.append(rating, el('span', null, vendor.type), wait);
+    info.appendChild(meta);
+    header.append(back, info);
+
+    const nav = el('div', 'category-nav');
+    nav.id = 'category-nav';
+    const list = el('div', 'menu-container');
+    let category = null;
+    snapshot.items.forEach(item => {
+        if (item.category !== category) {
+            category = item.category;
+            const link = el('a', 'cat-link', category);
+            link.href = `#cat-${slugify(category)}`;
+            nav.appendChild(link);
+            const title = el('h3', 'category-title', category);
+            title.id = `cat-${slugify(category)}`;
+            list.appendChild(title);
+        }
+        // openItemModal() reads an item's add-ons from a script tag named after it.
+        const options = el('script', null, JSON.stringify(item.options));
+        options.type = 'application/json';
+        options.id = item.id;
+        list.append(options, itemCard(item));
+    });
+    if (!snapshot.items.length) {
+        const empty = el('p', null, 'No items available right now.');
+        empty.style.cssText = 'text-align: center; padding: 40px; color: #999;';
+        list.appendChild(empty);
+    }
+    document.getElementById('menu-root').replaceWith(header, nav, list);
+}
+
+// The service worker answers the pointer from the network while there is one
+// and the snapshot it names from its cache. Without either, ask the server
+// for the page instead (the worker leaves addresses with a query alone).
+function loadSnapshot() {
+    if (!vendorId) {
+        location.replace(page.homeUrl);
+        return;
+    }
+    const json = res => {
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        return res.json();
+    };
+    fetch(`${page.menusUrl}${vendorId}/latest.json`)
+        .then(json)
+        .then(pointer => fetch(pointer.url))
+        .then(json)
+        .then(snapshot => {
+            renderMenu(snapshot);
+            showWait();
+        })
+        .catch(() => location.replace(`${location.pathname}?live=1`));
+}
+
+if (document.getElementById('menu-root')) {
+    loadSnapshot();
+} else {
+    showWait();
+}
@@ -0,0 +1,108 @@
+// URLs and the update cursor rendered by my_orders.html.
+const page = document.getElementById('order-list').dataset;
+
+function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+}
+
+function orderCard(order) {
+    const card = el('div', 'order-card');
+    card.dataset.orderId = order.id;
+
+    const header = el('div', 'order-header');
+    const info = el('div');
+    info.appendChild(el('div', 'vendor-name', order.vendor));
+    info.appendChild(el('div', 'order-time', new Date(order.created_at).toLocaleString()));
+    header.appendChild(info);
+    header.appendChild(el('span', `status-badge status-${order.status}`, order.status_display));
+    card.appendChild(header);
+
+    const items = el('ul', 'order-items');
+    order.items.forEach(item => {
+        const row = el('li', 'order-item');
+        const label = el('span');
+        label.appendChild(el('span', 'item-qty', `${item.quantity}x`));
+        label.appendChild(document.createTextNode(' ' + item.name));
+        row.appendChild(label);
+        row.appendChild(el('span', null, `₹${item.price}`));
+        items.appendChild(row);
+    });
+    card.appendChild(items);
+
+    const footer = el('div', 'order-footer');
+    footer.appendChild(el('span', null, 'Total Paid'));
+    footer.appendChild(el('span', 'total-price', `₹${order.total_amount}`));
+    card.appendChild(footer);
+    setReadyNote(card, order.status);
+    return card;
+}
+
+function setReadyNote(card, status) {
+    const note = card.querySelector('.ready-note');
+    if (status === 'READY' && !note) {
+        const ready = el('div', 'ready-note');
+        ready.innerHTML = '<i class="fa-solid fa-bell"></i> Your food is ready! Please pick it up from the counter.';
+        card.appendChild(ready);
+    } else if (status !== 'READY' && note) {
+        note.remove();
+    }
+}
+
+// --- Fetch the next page of older orders ---
+function loadMore() {
+    const button = document.getElementById('load-more');
+    button.disabled = true;
+    fetch(`${page.moreUrl}?cursor=${encodeURIComponent(button.dataset.cursor)}`)
+    .then(res => res.json())
+    .then(data => {
+        const list = document.getElementById('order-list');
+        data.orders.forEach(order => list.appendChild(orderCard(order)));
+        if (data.next_cursor) {
+            button.dataset.cursor = data.next_cursor;
+            button.disabled = false;
+        } else {
+            button.remove();
+        }
+    })
+    .catch(() => { button.disabled = false; });
+}
+
+// --- Poll for status changes and patch only the cards that changed ---
+let updatesCursor = Number(page.updatesCursor);
+
+function pollUpdates() {
+    fetch(`${page.updatesUrl}?since=${updatesCursor}`, {
+        cache: 'no-store',
+        headers: { 'If-None-Match': `"${updatesCursor}"` }
+    })
+    .then(res => res.status === 200 ? res.json() : null)
+    .then(data => {
+        if (!data) return;
+        const list = document.getElementById('order-list');
+        data.orders.forEach(order => {
+            const card = list.querySelector(`[data-order-id="${order.id}"]`);
+            if (!card) {
+                list.querySelector('.orders-empty')?.remove();
+                list.prepend(orderCard(order));
+                return;
+            }
+            const badge = card.querySelector('.status-badge');
+            badge.className = `status-badge status-${order.status}`;
+            badge.textContent = order.status_display;
+            setReadyNote(card, order.status);
+        });
+        updatesCursor = data.cursor;
+    })
+    .catch(() => {});
+}
+
+setInterval(pollUpdates, 15000);
+
+// --- Live push: each event triggers an immediate delta poll ---
+if (window.EventSource) {
+    const stream = new EventSource(page.eventsUrl);
+    stream.onmessage = () => pollUpdates();
+}
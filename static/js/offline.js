@@ -0,0 +1,10 @@
+// Install the service worker that keeps menus browsable from their JSON
+// snapshots, online or not. Its URL answers 404 while snapshots are off.
+(function() {
+    const workerUrl = document.currentScript.dataset.workerUrl;
+    if ('serviceWorker' in navigator) {
+        window.addEventListener('load', () => {
+            navigator.serviceWorker.register(workerUrl, { scope: '/' }).catch(() => {});
+        });
+    }
+})();
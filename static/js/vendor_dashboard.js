@@ -0,0 +1,209 @@
+// URLs, CSRF token and update cursor rendered by vendor_dashboard.html.
+const page = document.getElementById('orders-grid').dataset;
+
+// --- Toast Notification Function ---
+function showToast(message, type = 'neutral') {
+    const container = document.getElementById('toast-container');
+    const toast = document.createElement('div');
+    toast.className = `toast ${type}`;
+    let icon = type === 'success' ? '<i class="fa-solid fa-check"></i>' : '<i class="fa-solid fa-info-circle"></i>';
+    toast.innerHTML = `${icon} <span>${message}</span>`;
+    container.appendChild(toast);
+    setTimeout(() => {
+        toast.style.opacity = '0';
+        toast.style.transform = 'translateY(-20px)';
+        setTimeout(() => toast.remove(), 300);
+    }, 3000);
+}
+
+// --- Status Update Logic ---
+const FINISHED = ['COMPLETED', 'REJECTED'];
+
+function applyStatus(orderId, newStatus) {
+    const card = document.getElementById(`card-${orderId}`);
+    if (!card) return;
+    if (FINISHED.includes(newStatus)) {
+        card.remove();
+    } else {
+        card.querySelector('.action-area').replaceWith(actionButtons({ id: orderId, status: newStatus }));
+    }
+}
+
+function updateStatuses(orderIds, newStatus) {
+    return fetch(page.updateUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': page.csrfToken
+        },
+        body: JSON.stringify({ orders: orderIds, status: newStatus })
+    })
+    .then(res => res.json())
+    .then(data => {
+        if (data.status !== 'success') {
+            showToast(data.message || 'Error updating orders', 'error');
+            return;
+        }
+        const moved = Object.keys(data.results).filter(id => data.results[id] === 'moved');
+        moved.forEach(id => applyStatus(id, newStatus));
+        const failed = orderIds.length - moved.length;
+        if (moved.length) {
+            const label = moved.length === 1 ? `Order #${moved[0]}` : `${moved.length} orders`;
+            showToast(`${label} updated to ${newStatus}`, 'success');
+        }
+        if (failed) showToast(`${failed} order(s) had already changed`, 'error');
+        updateSelection();
+    });
+}
+
+function updateStatus(orderId, newStatus) {
+    return updateStatuses([orderId], newStatus);
+}
+
+// --- Bulk actions on the selected cards ---
+function selectedIds() {
+    return Array.from(document.querySelectorAll('.order-select:checked')).map(box => Number(box.value));
+}
+
+function updateSelection() {
+    const count = selectedIds().length;
+    document.getElementById('selected-count').textContent = count;
+    document.getElementById('bulk-bar').style.display = count ? 'flex' : 'none';
+}
+
+function bulkUpdate(newStatus) {
+    const ids = selectedIds();
+    if (ids.length) updateStatuses(ids, newStatus);
+}
+
+document.getElementById('orders-grid').addEventListener('change', event => {
+    if (event.target.classList.contains('order-select')) updateSelection();
+});
+
+// --- Complete Order (With Confetti!) ---
+function completeOrder(orderId) {
+    // 1. Trigger Confetti
+    confetti({
+        particleCount: 100,
+        spread: 70,
+        origin: { y: 0.6 },
+        colors: ['#27ae60', '#2ecc71', '#f1c40f']
+    });
+
+    // 2. Call API
+    updateStatus(orderId, 'COMPLETED');
+}
+
+// --- Build a card for an order that arrived after the page was rendered ---
+function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+}
+
+function actionButtons(order) {
+    const actions = {
+        PENDING: [
+            ['btn-accept', 'fa-check', 'Accept Order', `updateStatus(${order.id}, 'ACCEPTED')`],
+            ['btn-reject', 'fa-xmark', 'Reject', `updateStatus(${order.id}, 'REJECTED')`]
+        ],
+        ACCEPTED: [['btn-ready', 'fa-bell', 'Mark as Ready', `updateStatus(${order.id}, 'READY')`]],
+        READY: [['btn-complete', 'fa-check-double', 'Complete Order', `completeOrder(${order.id})`]]
+    };
+    const area = el('div', 'action-area');
+    (actions[order.status] || []).forEach(([cls, icon, label, onclick]) => {
+        const button = el('button', `btn ${cls}`);
+        button.setAttribute('onclick', onclick);
+        button.innerHTML = `<i class="fa-solid ${icon}"></i> `;
+        button.appendChild(document.createTextNode(label));
+        area.appendChild(button);
+    });
+    return area;
+}
+
+function orderCard(order) {
+    const card = el('div', 'order-card');
+    card.id = `card-${order.id}`;
+
+    const top = el('div', 'card-top');
+    const select = el('input', 'order-select');
+    select.type = 'checkbox';
+    select.value = order.id;
+    const label = el('label', 'order-id', ` #${order.id}`);
+    label.prepend(select);
+    top.appendChild(label);
+    top.appendChild(el('span', 'order-method', order.order_method));
+    card.appendChild(top);
+
+    const customer = el('div', 'customer-info');
+    customer.appendChild(el('div', 'user-avatar', order.customer.slice(0, 1).toUpperCase()));
+    const who = el('div');
+    const name = el('div', null, order.customer);
+    name.style.cssText = 'font-weight: 600; color: var(--dark);';
+    const roll = el('div', null, `Roll No: ${order.roll_no}`);
+    roll.style.cssText = 'font-size: 0.8rem; color: #999;';
+    who.appendChild(name);
+    who.appendChild(roll);
+    customer.appendChild(who);
+    card.appendChild(customer);
+
+    const items = el('ul', 'items-list');
+    order.items.forEach(item => {
+        const row = el('li', 'order-item');
+        const label = el('div');
+        label.appendChild(el('span', 'qty-badge', `${item.quantity}x`));
+        label.appendChild(document.createTextNode(' ' + item.name));
+        row.appendChild(label);
+        const price = el('div', null, `₹${item.price}`);
+        price.style.fontWeight = '600';
+        row.appendChild(price);
+        items.appendChild(row);
+    });
+    card.appendChild(items);
+
+    const total = el('div');
+    total.style.cssText = 'display: flex; justify-content: space-between; margin-bottom: 15px; font-weight: 700; color: var(--dark); border-top: 1px solid #eee; padding-top: 10px;';
+    total.appendChild(el('span', null, 'Total Bill'));
+    total.appendChild(el('span', null, `₹${order.total_amount}`));
+    card.appendChild(total);
+
+    card.appendChild(actionButtons(order));
+    return card;
+}
+
+// --- Poll for changes (Every 30s) and patch only the cards that changed ---
+let updatesCursor = Number(page.updatesCursor);
+
+function pollUpdates() {
+    fetch(`${page.updatesUrl}?since=${updatesCursor}`, {
+        cache: 'no-store',
+        headers: { 'If-None-Match': `"${updatesCursor}"` }
+    })
+    .then(res => res.status === 200 ? res.json() : null)
+    .then(data => {
+        if (!data) return;
+        const grid = document.getElementById('orders-grid');
+        data.orders.forEach(order => {
+            const card = document.getElementById(`card-${order.id}`);
+            if (FINISHED.includes(order.status)) {
+                if (card) card.remove();
+            } else if (card) {
+                card.querySelector('.action-area').replaceWith(actionButtons(order));
+            } else {
+                document.getElementById('empty-state')?.remove();
+                grid.prepend(orderCard(order));
+            }
+        });
+        updatesCursor = data.cursor;
+    })
+    .catch(() => {});
+}
+
+setInterval(pollUpdates, 30000);
+
+// --- Live push: each event triggers an immediate delta poll ---
+if (window.EventSource) {
+    const stream = new EventSource(`${page.eventsUrl}?scope=vendor`);
+    stream.onmessage = () => pollUpdates();
+}
@@ -0,0 +1,71 @@
+// Service worker for menu browsing without the app server (see menu_shell
+// and api.snapshots). Menu pages get the cached shell, which renders the
+// vendor's JSON snapshot; only checkout and the live extras reach Django.
+const CONFIG = {{ config|safe }};
+const SHELL_CACHE = `kk-shell-${CONFIG.version}`;
+const MENU_CACHE = 'kk-menus';
+const MENU_PAGE = /^\/vendor\/\d+\/$/;
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll([CONFIG.shell_url, ...CONFIG.shell]))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => key !== SHELL_CACHE && key !== MENU_CACHE).map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== location.origin) return;
+
+    if (request.mode === 'navigate' && MENU_PAGE.test(url.pathname) && !url.search) {
+        event.respondWith(caches.match(CONFIG.shell_url).then(shell => shell || fetch(request)));
+    } else if (url.pathname.startsWith(CONFIG.menus_url)) {
+        event.respondWith(url.pathname.endsWith('/latest.json') ? networkFirst(request) : cacheFirst(request));
+    } else if (CONFIG.shell.includes(url.pathname)) {
+        event.respondWith(caches.match(request).then(hit => hit || fetch(request)));
+    }
+});
+
+// Pointers change; use the network's answer and keep it for going offline.
+async function networkFirst(request) {
+    const cache = await caches.open(MENU_CACHE);
+    try {
+        const response = await fetch(request, { cache: 'no-cache' });
+        if (response.ok) await cache.put(request, response.clone());
+        return response;
+    } catch (error) {
+        const hit = await cache.match(request);
+        if (hit) return hit;
+        throw error;
+    }
+}
+
+// Snapshots never change under their name; a vendor's older ones are dropped.
+async function cacheFirst(request) {
+    const cache = await caches.open(MENU_CACHE);
+    const hit = await cache.match(request);
+    if (hit) return hit;
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+        const folder = request.url.slice(0, request.url.lastIndexOf('/') + 1);
+        for (const old of await cache.keys()) {
+            if (old.url.startsWith(folder) && old.url !== request.url && !old.url.endsWith('/latest.json')) {
+                await cache.delete(old);
+            }
+        }
+    }
+    return response;
+}